@@ -1,681 +1,3540 @@
 #!/usr/bin/env python3
-from flask import Flask, request, jsonify, render_template_string
+from flask import Flask, Response, request, jsonify, render_template, redirect, g
+from jinja2 import Environment, TemplateError
+from werkzeug.middleware.proxy_fix import ProxyFix
 import requests
+from requests.adapters import HTTPAdapter
 import json
+import math
 import os
+import re
+import sqlite3
+import zlib
+import gzip
+import mimetypes
 from datetime import datetime, timedelta
 import logging
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from twilio.rest import Client
+from twilio.http.http_client import TwilioHttpClient
 import hashlib
+import hmac
 import secrets
 import time
+import random
+import heapq
+import bisect
+import functools
 import threading
+import queue
+import asyncio
+from concurrent.futures import Future
+import atexit
+import fcntl
+import glob
+import signal
+import sys
 from pathlib import Path
+from collections import OrderedDict, deque, defaultdict
 
-app = Flask(__name__)
+try:
+    import brotli
+except ImportError:  # optional: assets are still served gzip-compressed without it
+    brotli = None
 
-# Enhanced logging system
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('paratoner.log'),
-        logging.StreamHandler()
-    ]
-)
+app = Flask(__name__, static_folder=None)
 logger = logging.getLogger(__name__)
 
-# Create logs directory
-Path('logs').mkdir(exist_ok=True)
-Path('backups').mkdir(exist_ok=True)
+# Runtime configuration (data/config.json)
+CONFIG_PATH = 'data/config.json'
+
+def load_app_config():
+    try:
+        with open(CONFIG_PATH, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Config load failed, using defaults: {e}")
+        return {}
+
+app_config = load_app_config()
+
+# Create logs directory
+Path('logs').mkdir(exist_ok=True)
+Path('backups').mkdir(exist_ok=True)
+
+# Enhanced logging system
+# Callers only enqueue records; a single listener thread per process owns
+# long-lived, buffered, size-rotated file handles, so no request thread opens
+# or flushes files. Several worker processes may share the same files.
+LOG_LEVEL = app_config.get('logging', {}).get('level', 'info').upper()
+LOG_MAX_BYTES = int(app_config.get('logging', {}).get('maxBytes', 5 * 1024 * 1024))
+LOG_BACKUP_COUNT = int(app_config.get('logging', {}).get('backupCount', 5))
+LOG_FLUSH_INTERVAL = app_config.get('logging', {}).get('flushIntervalMs', 1000) / 1000
+SYSTEM_LOG_PATH = 'logs/system.log'
+EVENTS_LOG_PATH = 'logs/events.jsonl'
+
+class BufferedRotatingFileHandler(RotatingFileHandler):
+    """RotatingFileHandler that buffers records in memory between periodic flushes.
+
+    Each flush appends whole records in one piece while holding an flock on
+    <file>.lock, and rollover is decided under the same lock from the file's
+    real size. A process that finds the file rotated by another one reopens
+    it, so gunicorn workers never interleave partial lines or rotate twice.
+    ERROR records are flushed immediately.
+    """
+
+    def __init__(self, filename):
+        super().__init__(filename, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding='utf-8', delay=True)
+        self.pending = []
+        self.lock_file = None
+        self.pid = None
+
+    def emit(self, record):
+        try:
+            self.pending.append(self.format(record) + self.terminator)
+        except Exception:
+            self.handleError(record)
+            return
+        if record.levelno >= logging.ERROR:
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            if not self.pending:
+                return
+            data = ''.join(self.pending)
+            self.pending.clear()
+            try:
+                if self.pid != os.getpid():
+                    # flock is shared by every process holding the same open file, so each opens its own
+                    self.lock_file = open(self.baseFilename + '.lock', 'a')
+                    self.pid = os.getpid()
+                fcntl.flock(self.lock_file, fcntl.LOCK_EX)
+                try:
+                    self._reopen_if_rotated()
+                    size = os.path.getsize(self.baseFilename) if os.path.exists(self.baseFilename) else 0
+                    if self.maxBytes and size and size + len(data.encode('utf-8')) >= self.maxBytes:
+                        self.doRollover()
+                    if self.stream is None:
+                        self.stream = self._open()
+                    self.stream.write(data)
+                    self.stream.flush()
+                finally:
+                    fcntl.flock(self.lock_file, fcntl.LOCK_UN)
+            except Exception:
+                self.handleError(logging.makeLogRecord({'msg': data}))
+
+    def _reopen_if_rotated(self):
+        if self.stream is None:
+            return
+        try:
+            current = os.stat(self.baseFilename).st_ino
+        except OSError:
+            current = None
+        if current != os.fstat(self.stream.fileno()).st_ino:
+            self.stream.close()
+            self.stream = None
+
+    def discard(self):
+        """Drop buffered records and file handles inherited over fork; the parent writes its own."""
+        self.pending.clear()
+        self.stream = None
+        self.pid = None
+
+    def close(self):
+        self.flush()
+        super().close()
+
+class EventFilter(logging.Filter):
+    """Pass only records produced by log_system_event."""
+
+    def filter(self, record):
+        return hasattr(record, 'event_type')
+
+class SystemLogFormatter(logging.Formatter):
+    """Friendly Turkish line for logs/system.log and the dashboard."""
+
+    def format(self, record):
+        return f"{datetime.fromtimestamp(record.created).strftime('%d.%m.%Y %H:%M:%S')} | {record.friendly}"
+
+class JsonLinesFormatter(logging.Formatter):
+    """Machine-readable variant of each event for logs/events.jsonl."""
+
+    def format(self, record):
+        return json.dumps({
+            'ts': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'event_type': record.event_type,
+            'message': record.event_message,
+            'channel': record.channel,
+            'attempt': record.attempt,
+            'latency_ms': round(record.latency_ms, 2) if record.latency_ms is not None else None,
+            'text': record.friendly
+        }, ensure_ascii=False)
+
+log_file_handlers = {}
+
+def setup_logging():
+    console_handler = logging.StreamHandler()
+    app_file_handler = BufferedRotatingFileHandler('paratoner.log')
+    for handler in (console_handler, app_file_handler):
+        handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+    
+    system_handler = BufferedRotatingFileHandler(SYSTEM_LOG_PATH)
+    system_handler.setFormatter(SystemLogFormatter())
+    events_handler = BufferedRotatingFileHandler(EVENTS_LOG_PATH)
+    events_handler.setFormatter(JsonLinesFormatter())
+    for handler in (system_handler, events_handler):
+        handler.addFilter(EventFilter())
+    
+    log_queue = queue.Queue(-1)
+    root = logging.getLogger()
+    root.setLevel(getattr(logging, LOG_LEVEL, logging.INFO))
+    root.handlers[:] = [QueueHandler(log_queue)]
+    listener = QueueListener(log_queue, console_handler, app_file_handler, system_handler, events_handler,
+                             respect_handler_level=True)
+    listener.start()
+    
+    log_file_handlers.update(app=app_file_handler, system=system_handler, events=events_handler)
+    def flush_periodically():
+        while True:
+            time.sleep(LOG_FLUSH_INTERVAL)
+            for handler in log_file_handlers.values():
+                handler.flush()
+    threading.Thread(target=flush_periodically, name='log-flusher', daemon=True).start()
+    return listener
+
+log_listener = setup_logging()
+
+def restart_logging_after_fork():
+    """Threads do not survive fork: give a forked worker its own listener, flusher and file handles."""
+    global log_listener
+    for handler in log_file_handlers.values():
+        handler.discard()
+    log_listener = setup_logging()
+
+def stop_logging():
+    log_listener.stop()
+
+os.register_at_fork(after_in_child=restart_logging_after_fork)
+atexit.register(stop_logging)
+
+# Enhanced Storage
+service_config = {}     # channel -> enabled/health/last_check/retry_count, filled from CHANNEL_DRIVERS
+
+# Security System: a slow password hash checked only at login, then signed session tokens
+AUTH_CONFIG = app_config.get('auth', {})
+PASSWORD_ITERATIONS = int(AUTH_CONFIG.get('passwordIterations', 390000))
+SESSION_TTL = int(AUTH_CONFIG.get('sessionHours', 12) * 3600)
+SESSION_COOKIE = 'paratoner_session'
+SESSION_KEY_PATH = 'data/session.key'
+api_keys_config = {}    # channel -> driver settings, filled from CHANNEL_DRIVERS
+
+# System metrics
+system_metrics = {
+    'total_signals': 0,
+    'success_rate': {},
+    'last_restart': datetime.now(),
+    'uptime': 0
+}
+
+# Signal store: fixed-capacity ring buffer with symbol/action indexes
+MAX_ALARMS = int(app_config.get('storage', {}).get('maxAlarms', 2500))
+
+class AlarmRecord:
+    """Compact alarm record; supports alarm['field'] access like the old dicts."""
+
+    __slots__ = ('id', 'timestamp', 'symbol', 'action', 'price', 'message',
+                 'telegram_success', 'whatsapp_success', 'delivery_status')
+
+    def __init__(self, id, timestamp, symbol, action, price, message,
+                 telegram_success=False, whatsapp_success=False, delivery_status='pending'):
+        self.id = id
+        self.timestamp = timestamp
+        self.symbol = symbol
+        self.action = action
+        self.price = price
+        self.message = message
+        self.telegram_success = telegram_success
+        self.whatsapp_success = whatsapp_success
+        self.delivery_status = delivery_status
+
+    def __getitem__(self, key):
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        setattr(self, key, value)
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+CROCKFORD_BASE32 = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+_alarm_id_lock = threading.Lock()
+_alarm_id_state = {'ms': 0, 'random': 0}
+
+def new_alarm_id():
+    """'py' + ULID: 48-bit millisecond timestamp and 80 random bits, Crockford base32.
+
+    Within one millisecond the random part is incremented instead of redrawn,
+    so ids from this process are strictly increasing; across processes the
+    random bits keep them unique.
+    """
+    with _alarm_id_lock:
+        ms = time.time_ns() // 1_000_000
+        if ms <= _alarm_id_state['ms']:
+            ms, rand = _alarm_id_state['ms'], _alarm_id_state['random'] + 1
+        else:
+            rand = secrets.randbits(80)
+        _alarm_id_state.update(ms=ms, random=rand)
+    value = (ms << 80) + rand
+    return 'py' + ''.join(CROCKFORD_BASE32[(value >> shift) & 31] for shift in range(125, -1, -5))
+
+class SignalStore:
+    """Ring buffer of the newest `capacity` alarms with O(1) insert, eviction and lookup by id.
+
+    It only serves this process's delivery updates; listings read the shared
+    SQLite history, which every worker writes to.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.records = deque()
+        self.by_id = {}
+        self.lock = threading.Lock()
+
+    def append(self, record):
+        with self.lock:
+            if len(self.records) >= self.capacity:
+                old = self.records.popleft()
+                if self.by_id.get(old.id) is old:
+                    del self.by_id[old.id]
+            self.records.append(record)
+            self.by_id[record.id] = record
+
+    def get(self, alarm_id):
+        return self.by_id.get(alarm_id)
+
+    def snapshot(self):
+        with self.lock:
+            return list(self.records)
+
+    def __len__(self):
+        return len(self.records)
+
+# Persistent signal history (SQLite in WAL mode, written in batches off the request path)
+SIGNAL_DB_PATH = 'data/signals.db'
+LEGACY_ALARMS_PATH = 'data/alarms.json'
+SIGNAL_DB_BATCH_SIZE = int(app_config.get('storage', {}).get('batchSize', 100))
+SIGNAL_DB_FLUSH_INTERVAL = app_config.get('storage', {}).get('flushIntervalMs', 200) / 1000
+# 0 keeps history forever; pruning is opt-in
+SIGNAL_RETENTION_DAYS = int(app_config.get('storage', {}).get('retentionDays', 0))
+SIGNAL_PRUNE_INTERVAL = 3600
+
+def local_timestamp(value):
+    """ISO-8601 string in the stored format: naive local time, as datetime.now().isoformat() writes it.
+
+    Stored timestamps are compared as strings (range filters, pruning), so
+    UTC 'Z' or offset timestamps are converted before they reach the table.
+    """
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return parsed.isoformat()
+
+class SignalDatabase:
+    """Alarm and delivery-attempt history in SQLite.
+
+    Writes are queued and committed by one writer thread in batches of up to
+    SIGNAL_DB_BATCH_SIZE, or every SIGNAL_DB_FLUSH_INTERVAL seconds. Readers
+    open their own connections; WAL mode lets them run alongside the writer.
+    """
+
+    SCHEMA = '''
+        CREATE TABLE IF NOT EXISTS alarms (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            id TEXT NOT NULL UNIQUE,
+            timestamp TEXT NOT NULL,
+            symbol TEXT,
+            action TEXT,
+            price TEXT,
+            message TEXT,
+            telegram_success INTEGER NOT NULL DEFAULT 0,
+            whatsapp_success INTEGER NOT NULL DEFAULT 0,
+            delivery_status TEXT NOT NULL DEFAULT 'pending'
+        );
+        CREATE INDEX IF NOT EXISTS idx_alarms_timestamp ON alarms (timestamp);
+        CREATE INDEX IF NOT EXISTS idx_alarms_symbol_nocase ON alarms (symbol COLLATE NOCASE, seq);
+        CREATE INDEX IF NOT EXISTS idx_alarms_action_nocase ON alarms (action COLLATE NOCASE, seq);
+        CREATE INDEX IF NOT EXISTS idx_alarms_status ON alarms (delivery_status, seq);
+        CREATE TABLE IF NOT EXISTS deliveries (
+            alarm_id TEXT NOT NULL,
+            channel TEXT NOT NULL,
+            attempt INTEGER NOT NULL,
+            success INTEGER NOT NULL,
+            latency_ms REAL,
+            timestamp TEXT NOT NULL,
+            destination TEXT NOT NULL DEFAULT ''
+        );
+        CREATE INDEX IF NOT EXISTS idx_deliveries_alarm ON deliveries (alarm_id);
+        CREATE INDEX IF NOT EXISTS idx_deliveries_timestamp ON deliveries (timestamp);
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        );
+        INSERT OR IGNORE INTO meta VALUES ('version', 0);
+    '''
+    UPDATABLE_COLUMNS = ('telegram_success', 'whatsapp_success', 'delivery_status')
+
+    def __init__(self, path):
+        self.path = path
+        self.ops = queue.Queue()
+        self.thread = None
+        # The first prune waits an interval, so a restart never deletes history on its own
+        self.last_prune = time.time()
+        self.local = threading.local()
+        is_new = not os.path.exists(path)
+        conn = self.connect()
+        with conn:
+            conn.executescript(self.SCHEMA)
+            if 'destination' not in {row[1] for row in conn.execute('PRAGMA table_info(deliveries)')}:
+                conn.execute("ALTER TABLE deliveries ADD COLUMN destination TEXT NOT NULL DEFAULT ''")
+            if is_new:
+                self._import_legacy(conn)
+            elif conn.execute("SELECT 1 FROM meta WHERE key = 'local_timestamps'").fetchone() is None:
+                self._normalize_timestamps(conn)
+            conn.execute("INSERT OR IGNORE INTO meta VALUES ('local_timestamps', 1)")
+        conn.close()
+
+    def connect(self):
+        conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def _import_legacy(self, conn):
+        """Seed a fresh database with the Node-era data/alarms.json history."""
+        if not os.path.exists(LEGACY_ALARMS_PATH):
+            return
+        try:
+            with open(LEGACY_ALARMS_PATH, 'r', encoding='utf-8') as f:
+                legacy = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Legacy alarms import skipped: {e}")
+            return
+        rows = []
+        for item in legacy:
+            data = item.get('data', {})
+            delivery = item.get('delivery', {})
+            try:
+                timestamp = local_timestamp(item['timestamp'])
+            except (KeyError, TypeError, ValueError):
+                continue
+            rows.append((
+                item.get('id'), timestamp, data.get('symbol', 'N/A'), data.get('action', 'N/A'),
+                str(data.get('price', 'N/A')), data.get('message', 'Sinyal'),
+                int(bool(delivery.get('telegram', {}).get('success'))),
+                int(bool(delivery.get('whatsapp', {}).get('success'))), 'delivered'
+            ))
+        conn.executemany(
+            'INSERT OR IGNORE INTO alarms (id, timestamp, symbol, action, price, message, '
+            'telegram_success, whatsapp_success, delivery_status) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+        logger.info(f"Imported {len(rows)} legacy alarms from {LEGACY_ALARMS_PATH}")
+
+    def _normalize_timestamps(self, conn):
+        """One-time fix for databases seeded before imported UTC timestamps were converted."""
+        rows = conn.execute("SELECT seq, timestamp FROM alarms WHERE timestamp LIKE '%Z' OR timestamp LIKE '%+__:__'").fetchall()
+        conn.executemany('UPDATE alarms SET timestamp = ? WHERE seq = ?', [(local_timestamp(ts), seq) for seq, ts in rows])
+
+    def load_recent(self, limit):
+        """Newest `limit` alarms as AlarmRecords, oldest first (the warm window)."""
+        conn = self.connect()
+        try:
+            rows = conn.execute(
+                'SELECT id, timestamp, symbol, action, price, message, telegram_success, '
+                'whatsapp_success, delivery_status FROM alarms ORDER BY seq DESC LIMIT ?', (limit,)).fetchall()
+        finally:
+            conn.close()
+        return [AlarmRecord(*row[:6], bool(row[6]), bool(row[7]), row[8]) for row in reversed(rows)]
+
+    def reader(self):
+        """Per-thread read connection, reused across requests."""
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = self.local.conn = self.connect()
+        return conn
+
+    def query(self, limit, cursor=None, since=None, until=None, symbol=None, action=None, status=None):
+        """Newest-first page of alarms plus the cursor for the next page.
+
+        Every filter maps to an indexed column and the page is fetched with
+        LIMIT, so the cost tracks the page size rather than the history length.
+        status is a list of delivery statuses, any of which matches.
+        """
+        clauses, params = [], []
+        if cursor is not None:
+            clauses.append('seq < ?')
+            params.append(cursor)
+        if since:
+            clauses.append('timestamp >= ?')
+            params.append(since)
+        if until:
+            clauses.append('timestamp < ?')
+            params.append(until)
+        if symbol:
+            clauses.append('symbol = ? COLLATE NOCASE')
+            params.append(symbol)
+        if action:
+            clauses.append('action = ? COLLATE NOCASE')
+            params.append(action)
+        if status:
+            clauses.append(f"delivery_status IN ({', '.join('?' * len(status))})")
+            params.extend(status)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        rows = self.reader().execute(
+            f'SELECT seq, id, timestamp, symbol, action, price, message, telegram_success, '
+            f'whatsapp_success, delivery_status FROM alarms {where} ORDER BY seq DESC LIMIT ?',
+            (*params, limit + 1)).fetchall()
+        next_cursor = rows[limit - 1][0] if len(rows) > limit else None
+        signals = [AlarmRecord(*row[1:7], bool(row[7]), bool(row[8]), row[9]).to_dict() for row in rows[:limit]]
+        return signals, next_cursor
+
+    @staticmethod
+    def row(alarm):
+        return (alarm.id, alarm.timestamp, alarm.symbol, alarm.action, str(alarm.price), alarm.message,
+                int(alarm.telegram_success), int(alarm.whatsapp_success), alarm.delivery_status)
+
+    def insert(self, alarm):
+        self.ops.put(('insert', [self.row(alarm)]))
+
+    def insert_many(self, records):
+        """Queued as a single op, so the writer commits the whole batch in one transaction."""
+        self.ops.put(('insert', [self.row(alarm) for alarm in records]))
+
+    def update(self, alarm_id, **fields):
+        self.ops.put(('update', alarm_id, fields))
+
+    def record_delivery(self, alarm_id, channel, attempt, success, latency_ms, destination=''):
+        self.ops.put(('delivery', (alarm_id, channel, attempt, int(success), latency_ms, datetime.now().isoformat(), destination)))
+
+    def delivery_outcome(self, alarm_id):
+        """'delivered', 'partial' or 'failed' across the alarm's destinations (any success counts); None if none was tried."""
+        rows = self.reader().execute(
+            'SELECT MAX(success) FROM deliveries WHERE alarm_id = ? GROUP BY channel, destination', (alarm_id,)).fetchall()
+        if not rows:
+            return None
+        delivered = sum(row[0] for row in rows)
+        return 'delivered' if delivered == len(rows) else 'partial' if delivered else 'failed'
+
+    def flush(self, timeout=5):
+        """Block until everything queued so far is committed."""
+        if self.thread is None:
+            return
+        done = threading.Event()
+        self.ops.put(('flush', done))
+        done.wait(timeout)
+
+    def _write(self, conn, batch):
+        with conn:
+            for op in batch:
+                if op[0] == 'insert':
+                    conn.executemany(
+                        'INSERT OR IGNORE INTO alarms (id, timestamp, symbol, action, price, message, '
+                        'telegram_success, whatsapp_success, delivery_status) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', op[1])
+                elif op[0] == 'update':
+                    fields = {k: v for k, v in op[2].items() if k in self.UPDATABLE_COLUMNS}
+                    if fields:
+                        assignments = ', '.join(f'{column} = ?' for column in fields)
+                        values = [int(v) if isinstance(v, bool) else v for v in fields.values()]
+                        conn.execute(f'UPDATE alarms SET {assignments} WHERE id = ?', (*values, op[1]))
+                elif op[0] == 'delivery':
+                    conn.execute('INSERT INTO deliveries (alarm_id, channel, attempt, success, latency_ms, timestamp, destination) '
+                                 'VALUES (?, ?, ?, ?, ?, ?, ?)', op[1])
+            if any(op[0] in ('insert', 'update') for op in batch):
+                conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'version'")
+
+    def current_version(self):
+        """History version shared by every process writing this database; feeds /admin/signals ETags."""
+        return self.reader().execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0]
+
+    def _prune(self, conn):
+        cutoff = (datetime.now() - timedelta(days=SIGNAL_RETENTION_DAYS)).isoformat()
+        with conn:
+            conn.execute('DELETE FROM alarms WHERE timestamp < ?', (cutoff,))
+            conn.execute('DELETE FROM deliveries WHERE timestamp < ?', (cutoff,))
+        self.last_prune = time.time()
+
+    def _run(self):
+        conn = self.connect()
+        while True:
+            batch = [self.ops.get()]
+            deadline = time.time() + SIGNAL_DB_FLUSH_INTERVAL
+            while batch[-1][0] not in ('flush', 'stop') and len(batch) < SIGNAL_DB_BATCH_SIZE:
+                try:
+                    batch.append(self.ops.get(timeout=max(deadline - time.time(), 0)))
+                except queue.Empty:
+                    break
+            try:
+                self._write(conn, batch)
+                if SIGNAL_RETENTION_DAYS > 0 and time.time() - self.last_prune > SIGNAL_PRUNE_INTERVAL:
+                    self._prune(conn)
+            except sqlite3.Error as e:
+                logger.error(f"Signal database write failed ({len(batch)} ops): {e}")
+            control = batch[-1]
+            if control[0] == 'flush':
+                control[1].set()
+            elif control[0] == 'stop':
+                conn.close()
+                return
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name='signal-db-writer', daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout=None):
+        if self.thread is None:
+            return
+        self.ops.put(('stop',))
+        self.thread.join(timeout)
+        self.thread = None
+
+signal_db = SignalDatabase(SIGNAL_DB_PATH)
+
+# Only the warm window of recent signals is kept in memory; older history stays in SQLite
+alarms = SignalStore(MAX_ALARMS)
+for record in signal_db.load_recent(MAX_ALARMS):
+    alarms.append(record)
+
+# Retry mechanism (durable, scheduled off the request and sender threads)
+RETRY_QUEUE_PATH = 'data/retry_queue.{instance}.jsonl'
+RETRY_QUEUE_LEGACY_PATH = 'data/retry_queue.jsonl'
+RETRY_MAX_ATTEMPTS = int(app_config.get('retry', {}).get('maxAttempts', 10))
+RETRY_BASE_DELAY = app_config.get('retry', {}).get('delayMs', 1000) / 1000
+RETRY_MAX_DELAY = app_config.get('retry', {}).get('maxDelayMs', 600000) / 1000
+RETRY_EXPONENTIAL = app_config.get('retry', {}).get('exponentialBackoff', True)
+
+# Async delivery pipeline (webhook returns before providers are called)
+DELIVERY_WORKERS = int(os.environ.get('DELIVERY_WORKERS', 4))
+DELIVERY_QUEUE_SIZE = int(os.environ.get('DELIVERY_QUEUE_SIZE', 1000))
+DELIVERY_DRAIN_TIMEOUT = float(os.environ.get('DELIVERY_DRAIN_TIMEOUT', 30))
+delivery_queue = queue.Queue(maxsize=DELIVERY_QUEUE_SIZE)
+delivery_threads = []
+_DELIVERY_STOP = object()
+
+# Per-channel worker pools so one slow provider cannot starve the others
+CHANNEL_POOL_WORKERS = int(os.environ.get('CHANNEL_POOL_WORKERS', 4))
+CHANNEL_POOL_QUEUE_SIZE = int(os.environ.get('CHANNEL_POOL_QUEUE_SIZE', 200))
+channel_pools = {}
+
+# Connection pooling for outbound delivery (keep-alive instead of a handshake per signal)
+HTTP_POOL_SIZE = int(os.environ.get('HTTP_POOL_SIZE', max(CHANNEL_POOL_WORKERS, 10)))
+HTTP_TIMEOUT = float(os.environ.get('HTTP_TIMEOUT', 10))
+
+# Channel drivers: every output is a ChannelDriver in CHANNEL_DRIVERS; pools, coalescing, rate
+# limits, breakers, probes, templates and the dashboard are all built from that registry
+LOOPBACK_DEFAULT_PATH = 'logs/loopback.jsonl'
+
+def build_http_session(pool_size=HTTP_POOL_SIZE):
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+class DeliveryError(Exception):
+    """A provider answered but did not accept the message."""
+
+class ChannelDriver:
+    """One output channel.
+
+    Subclasses describe configuration and scheduling with the class
+    attributes below and implement send() as a single attempt that raises
+    on failure. Rate limiting, retries, circuit breaking and metrics are
+    applied around it by send_message(), so a driver never sleeps or retries.
+    send_async() is the same attempt for the asyncio serving mode (asgi.py);
+    without an override it runs send() in a worker thread.
+    """
+
+    name = None
+    label = None
+    emoji = '📨'
+    icon = 'fas fa-paper-plane'
+    description = ''
+    settings = {}               # setting -> (environment variable, dashboard placeholder)
+    masked_settings = ()        # returned truncated by /admin/get-api-keys
+    hidden_settings = ()        # never returned by /admin/get-api-keys
+    enabled_by_default = False
+    workers = CHANNEL_POOL_WORKERS
+    queue_size = CHANNEL_POOL_QUEUE_SIZE
+    rate_limit = {'perSecond': 0, 'burst': 1, 'perChatPerSecond': 0, 'perChatBurst': 1}
+    linger = None               # seconds; None uses coalesce.lingerMs, 0 disables coalescing
+    max_batch = None            # None uses coalesce.maxBatch
+    max_message_chars = None    # limit for joined batches; None hands the whole batch to send_batch()
+    message_format = 'text'
+    message_template = '🤖 Paratoner Bot\n🚀 {{ symbol }} - {{ action }}\n💰 Fiyat: {{ price }}\n📅 {{ time }}\n📝 {{ message }}'
+
+    @property
+    def config(self):
+        return api_keys_config[self.name]
+
+    def resolve(self, overrides=None):
+        """Settings for one send: the channel's configuration with a routing destination's overrides on top."""
+        return {**self.config, **overrides} if overrides else self.config
+
+    def destination(self, settings):
+        """Key for per-chat rate limits."""
+        return self.name
+
+    def adapt(self, message):
+        """Adapt an ad-hoc HTML message (e.g. a dashboard test) to this channel."""
+        return message.replace('<b>', '').replace('</b>', '')
+
+    def send(self, message, settings):
+        raise NotImplementedError
+
+    def send_batch(self, messages, settings):
+        """Deliver several messages in one provider call; by default they are joined into one text."""
+        self.send(COALESCE_SEPARATOR.join(messages), settings)
+
+    async def send_async(self, client, message, settings):
+        """client is the shared httpx.AsyncClient of the serving process."""
+        await asyncio.to_thread(self.send, message, settings)
+
+    async def send_batch_async(self, client, messages, settings):
+        await self.send_async(client, COALESCE_SEPARATOR.join(messages), settings)
+
+    def health_check(self):
+        """Cheap read-only check used by the health prober; True when the provider is reachable."""
+        return True
+
+class TelegramDriver(ChannelDriver):
+    name = 'telegram'
+    label = 'Telegram'
+    emoji = '📱'
+    icon = 'fab fa-telegram'
+    description = 'Bot Token ve Chat ID gerekli'
+    settings = {
+        'token': ('TELEGRAM_BOT_TOKEN', "Bot Token (@BotFather'dan alınır)"),
+        'chat_id': ('TELEGRAM_CHAT_ID', 'Chat ID (numarik)')
+    }
+    masked_settings = ('token',)
+    enabled_by_default = True
+    rate_limit = {'perSecond': 25, 'burst': 25, 'perChatPerSecond': 1, 'perChatBurst': 3}
+    max_message_chars = 4096
+    message_format = 'html'
+    message_template = '🤖 <b>Paratoner Bot</b>\n🚀 <b>{{ symbol }}</b> - {{ action }}\n💰 Fiyat: {{ price }}\n📅 {{ time }}\n📝 {{ message }}'
+
+    def __init__(self):
+        self.session = build_http_session()
+
+    def destination(self, settings):
+        return str(settings['chat_id'])
+
+    def adapt(self, message):
+        return message
+
+    def send_request(self, message, settings):
+        url = f'https://api.telegram.org/bot{settings["token"]}/sendMessage'
+        return url, {'chat_id': settings['chat_id'], 'text': message, 'parse_mode': 'HTML'}
+
+    def send(self, message, settings):
+        url, payload = self.send_request(message, settings)
+        response = self.session.post(url, json=payload, timeout=HTTP_TIMEOUT)
+        if response.status_code != 200:
+            raise DeliveryError(f'HTTP {response.status_code}')
+
+    async def send_async(self, client, message, settings):
+        url, payload = self.send_request(message, settings)
+        response = await client.post(url, json=payload, timeout=HTTP_TIMEOUT)
+        if response.status_code != 200:
+            raise DeliveryError(f'HTTP {response.status_code}')
+
+    def health_check(self):
+        response = self.session.get(f'https://api.telegram.org/bot{self.config["token"]}/getMe', timeout=HTTP_TIMEOUT)
+        return response.status_code == 200
+
+class WhatsAppDriver(ChannelDriver):
+    name = 'whatsapp'
+    label = 'WhatsApp'
+    emoji = '💬'
+    icon = 'fab fa-whatsapp'
+    description = 'Twilio hesap bilgileri gerekli'
+    settings = {
+        'account_sid': ('TWILIO_ACCOUNT_SID', 'Account SID (Twilio Console)'),
+        'auth_token': ('TWILIO_AUTH_TOKEN', 'Auth Token (Twilio Console)'),
+        'from_number': ('TWILIO_FROM_NUMBER', 'From Number (+14155238886)'),
+        'to_number': ('TWILIO_TO_NUMBER', 'To Number (+905XXXXXXXXX)')
+    }
+    masked_settings = ('account_sid',)
+    hidden_settings = ('auth_token',)
+    rate_limit = {'perSecond': 1, 'burst': 5, 'perChatPerSecond': 1, 'perChatBurst': 5}
+    max_message_chars = 1600
+
+    def __init__(self):
+        self.session = build_http_session()
+        self.clients = {}   # (account_sid, auth_token) -> Client
+        self.client_lock = threading.Lock()
+
+    def twilio_client(self, settings):
+        """A shared Twilio client per account, built once per set of credentials."""
+        credentials = (settings['account_sid'], settings['auth_token'])
+        with self.client_lock:
+            client = self.clients.get(credentials)
+            if client is None:
+                http_client = TwilioHttpClient(timeout=HTTP_TIMEOUT)
+                http_client.session = self.session
+                # Rotated credentials replace the old client; only routed accounts stay side by side
+                self.clients = {key: value for key, value in self.clients.items() if key[0] != credentials[0]}
+                client = self.clients[credentials] = Client(*credentials, http_client=http_client)
+            return client
+
+    def destination(self, settings):
+        return str(settings['to_number'])
+
+    def send(self, message, settings):
+        message_obj = self.twilio_client(settings).messages.create(
+            body=message,
+            from_=f'whatsapp:{settings["from_number"]}',
+            to=f'whatsapp:{settings["to_number"]}'
+        )
+        if not message_obj.sid:
+            raise DeliveryError('Twilio mesaj kimliği döndürmedi')
+
+    async def send_async(self, client, message, settings):
+        # The Twilio SDK is blocking, so the async mode calls its REST endpoint directly
+        response = await client.post(
+            f'https://api.twilio.com/2010-04-01/Accounts/{settings["account_sid"]}/Messages.json',
+            data={'Body': message, 'From': f'whatsapp:{settings["from_number"]}', 'To': f'whatsapp:{settings["to_number"]}'},
+            auth=(settings['account_sid'], settings['auth_token']), timeout=HTTP_TIMEOUT
+        )
+        if response.status_code != 201:
+            raise DeliveryError(f'HTTP {response.status_code}')
+        if not response.json().get('sid'):
+            raise DeliveryError('Twilio mesaj kimliği döndürmedi')
+
+    def health_check(self):
+        return self.twilio_client(self.config).api.accounts(self.config['account_sid']).fetch().status == 'active'
+
+class OutboundWebhookDriver(ChannelDriver):
+    """POSTs {"messages": [...]} as JSON; with a secret, X-Paratoner-Signature carries an HMAC-SHA256 of the body."""
+
+    name = 'outbound'
+    label = 'Webhook'
+    emoji = '🔗'
+    icon = 'fas fa-globe'
+    description = 'Sinyallerin JSON olarak gönderileceği URL (isteğe bağlı imza anahtarı)'
+    settings = {
+        'url': ('OUTBOUND_WEBHOOK_URL', 'Hedef URL (https://...)'),
+        'secret': ('OUTBOUND_WEBHOOK_SECRET', 'İmza anahtarı (isteğe bağlı)')
+    }
+    hidden_settings = ('secret',)
+    rate_limit = {'perSecond': 10, 'burst': 20, 'perChatPerSecond': 0, 'perChatBurst': 1}
+    max_batch = 50
+
+    def __init__(self):
+        self.session = build_http_session()
+
+    def destination(self, settings):
+        return settings['url']
+
+    def send(self, message, settings):
+        self.send_batch([message], settings)
+
+    def signed_body(self, messages, settings):
+        body = json.dumps({'messages': messages, 'sent_at': datetime.now().isoformat()}, ensure_ascii=False).encode('utf-8')
+        headers = {'Content-Type': 'application/json'}
+        if settings['secret']:
+            digest = hmac.new(settings['secret'].encode(), body, hashlib.sha256).hexdigest()
+            headers['X-Paratoner-Signature'] = f'sha256={digest}'
+        return body, headers
+
+    def send_batch(self, messages, settings):
+        body, headers = self.signed_body(messages, settings)
+        response = self.session.post(settings['url'], data=body, headers=headers, timeout=HTTP_TIMEOUT)
+        if not 200 <= response.status_code < 300:
+            raise DeliveryError(f'HTTP {response.status_code}')
+
+    async def send_async(self, client, message, settings):
+        await self.send_batch_async(client, [message], settings)
+
+    async def send_batch_async(self, client, messages, settings):
+        body, headers = self.signed_body(messages, settings)
+        response = await client.post(settings['url'], content=body, headers=headers, timeout=HTTP_TIMEOUT)
+        if not 200 <= response.status_code < 300:
+            raise DeliveryError(f'HTTP {response.status_code}')
+
+class LoopbackDriver(ChannelDriver):
+    """Appends messages to a local JSON-lines file; for tests and dry runs."""
+
+    name = 'loopback'
+    label = 'Loopback'
+    emoji = '🧪'
+    icon = 'fas fa-vial'
+    description = f'Mesajları yerel dosyaya yazar (varsayılan {LOOPBACK_DEFAULT_PATH})'
+    settings = {'path': ('LOOPBACK_PATH', f'Dosya yolu ({LOOPBACK_DEFAULT_PATH})')}
+    workers = 1
+
+    def __init__(self):
+        self.lock = threading.Lock()
+
+    def destination(self, settings):
+        return self.path(settings)
+
+    def path(self, settings):
+        return settings['path'] or LOOPBACK_DEFAULT_PATH
+
+    def send(self, message, settings):
+        self.send_batch([message], settings)
+
+    def send_batch(self, messages, settings):
+        sent_at = datetime.now().isoformat()
+        with self.lock, open(self.path(settings), 'a', encoding='utf-8') as f:
+            f.write(''.join(json.dumps({'sent_at': sent_at, 'message': message}, ensure_ascii=False) + '\n'
+                            for message in messages))
+
+    async def send_batch_async(self, client, messages, settings):
+        await asyncio.to_thread(self.send_batch, messages, settings)
+
+    def health_check(self):
+        return os.access(os.path.dirname(os.path.abspath(self.path(self.config))), os.W_OK)
+
+CHANNEL_DRIVERS = {driver.name: driver for driver in (TelegramDriver(), WhatsAppDriver(), OutboundWebhookDriver(), LoopbackDriver())}
+service_config.update({name: {'enabled': driver.enabled_by_default, 'health': True, 'last_check': None, 'retry_count': 0}
+                       for name, driver in CHANNEL_DRIVERS.items()})
+api_keys_config.update({name: {setting: '' for setting in driver.settings} for name, driver in CHANNEL_DRIVERS.items()})
+
+# Outbound rate limits (token buckets per channel and per destination chat)
+# Buckets live in each process, so under serve.py every worker takes an equal share of the provider's limits
+WORKER_PROCESSES = max(int(os.environ.get('PARATONER_WORKERS', 1)), 1)
+
+def worker_share(limits):
+    return {**limits,
+            'perSecond': limits['perSecond'] / WORKER_PROCESSES,
+            'burst': max(limits['burst'] // WORKER_PROCESSES, 1),
+            'perChatPerSecond': limits['perChatPerSecond'] / WORKER_PROCESSES,
+            'perChatBurst': max(limits['perChatBurst'] // WORKER_PROCESSES, 1)}
+
+RATE_LIMITS = {name: worker_share({**driver.rate_limit, **app_config.get('rateLimit', {}).get(name, {})})
+               for name, driver in CHANNEL_DRIVERS.items()}
+
+# Coalescing: alarms for the same destination within the linger time go out as one message
+COALESCE_LINGER = app_config.get('coalesce', {}).get('lingerMs', 250) / 1000
+COALESCE_MAX_BATCH = int(app_config.get('coalesce', {}).get('maxBatch', 10))
+COALESCE_SEPARATOR = '\n\n'
+coalescers = {}
+
+# Circuit breakers: stop calling a provider that keeps failing and let probes decide when it is back
+BREAKER_CONFIG = app_config.get('circuitBreaker', {})
+BREAKER_WINDOW_SIZE = int(BREAKER_CONFIG.get('windowSize', 20))
+BREAKER_WINDOW_SECONDS = BREAKER_CONFIG.get('windowSeconds', 300)
+BREAKER_MIN_CALLS = int(BREAKER_CONFIG.get('minCalls', 5))
+BREAKER_FAILURE_RATE = BREAKER_CONFIG.get('failureRate', 0.5)
+BREAKER_OPEN_SECONDS = BREAKER_CONFIG.get('openSeconds', 30)
+PROBE_INTERVAL = BREAKER_CONFIG.get('probeIntervalSeconds', 60)
+PROBE_OPEN_INTERVAL = BREAKER_CONFIG.get('openProbeIntervalSeconds', 10)
+health_transitions = deque(maxlen=50)
+
+# Enhanced Configuration with API Key Management
+# Dashboard overrides as stored in data/state.db: channel -> {setting: {'value', 'env'}}
+api_key_overrides = {}
+
+def env_fingerprint(value):
+    return hashlib.sha256(value.encode()).hexdigest()[:16]
+
+def effective_api_keys(name, overrides):
+    """The environment's values, except settings overridden from the dashboard while the environment held the same value.
+
+    Changing the environment variable afterwards (rotating a token) therefore
+    wins over the older dashboard value.
+    """
+    values = {}
+    for setting, (env_var, _) in CHANNEL_DRIVERS[name].settings.items():
+        env_value = os.environ.get(env_var, '')
+        override = overrides.get(setting)
+        if isinstance(override, dict) and override.get('env') == env_fingerprint(env_value):
+            values[setting] = override['value']
+        elif isinstance(override, str) and override and not env_value:
+            values[setting] = override  # stored by older versions, which copied every setting
+        else:
+            values[setting] = env_value
+    return values
+
+def load_api_keys():
+    # Load from environment first, then allow dashboard override
+    for name in CHANNEL_DRIVERS:
+        api_keys_config[name].update(effective_api_keys(name, {}))
+
+load_api_keys()
+
+# Shared state: in-process mutations take state_lock; service toggles, API keys and
+# metric totals go through a small SQLite store so every worker process agrees.
+STATE_DB_PATH = 'data/state.db'
+STATE_PUBLISH_INTERVAL = 5
+STATE_METRICS_TTL = 86400
+state_lock = threading.RLock()
+_instance = {'pid': None, 'id': None}
+
+def instance_id():
+    """Identifier of this worker process (recomputed after a fork)."""
+    if _instance['pid'] != os.getpid():
+        _instance.update(pid=os.getpid(), id=f'{os.getpid()}-{secrets.token_hex(3)}')
+    return _instance['id']
+
+class SharedState:
+    """Cross-process key/value store, per-process metric totals and the dashboard event relay in data/state.db.
+
+    Processes pick up each other's changes lazily: PRAGMA data_version only
+    changes when another connection has committed, so the per-request check
+    is a single cheap pragma.
+    """
+
+    SCHEMA = '''
+        CREATE TABLE IF NOT EXISTS shared_state (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL,
+            updated_at REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS process_metrics (
+            instance TEXT NOT NULL,
+            family TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            series TEXT NOT NULL,
+            value REAL NOT NULL,
+            updated_at REAL NOT NULL,
+            PRIMARY KEY (instance, series)
+        );
+        CREATE TABLE IF NOT EXISTS idempotency (
+            key TEXT PRIMARY KEY,
+            alarm_id TEXT NOT NULL,
+            expires_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_idempotency_expires ON idempotency (expires_at);
+        CREATE TABLE IF NOT EXISTS stream_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            event TEXT NOT NULL,
+            payload TEXT NOT NULL
+        );
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = None
+        self.pid = None
+        self.data_version = None
+
+    def _connection(self):
+        if self.conn is None or self.pid != os.getpid():
+            self.conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False, isolation_level=None)
+            self.conn.execute('PRAGMA journal_mode=WAL')
+            self.conn.execute('PRAGMA synchronous=NORMAL')
+            self.conn.executescript(self.SCHEMA)
+            self.pid = os.getpid()
+            self.data_version = None
+        return self.conn
+
+    def changed(self):
+        with self.lock:
+            version = self._connection().execute('PRAGMA data_version').fetchone()[0]
+            changed, self.data_version = version != self.data_version, version
+            return changed
+
+    def load(self):
+        with self.lock:
+            rows = self._connection().execute('SELECT key, value FROM shared_state').fetchall()
+        return {key: json.loads(value) for key, value in rows}
+
+    def put(self, key, value):
+        with self.lock:
+            self._connection().execute(
+                'INSERT INTO shared_state (key, value, updated_at) VALUES (?, ?, ?) '
+                'ON CONFLICT(key) DO UPDATE SET value = excluded.value, updated_at = excluded.updated_at',
+                (key, json.dumps(value, ensure_ascii=False), time.time()))
+
+    def toggle(self, key, current):
+        """Atomically flip a boolean across all processes; returns the new value."""
+        with self.lock:
+            conn = self._connection()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = conn.execute('SELECT value FROM shared_state WHERE key = ?', (key,)).fetchone()
+                value = not (json.loads(row[0]) if row else current)
+                conn.execute(
+                    'INSERT INTO shared_state (key, value, updated_at) VALUES (?, ?, ?) '
+                    'ON CONFLICT(key) DO UPDATE SET value = excluded.value, updated_at = excluded.updated_at',
+                    (key, json.dumps(value), time.time()))
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+            return value
+
+    def claim(self, key, alarm_id, ttl):
+        """Reserve key for alarm_id for ttl seconds; returns the alarm id already holding it, else None."""
+        now = time.time()
+        with self.lock:
+            conn = self._connection()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = conn.execute('SELECT alarm_id FROM idempotency WHERE key = ? AND expires_at > ?', (key, now)).fetchone()
+                if row is None:
+                    conn.execute('DELETE FROM idempotency WHERE expires_at <= ?', (now,))
+                    conn.execute('INSERT INTO idempotency VALUES (?, ?, ?)', (key, alarm_id, now + ttl))
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+            return row[0] if row else None
+
+    def release(self, key, alarm_id):
+        """Drop key if alarm_id still holds it."""
+        with self.lock:
+            conn = self._connection()
+            conn.execute('DELETE FROM idempotency WHERE key = ? AND alarm_id = ?', (key, alarm_id))
+
+    def append_event(self, event, payload, keep):
+        """Add a dashboard event for every worker's streams; only the newest keep events are retained."""
+        with self.lock:
+            conn = self._connection()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                event_id = conn.execute('INSERT INTO stream_events (event, payload) VALUES (?, ?)', (event, payload)).lastrowid
+                conn.execute('DELETE FROM stream_events WHERE id <= ?', (event_id - keep,))
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+            return event_id
+
+    def events_after(self, cursor, limit):
+        """[(id, event, payload)] newer than cursor, oldest first; with cursor None, the newest limit events."""
+        with self.lock:
+            conn = self._connection()
+            if cursor is None:
+                return conn.execute('SELECT id, event, payload FROM stream_events ORDER BY id DESC LIMIT ?',
+                                    (limit,)).fetchall()[::-1]
+            return conn.execute('SELECT id, event, payload FROM stream_events WHERE id > ? ORDER BY id LIMIT ?',
+                                (cursor, limit)).fetchall()
+
+    def publish_metrics(self, rows):
+        """Replace this process's metric totals; rows are (family, position, series, value)."""
+        now = time.time()
+        with self.lock:
+            conn = self._connection()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                conn.executemany(
+                    'INSERT INTO process_metrics VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT(instance, series) '
+                    'DO UPDATE SET value = excluded.value, updated_at = excluded.updated_at',
+                    [(instance_id(), family, position, series, value, now) for family, position, series, value in rows])
+                conn.execute('DELETE FROM process_metrics WHERE updated_at < ?', (now - STATE_METRICS_TTL,))
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+
+    def cluster_metrics(self):
+        """{family: [(series, summed value), ...]} across every process, in exposition order."""
+        with self.lock:
+            rows = self._connection().execute(
+                'SELECT family, series, SUM(value) FROM process_metrics '
+                'GROUP BY family, series ORDER BY family, MIN(position)').fetchall()
+        result = defaultdict(list)
+        for family, series, value in rows:
+            result[family].append((series, value))
+        return result
+
+shared_state = SharedState(STATE_DB_PATH)
+
+def apply_shared_state(values, announce=True):
+    with state_lock:
+        for key, value in values.items():
+            scope, _, name = key.partition('.')
+            if scope == 'service':
+                channel, _, field = name.partition('.')
+                if channel in service_config and service_config[channel].get(field) != value:
+                    service_config[channel][field] = value
+                    # Through the relay the worker that made the change has already told every dashboard
+                    if announce and broadcaster.relay is None:
+                        broadcaster.publish('service', {'service': channel, field: value})
+            elif scope == 'api_keys' and name in api_keys_config:
+                api_key_overrides[name] = value
+                api_keys_config[name].update(effective_api_keys(name, value))
+
+def sync_shared_state(announce=True):
+    """Pull toggles/keys written by other workers; a no-op unless something changed."""
+    try:
+        if shared_state.changed():
+            apply_shared_state(shared_state.load(), announce)
+    except sqlite3.Error as e:
+        logger.warning(f"Shared state sync failed: {e}")
+
+def mark_channel_health(channel, healthy):
+    """Feed a provider outcome to the channel's breaker; health mirrors whether it is open."""
+    state = breakers[channel].record(healthy)
+    with state_lock:
+        cfg = service_config[channel]
+        cfg['health'] = state != 'open'
+        cfg['retry_count'] = 0 if healthy else cfg['retry_count'] + 1
+
+# At import nobody is subscribed yet (and the broadcaster does not exist), so nothing is announced
+sync_shared_state(announce=False)
+
+# Webhook deduplication: explicit idempotency keys, else a content hash within a short window
+DEDUP_WINDOW = app_config.get('dedup', {}).get('windowSeconds', 30)
+DEDUP_KEY_TTL = app_config.get('dedup', {}).get('idempotencyTtlSeconds', 86400)
+DEDUP_MAX_ENTRIES = int(app_config.get('dedup', {}).get('maxEntries', 10000))
+
+class TTLCache:
+    """Bounded insertion-ordered cache whose entries expire after a per-entry TTL."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        now = time.time()
+        with self.lock:
+            item = self.entries.get(key)
+            if item is None or item[1] <= now:
+                return None
+            return item[0]
+
+    def put(self, key, value, ttl):
+        now = time.time()
+        with self.lock:
+            self.entries[key] = (value, now + ttl)
+            self.entries.move_to_end(key)
+            # Expired entries collect at the front; the size cap evicts the oldest regardless
+            while self.entries:
+                oldest_key, (_, expires_at) = next(iter(self.entries.items()))
+                if expires_at > now and len(self.entries) <= self.max_entries:
+                    break
+                del self.entries[oldest_key]
+
+    def discard(self, key, value):
+        """Remove key only while it still maps to value."""
+        with self.lock:
+            item = self.entries.get(key)
+            if item is not None and item[0] == value:
+                del self.entries[key]
+
+    def __len__(self):
+        return len(self.entries)
+
+dedup_cache = TTLCache(DEDUP_MAX_ENTRIES)
+
+def dedup_key(data, client_key=None):
+    """(key, ttl) identifying this delivery request, or None when content dedup is disabled.
+
+    client_key is the request's Idempotency-Key header; the signal's own
+    idempotency_key is used when there is none.
+    """
+    client_key = client_key or data.get('idempotency_key')
+    if client_key:
+        return 'key:' + hashlib.sha256(str(client_key).encode()).hexdigest(), DEDUP_KEY_TTL
+    if DEDUP_WINDOW <= 0:
+        return None
+    # The whole validated payload: alerts that differ only by strategy go to different desks
+    content = json.dumps(data, sort_keys=True, ensure_ascii=False)
+    return 'hash:' + hashlib.sha256(content.encode()).hexdigest(), DEDUP_WINDOW
+
+def claim_signal(key, ttl, alarm_id):
+    """Returns the id of an earlier alarm with the same key, or None after reserving it for alarm_id.
+
+    The local cache answers repeats without a round trip; the shared store
+    catches duplicates that landed on another worker process.
+    """
+    existing = dedup_cache.get(key)
+    if existing is not None:
+        return existing
+    try:
+        existing = shared_state.claim(key, alarm_id, ttl)
+    except sqlite3.Error as e:
+        logger.warning(f"Shared idempotency check failed, using local cache only: {e}")
+    dedup_cache.put(key, existing or alarm_id, ttl)
+    return existing
+
+def release_signal(key, alarm_id):
+    """Undo claim_signal for a signal that never reached the delivery queue.
+
+    The client was told to retry (503/500), so the retry must be delivered,
+    not acknowledged as a duplicate of the lost alarm.
+    """
+    if key is None:
+        return
+    dedup_cache.discard(key, alarm_id)
+    try:
+        shared_state.release(key, alarm_id)
+    except sqlite3.Error as e:
+        logger.warning(f"Shared idempotency release failed: {e}")
+
+WEBHOOK_URL = 'https://wtel.onrender.com/webhook/tradingview'
+
+# Security functions
+def hash_password(password, salt=None, iterations=PASSWORD_ITERATIONS):
+    """'pbkdf2_sha256$<iterations>$<salt>$<hex digest>', the format ADMIN_PASSWORD_HASH is given in."""
+    salt = salt or secrets.token_hex(16)
+    digest = hashlib.pbkdf2_hmac('sha256', password.encode(), salt.encode(), iterations).hex()
+    return f'pbkdf2_sha256${iterations}${salt}${digest}'
+
+ADMIN_PASSWORD_HASH = os.environ.get('ADMIN_PASSWORD_HASH') or hash_password('ParatonerPro2025!')
+
+def verify_password(password):
+    """Deliberately slow; only login calls it, every other request presents a session token."""
+    _, iterations, salt, digest = ADMIN_PASSWORD_HASH.split('$')
+    return hmac.compare_digest(hash_password(password, salt, int(iterations)).rsplit('$', 1)[1], digest)
+
+def load_session_key():
+    """SESSION_SECRET, else a random key in data/session.key shared by every worker and kept across restarts."""
+    if os.environ.get('SESSION_SECRET'):
+        return os.environ['SESSION_SECRET'].encode()
+    if not os.path.exists(SESSION_KEY_PATH):
+        tmp_path = f'{SESSION_KEY_PATH}.{os.getpid()}'
+        with open(tmp_path, 'w') as f:
+            f.write(secrets.token_hex(32))
+        os.chmod(tmp_path, 0o600)
+        try:
+            os.link(tmp_path, SESSION_KEY_PATH)   # atomic: the first worker to get here wins
+        except FileExistsError:
+            pass
+        finally:
+            os.remove(tmp_path)
+    with open(SESSION_KEY_PATH, 'rb') as f:
+        return f.read().strip()
+
+SESSION_KEY = load_session_key()
+verified_sessions = TTLCache(1000)
+
+def sign_session(payload):
+    return hmac.new(SESSION_KEY, payload.encode(), hashlib.sha256).hexdigest()
+
+def issue_session():
+    """'<nonce>.<expiry>.<HMAC-SHA256 signature>'; stateless, so any worker can verify it."""
+    payload = f'{secrets.token_urlsafe(12)}.{int(time.time()) + SESSION_TTL}'
+    return f'{payload}.{sign_session(payload)}'
+
+def session_token(cookies, authorization):
+    """The token from an Authorization: Bearer header, else from the login cookie."""
+    if authorization.startswith('Bearer '):
+        return authorization[len('Bearer '):]
+    return cookies.get(SESSION_COOKIE)
+
+def verify_session(token):
+    """True for an unexpired token with a valid signature (compared in constant time).
+
+    Verified tokens are cached until they expire, so polling requests skip the HMAC.
+    """
+    if not token:
+        return False
+    if verified_sessions.get(token):
+        return True
+    payload, _, signature = token.rpartition('.')
+    try:
+        expires = int(payload.rpartition('.')[2])
+    except ValueError:
+        return False
+    if expires <= time.time() or not hmac.compare_digest(sign_session(payload), signature):
+        return False
+    verified_sessions.put(token, True, expires - time.time())
+    return True
+
+# User-friendly log messages
+FRIENDLY_MESSAGES = {
+    'TELEGRAM_SUCCESS': '✅ Telegram mesajı başarıyla gönderildi: {message}',
+    'WHATSAPP_SUCCESS': '✅ WhatsApp mesajı başarıyla gönderildi: {message}',
+    'TELEGRAM_ERROR': '❌ Telegram hatası: {message}',
+    'WHATSAPP_ERROR': '❌ WhatsApp hatası: {message}',
+    'OUTBOUND_SUCCESS': '✅ Webhook çıkışı başarıyla gönderildi: {message}',
+    'OUTBOUND_ERROR': '❌ Webhook çıkışı hatası: {message}',
+    'LOOPBACK_SUCCESS': '✅ Loopback dosyasına yazıldı: {message}',
+    'LOOPBACK_ERROR': '❌ Loopback hatası: {message}',
+    'API_KEYS_UPDATED': '🔑 API anahtarları güncellendi',
+    'API_KEYS_RESET': '🔑 API anahtarları ortam değişkenlerine döndü',
+    'DATA_EXPORT': '💾 Veri yedeği oluşturuldu: {message}',
+    'WEBHOOK_RECEIVED': '📨 Yeni sinyal alındı: {message}',
+    'SERVICE_TOGGLE': '⚙️ Servis durumu değiştirildi: {message}',
+    'DELIVERY_QUEUE_FULL': '⛔ Gönderim kuyruğu dolu: {message}',
+    'WEBHOOK_DUPLICATE': '♻️ Tekrarlanan sinyal yok sayıldı: {message}',
+    'DELIVERY_SKIPPED': '⏭️ Etkin kanal yok, sinyal gönderilmedi: {message}',
+    'WEBHOOK_BATCH': '📦 Toplu sinyal alındı: {message}',
+    'RETRY_EXHAUSTED': '🛑 Tekrar denemeleri tükendi: {message}',
+    'CIRCUIT_OPEN': '🔌 Kanal devre dışı bırakıldı, mesajlar bekletiliyor: {message}',
+    'CIRCUIT_HALF_OPEN': '🔎 Kanal deneniyor: {message}',
+    'CIRCUIT_CLOSED': '🔋 Kanal yeniden aktif: {message}',
+    'MESSAGE_TEMPLATES_RELOADED': '📝 Mesaj şablonları yeniden yüklendi: {message}',
+    'MESSAGE_TEMPLATES_ERROR': '❌ Mesaj şablonları yüklenemedi, eskileri kullanılıyor: {message}',
+    'SIGNAL_FILTERED': '🚫 Sinyal yönlendirme kuralıyla durduruldu: {message}',
+    'ROUTING_RELOADED': '🧭 Yönlendirme kuralları yeniden yüklendi: {message}',
+    'ROUTING_ERROR': '❌ Yönlendirme kuralları yüklenemedi, eskileri kullanılıyor: {message}',
+    'ADMIN_LOGIN': '🔓 Yönetici girişi yapıldı: {message}',
+    'ADMIN_LOGIN_FAILED': '🔒 Hatalı şifre ile giriş denemesi: {message}'
+}
+
+def log_system_event(event_type, message, level='INFO', channel=None, attempt=None, latency_ms=None):
+    """Queue an event for system.log (friendly), events.jsonl (structured) and the app log."""
+    template = FRIENDLY_MESSAGES.get(event_type)
+    friendly_msg = template.format(message=message) if template else f'ℹ️ {event_type}: {message}'
+    logger.log(getattr(logging, level, logging.INFO), f"{event_type}: {message}", extra={
+        'event_type': event_type, 'event_message': message, 'friendly': friendly_msg,
+        'channel': channel, 'attempt': attempt, 'latency_ms': latency_ms
+    })
+
+# Metrics: HDR-style latency histograms and counters, exported at /metrics
+def hdr_bucket_bounds(min_ms=0.125, max_ms=60000, sub_buckets=4):
+    """Bucket upper bounds with constant relative precision: each power of two split into sub_buckets."""
+    bounds, base = [], min_ms
+    while base < max_ms:
+        step = base / sub_buckets
+        bounds.extend(base + step * i for i in range(sub_buckets))
+        base *= 2
+    bounds.append(base)
+    return bounds
+
+LATENCY_BUCKETS_MS = hdr_bucket_bounds()
+
+class ShardedCounts:
+    """Per-thread arrays of counts; writers never share a slot, readers sum the shards."""
+
+    def __init__(self, size):
+        self.size = size
+        self.local = threading.local()
+        self.shards = []
+        self.lock = threading.Lock()
+
+    def shard(self):
+        counts = getattr(self.local, 'counts', None)
+        if counts is None:
+            counts = self.local.counts = [0] * self.size
+            with self.lock:
+                self.shards.append(counts)
+        return counts
+
+    def snapshot(self):
+        with self.lock:
+            shards = list(self.shards)
+        return [sum(column) for column in zip(*shards)] if shards else [0] * self.size
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self):
+        self.counts = ShardedCounts(1)
+
+    def inc(self, amount=1):
+        self.counts.shard()[0] += amount
+
+    def value(self):
+        return self.counts.snapshot()[0]
+
+class Histogram:
+    """Fixed-bucket latency histogram; the last two slots hold the overflow count and the sum."""
+
+    kind = 'histogram'
+
+    def __init__(self, bounds=LATENCY_BUCKETS_MS):
+        self.bounds = bounds
+        self.counts = ShardedCounts(len(bounds) + 2)
+
+    def observe(self, value):
+        counts = self.counts.shard()
+        counts[bisect.bisect_left(self.bounds, value)] += 1
+        counts[-1] += value
+
+    def summary(self, counts=None):
+        """count/average/p50/p95/p99 from a snapshot (or from merged snapshots passed in)."""
+        counts = self.counts.snapshot() if counts is None else counts
+        buckets, total_ms = counts[:-1], counts[-1]
+        count = sum(buckets)
+        result = {'count': count, 'average_ms': round(total_ms / count, 2) if count else 0}
+        for name, q in (('p50_ms', 0.5), ('p95_ms', 0.95), ('p99_ms', 0.99)):
+            result[name] = self.quantile(buckets, count, q)
+        return result
+
+    def quantile(self, buckets, count, q):
+        """Upper bound of the bucket holding the q-quantile (None past the last bound)."""
+        if not count:
+            return 0
+        target, seen = q * count, 0
+        for bound, bucket_count in zip(self.bounds, buckets):
+            seen += bucket_count
+            if seen >= target:
+                return bound
+        return None
+
+class MetricFamily:
+    """A named metric with one child (Counter/Histogram) per label-value combination."""
+
+    def __init__(self, name, help_text, metric_class, label_names=()):
+        self.name = name
+        self.help_text = help_text
+        self.metric_class = metric_class
+        self.label_names = label_names
+        self.children = {}
+        self.lock = threading.Lock()
+
+    def labels(self, *values):
+        child = self.children.get(values)
+        if child is None:
+            with self.lock:
+                child = self.children.setdefault(values, self.metric_class())
+        return child
+
+    def samples(self):
+        """(series, value) pairs in exposition order; every value is a monotonic total."""
+        for values, child in sorted(self.children.items()):
+            labels = ','.join(f'{name}="{value}"' for name, value in zip(self.label_names, values))
+            if self.metric_class is Counter:
+                yield (f'{self.name}{{{labels}}}' if labels else self.name), child.value()
+                continue
+            counts = child.counts.snapshot()
+            prefix = f'{labels},' if labels else ''
+            cumulative = 0
+            for bound, bucket_count in zip(child.bounds, counts):
+                cumulative += bucket_count
+                yield f'{self.name}_bucket{{{prefix}le="{bound:g}"}}', cumulative
+            cumulative += counts[-2]
+            yield f'{self.name}_bucket{{{prefix}le="+Inf"}}', cumulative
+            suffix = f'{{{labels}}}' if labels else ''
+            yield f'{self.name}_sum{suffix}', counts[-1]
+            yield f'{self.name}_count{suffix}', cumulative
+
+    def render(self, samples=None):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} {self.metric_class.kind}']
+        for series, value in (self.samples() if samples is None else samples):
+            is_sum = series.split('{', 1)[0].endswith('_sum')
+            lines.append(f'{series} {value:.3f}' if is_sum else f'{series} {int(value)}')
+        return lines
+
+webhook_latency = MetricFamily('paratoner_webhook_duration_milliseconds', 'Time spent handling a TradingView webhook request', Histogram)
+send_latency = MetricFamily('paratoner_channel_send_duration_milliseconds', 'Provider send latency per attempt', Histogram, ('channel', 'outcome'))
+signals_received = MetricFamily('paratoner_signals_received_total', 'Signals accepted by the webhook', Counter)
+signals_deduplicated = MetricFamily('paratoner_signals_deduplicated_total', 'Webhook requests acknowledged as duplicates', Counter)
+webhook_rejected = MetricFamily('paratoner_webhook_rejected_total', 'Webhook requests turned away at ingress', Counter, ('reason',))
+delivery_attempts = MetricFamily('paratoner_delivery_attempts_total', 'Delivery attempts by channel and outcome', Counter, ('channel', 'outcome'))
+delivery_retries = MetricFamily('paratoner_delivery_retries_total', 'Delivery attempts after the first one', Counter, ('channel',))
+coalesced_messages = MetricFamily('paratoner_coalesced_messages_total', 'Alarm messages merged into another provider call', Counter, ('channel',))
+rate_limit_waits = MetricFamily('paratoner_rate_limit_wait_milliseconds', 'Time a send waited for a rate-limit token', Histogram, ('channel',))
+METRIC_FAMILIES = (webhook_latency, send_latency, signals_received, signals_deduplicated, webhook_rejected, delivery_attempts,
+                   delivery_retries, coalesced_messages, rate_limit_waits)
+
+def publish_metrics():
+    """Push this process's metric totals to the shared store so any worker can report the cluster sum."""
+    rows = []
+    for family in METRIC_FAMILIES:
+        rows.extend((family.name, position, series, value) for position, (series, value) in enumerate(family.samples()))
+    shared_state.publish_metrics(rows)
+
+def metrics_publisher():
+    while True:
+        time.sleep(STATE_PUBLISH_INTERVAL)
+        try:
+            publish_metrics()
+        except sqlite3.Error as e:
+            logger.warning(f"Metrics publish failed: {e}")
+
+# Live dashboard updates: one broadcaster encodes each event once; every /admin/stream client reads the same frames
+STREAM_BACKLOG = 256
+STREAM_HEARTBEAT = 15
+STREAM_METRICS_INTERVAL = 5
+STREAM_RELAY_INTERVAL = 0.2
+# A stream pins a server thread: it ends after this long (the EventSource resumes with Last-Event-ID)
+STREAM_MAX_SECONDS = 300
+# Threaded servers: open streams per process beyond which new ones are told to come back later (0 = no cap)
+STREAM_MAX_CLIENTS = int(os.environ.get('PARATONER_STREAM_CLIENTS', 0))
+STREAM_BUSY_RETRY_MS = 30000
+
+class Broadcaster:
+    """Fan-out of Server-Sent Events.
+
+    publish() formats the frame once and appends it to a bounded backlog;
+    subscribers block on one Condition and copy whatever is newer than their
+    cursor, so an event costs the same however many dashboards are open.
+    The backlog also lets a reconnecting EventSource resume from Last-Event-ID.
+    Subscribers on an event loop (asgi.py) wait on an asyncio.Event instead,
+    which publish() sets from whatever thread it runs on.
+
+    With several worker processes (serve.py) a dashboard must see events
+    published by any of them, so publish() writes to the relay table in
+    data/state.db and every worker tails it into its own backlog; the table's
+    ids are the event ids, so Last-Event-ID resumes on whichever worker the
+    EventSource reconnects to. Snapshots (the metrics frame) describe this
+    process only: subscribers get the latest one, without an event id.
+    """
+
+    def __init__(self, backlog=STREAM_BACKLOG, relay=None):
+        self.frames = deque(maxlen=backlog)    # (event id, encoded frame)
+        self.last_id = 0
+        self.snapshot = None
+        self.snapshot_serial = 0
+        self.subscribers = 0
+        self.waiters = set()    # (loop, asyncio.Event) of async subscribers
+        self.cond = threading.Condition()
+        self.relay = relay
+        self.relay_pid = None
+        self.closed = False
+
+    @staticmethod
+    def frame(event_id, event, payload):
+        return f'id: {event_id}\nevent: {event}\ndata: {payload}\n\n'.encode('utf-8')
+
+    def wake(self):
+        """Notify every subscriber; caller holds self.cond."""
+        self.cond.notify_all()
+        for loop, wake in self.waiters:
+            try:
+                loop.call_soon_threadsafe(wake.set)
+            except RuntimeError:    # loop already closed; its subscriber is going away
+                pass
+
+    def publish(self, event, data):
+        if self.relay is None and not self.subscribers:
+            return
+        payload = json.dumps(data, ensure_ascii=False, default=str)
+        if self.relay is not None:
+            try:
+                self.relay.append_event(event, payload, self.frames.maxlen)
+            except sqlite3.Error as e:
+                logger.warning(f"Stream relay write failed: {e}")
+            return
+        with self.cond:
+            self.append(self.last_id + 1, self.frame(self.last_id + 1, event, payload))
+
+    def append(self, event_id, frame):
+        with self.cond:
+            self.frames.append((event_id, frame))
+            self.last_id = event_id
+            self.wake()
+
+    def close(self):
+        """End every stream of this process (shutdown); the browsers reconnect to whoever serves next."""
+        with self.cond:
+            self.closed = True
+            self.wake()
+
+    def publish_snapshot(self, event, data):
+        """Replace the id-less frame every subscriber receives once more, e.g. this worker's metrics."""
+        payload = json.dumps(data, ensure_ascii=False, default=str)
+        with self.cond:
+            self.snapshot = f'event: {event}\ndata: {payload}\n\n'.encode('utf-8')
+            self.snapshot_serial += 1
+            self.wake()
+
+    def follow_relay(self):
+        """Load the relay's backlog and start tailing it, once per process."""
+        with self.cond:
+            if self.relay is None or self.relay_pid == os.getpid():
+                return
+            self.relay_pid = os.getpid()
+            try:
+                cursor = self.load_relay(None)
+            except sqlite3.Error as e:
+                logger.warning(f"Stream relay read failed: {e}")
+                cursor = None
+        threading.Thread(target=self.tail_relay, args=(cursor,), daemon=True).start()
+
+    def load_relay(self, cursor):
+        """Append relay events newer than cursor; returns the new cursor."""
+        while True:
+            rows = self.relay.events_after(cursor, self.frames.maxlen)
+            for event_id, event, payload in rows:
+                self.append(event_id, self.frame(event_id, event, payload))
+                cursor = event_id
+            if len(rows) < self.frames.maxlen:
+                return cursor
+
+    def tail_relay(self, cursor):
+        while True:
+            time.sleep(STREAM_RELAY_INTERVAL)
+            try:
+                cursor = self.load_relay(cursor)
+            except sqlite3.Error as e:
+                logger.warning(f"Stream relay read failed: {e}")
+
+    def collect(self, cursor, serial):
+        """(chunk, cursor, serial) for a subscriber at cursor that saw snapshot serial; caller holds self.cond."""
+        if cursor > self.last_id or (cursor < self.last_id and (not self.frames or self.frames[0][0] > cursor + 1)):
+            frames = [self.frame(self.last_id, 'resync', '{}')]
+        else:
+            frames = [frame for event_id, frame in self.frames if event_id > cursor]
+        if serial != self.snapshot_serial:
+            frames.append(self.snapshot)
+        return (b''.join(frames) if frames else b': keepalive\n\n'), self.last_id, self.snapshot_serial
+
+    def idle(self, cursor, serial):
+        return cursor == self.last_id and serial == self.snapshot_serial
+
+    def subscribe(self, last_id=None):
+        """Generator of SSE chunks for one client; a comment line is sent when idle to detect disconnects."""
+        self.follow_relay()
+        deadline = time.monotonic() + STREAM_MAX_SECONDS
+        with self.cond:
+            self.subscribers += 1
+            cursor, serial = (self.last_id if last_id is None else last_id), 0
+        try:
+            yield b'retry: 3000\n\n'
+            while not self.closed and time.monotonic() < deadline:
+                with self.cond:
+                    if self.idle(cursor, serial):
+                        self.cond.wait(min(STREAM_HEARTBEAT, max(deadline - time.monotonic(), 0)))
+                    if self.closed:
+                        break
+                    chunk, cursor, serial = self.collect(cursor, serial)
+                yield chunk
+        finally:
+            with self.cond:
+                self.subscribers -= 1
+
+    async def subscribe_async(self, last_id=None):
+        """subscribe() for an event loop: an open dashboard costs a coroutine instead of a thread."""
+        await asyncio.get_running_loop().run_in_executor(None, self.follow_relay)
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        deadline = time.monotonic() + STREAM_MAX_SECONDS
+        with self.cond:
+            self.subscribers += 1
+            self.waiters.add(waiter)
+            cursor, serial = (self.last_id if last_id is None else last_id), 0
+        try:
+            yield b'retry: 3000\n\n'
+            while not self.closed and time.monotonic() < deadline:
+                if self.idle(cursor, serial):
+                    try:
+                        await asyncio.wait_for(waiter[1].wait(), min(STREAM_HEARTBEAT, max(deadline - time.monotonic(), 0)))
+                    except asyncio.TimeoutError:
+                        pass
+                waiter[1].clear()
+                if self.closed:
+                    break
+                with self.cond:
+                    chunk, cursor, serial = self.collect(cursor, serial)
+                yield chunk
+        finally:
+            with self.cond:
+                self.subscribers -= 1
+                self.waiters.discard(waiter)
+
+# Under serve.py workers relay events through data/state.db; a single process fans out in memory
+broadcaster = Broadcaster(relay=shared_state if WORKER_PROCESSES > 1 else None)
+
+def metrics_snapshot():
+    """Small metrics payload pushed to dashboards every STREAM_METRICS_INTERVAL seconds."""
+    return {
+        'signals_received': signals_received.labels().value(),
+        'signals_deduplicated': signals_deduplicated.labels().value(),
+        'delivery_queue': delivery_queue.qsize(),
+        'retry_queue': retry_queue.stats()['depth'],
+        'channels': {channel: {'success_rate': channel_metrics(channel)['success_rate'],
+                               'circuit': breakers[channel].state} for channel in service_config},
+        'timestamp': datetime.now().isoformat()
+    }
+
+def stream_metrics_publisher():
+    while True:
+        time.sleep(STREAM_METRICS_INTERVAL)
+        if broadcaster.subscribers:
+            broadcaster.publish_snapshot('metrics', metrics_snapshot())
+
+def measure_latency(family, *label_values):
+    """Decorator observing the wrapped call's duration (ms) in a histogram family."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start_time = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                family.labels(*label_values).observe((time.perf_counter() - start_time) * 1000)
+        return wrapper
+    return decorator
+
+def record_send(channel, attempt, success, latency):
+    outcome = 'success' if success else 'failure'
+    send_latency.labels(channel, outcome).observe(latency)
+    delivery_attempts.labels(channel, outcome).inc()
+    if attempt > 1:
+        delivery_retries.labels(channel).inc()
+
+def channel_metrics(channel):
+    """Latency summary and counters for one channel (used by /admin/system-stats)."""
+    success = delivery_attempts.labels(channel, 'success').value()
+    failure = delivery_attempts.labels(channel, 'failure').value()
+    ok, failed = send_latency.labels(channel, 'success'), send_latency.labels(channel, 'failure')
+    merged = [a + b for a, b in zip(ok.counts.snapshot(), failed.counts.snapshot())]
+    return {
+        'latency': ok.summary(merged),
+        'successes': success,
+        'failures': failure,
+        'retries': delivery_retries.labels(channel).value(),
+        'success_rate': round(100 * success / (success + failure), 2) if success + failure else 0
+    }
+
+class TokenBucket:
+    """`rate` tokens per second, holding at most `burst`; rate <= 0 means unlimited."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self):
+        """Take a token, borrowing against the future if none is left; returns seconds to wait.
+
+        Borrowing keeps waiters in arrival order without a queue: each one
+        pushes the balance further negative and waits its turn.
+        """
+        if self.rate <= 0:
+            return 0
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            return -self.tokens / self.rate if self.tokens < 0 else 0
+
+    def take(self):
+        """Take a token only if one is free; returns False instead of borrowing."""
+        if self.rate <= 0:
+            return True
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+channel_buckets = {channel: TokenBucket(limits['perSecond'], limits['burst']) for channel, limits in RATE_LIMITS.items()}
+chat_buckets = {}
+chat_buckets_lock = threading.Lock()
+
+def throttle_delay(channel, settings):
+    """Take a token from both the channel and its chat; returns seconds the send has to wait."""
+    key = (channel, CHANNEL_DRIVERS[channel].destination(settings))
+    bucket = chat_buckets.get(key)
+    if bucket is None:
+        limits = RATE_LIMITS[channel]
+        with chat_buckets_lock:
+            bucket = chat_buckets.setdefault(key, TokenBucket(limits['perChatPerSecond'], limits['perChatBurst']))
+    wait = max(channel_buckets[channel].reserve(), bucket.reserve())
+    if wait > 0:
+        rate_limit_waits.labels(channel).observe(wait * 1000)
+    return wait
+
+def throttle(channel, settings):
+    """Block the sending thread until both the channel and its chat have a free token."""
+    wait = throttle_delay(channel, settings)
+    if wait > 0:
+        time.sleep(wait)
+
+class CircuitBreaker:
+    """closed -> open when the failure rate over the recent window crosses the threshold;
+    open -> half_open after BREAKER_OPEN_SECONDS, letting a single trial send through;
+    half_open/open -> closed on any success (trial, test message or probe).
+
+    The window holds the last BREAKER_WINDOW_SIZE outcomes that are younger
+    than BREAKER_WINDOW_SECONDS.
+    """
+
+    def __init__(self, channel):
+        self.channel = channel
+        self.state = 'closed'
+        self.window = deque(maxlen=BREAKER_WINDOW_SIZE)   # (time, success)
+        self.opened_at = None
+        self.trial_in_flight = False
+        self.lock = threading.Lock()
+
+    def _failure_rate(self, now):
+        while self.window and self.window[0][0] < now - BREAKER_WINDOW_SECONDS:
+            self.window.popleft()
+        if len(self.window) < BREAKER_MIN_CALLS:
+            return None
+        return sum(1 for _, success in self.window if not success) / len(self.window)
+
+    def _transition(self, state, reason):
+        previous, self.state = self.state, state
+        self.trial_in_flight = False
+        if state == 'open':
+            self.opened_at = time.time()
+        elif state == 'closed':
+            self.window.clear()
+            self.opened_at = None
+        return {'channel': self.channel, 'from': previous, 'to': state, 'reason': reason,
+                'timestamp': datetime.now().isoformat()}
+
+    def allow(self):
+        """Whether a send may go to the provider now."""
+        with self.lock:
+            if self.state == 'closed':
+                return True
+            if self.state == 'open':
+                if time.time() < self.opened_at + BREAKER_OPEN_SECONDS:
+                    return False
+                transition = self._transition('half_open', 'deneme gönderimi')
+            elif self.trial_in_flight:
+                return False
+            else:
+                transition = None
+            self.trial_in_flight = True
+        if transition:
+            announce_transition(transition)
+        return True
+
+    def record(self, success):
+        """Count an outcome; returns the resulting state."""
+        transition = None
+        with self.lock:
+            now = time.time()
+            if self.state != 'closed':
+                if success:
+                    transition = self._transition('closed', 'sağlayıcı yanıt verdi')
+                elif self.state == 'half_open':
+                    transition = self._transition('open', 'deneme gönderimi başarısız')
+                else:
+                    self.opened_at = now
+            else:
+                self.window.append((now, success))
+                rate = self._failure_rate(now)
+                if not success and rate is not None and rate >= BREAKER_FAILURE_RATE:
+                    transition = self._transition('open', f'hata oranı %{rate * 100:.0f}')
+            state = self.state
+        if transition:
+            announce_transition(transition)
+        return state
+
+    def retry_after(self):
+        """Seconds until a deferred send should look again (jittered so the backlog does not stampede)."""
+        with self.lock:
+            remaining = self.opened_at + BREAKER_OPEN_SECONDS - time.time() if self.state == 'open' else 0
+        return max(remaining, RETRY_BASE_DELAY) + random.uniform(0, RETRY_BASE_DELAY)
+
+    def snapshot(self):
+        with self.lock:
+            rate = self._failure_rate(time.time())
+            return {
+                'state': self.state,
+                'failure_rate': round(rate, 3) if rate is not None else None,
+                'window_calls': len(self.window),
+                'opened_at': datetime.fromtimestamp(self.opened_at).isoformat() if self.opened_at else None
+            }
+
+def announce_transition(transition):
+    health_transitions.append(transition)
+    level = 'ERROR' if transition['to'] == 'open' else 'INFO'
+    log_system_event('CIRCUIT_' + transition['to'].upper(), f"{transition['channel']}: {transition['reason']}", level,
+                     channel=transition['channel'])
+    broadcaster.publish('service', {'service': transition['channel'], 'health': transition['to'] != 'open',
+                                    'circuit': transition['to']})
+    if transition['to'] == 'closed':
+        retry_queue.expedite(transition['channel'])
+
+breakers = {channel: CircuitBreaker(channel) for channel in service_config}
+
+def send_message(channel, message, attempt=1, overrides=None):
+    """One rate-limited attempt through the channel's driver; a list of messages goes out as one batch.
+
+    overrides are a routing destination's settings (another chat, number
+    or URL) applied on top of the channel's configuration.
+    Retries are scheduled by retry_queue, never slept inline.
+    """
+    driver = CHANNEL_DRIVERS[channel]
+    settings = driver.resolve(overrides)
+    throttle(channel, settings)
+    start_time = time.time()
+    try:
+        if isinstance(message, list):
+            driver.send_batch(message, settings)
+        else:
+            driver.send(message, settings)
+        error = None
+    except Exception as e:
+        error = str(e)[:100]
+    return record_attempt(channel, attempt, error, (time.time() - start_time) * 1000)
+
+async def send_message_async(client, channel, message, attempt=1, overrides=None):
+    """send_message() for the asyncio serving mode: waits and provider calls are awaited, not slept."""
+    driver = CHANNEL_DRIVERS[channel]
+    settings = driver.resolve(overrides)
+    wait = throttle_delay(channel, settings)
+    if wait > 0:
+        await asyncio.sleep(wait)
+    start_time = time.time()
+    try:
+        if isinstance(message, list):
+            await driver.send_batch_async(client, message, settings)
+        else:
+            await driver.send_async(client, message, settings)
+        error = None
+    except Exception as e:
+        error = str(e)[:100]
+    return record_attempt(channel, attempt, error, (time.time() - start_time) * 1000)
+
+def record_attempt(channel, attempt, error, latency_ms):
+    """Breaker, metrics and event log for one provider call; returns whether it succeeded."""
+    success = error is None
+    mark_channel_health(channel, success)
+    record_send(channel, attempt, success, latency_ms)
+    if success:
+        log_system_event(f'{channel.upper()}_SUCCESS', f'{attempt}. deneme ile gönderildi',
+                         channel=channel, attempt=attempt, latency_ms=latency_ms)
+    else:
+        log_system_event(f'{channel.upper()}_ERROR', f'{attempt}. deneme başarısız: {error}', 'ERROR',
+                         channel=channel, attempt=attempt, latency_ms=latency_ms)
+    return success
+
+probe_stop = threading.Event()
+
+def health_prober():
+    """Check each enabled provider with a cheap read-only call, more often while its breaker is open."""
+    next_probe = {}
+    while not probe_stop.wait(1):
+        for channel, cfg in service_config.items():
+            if not cfg['enabled'] or time.time() < next_probe.get(channel, 0):
+                continue
+            try:
+                healthy = bool(CHANNEL_DRIVERS[channel].health_check())
+            except Exception as e:
+                logger.warning(f"{channel} health probe failed: {str(e)[:100]}")
+                healthy = False
+            mark_channel_health(channel, healthy)
+            with state_lock:
+                cfg['last_check'] = datetime.now().isoformat()
+            interval = PROBE_INTERVAL if breakers[channel].state == 'closed' else PROBE_OPEN_INTERVAL
+            next_probe[channel] = time.time() + interval
+
+def format_for_channel(channel, message):
+    """Adapt an ad-hoc (non-alarm) HTML message, e.g. a test message, to the channel."""
+    return CHANNEL_DRIVERS[channel].adapt(message)
+
+class WatchedFile:
+    """Base for settings read from a JSON file and picked up live when it changes.
+
+    refresh() looks at the file's mtime at most every CHECK_INTERVAL seconds
+    and, when it changed, passes the parsed file to reload(), which installs
+    it and returns a summary for RELOADED_EVENT. A file that fails to read,
+    parse or reload (RELOAD_ERRORS) is reported as ERROR_EVENT and the
+    settings already in use are kept.
+    """
+
+    CHECK_INTERVAL = 2
+    RELOAD_ERRORS = (OSError, ValueError)
+    RELOADED_EVENT = ERROR_EVENT = None
+
+    def watch(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.checked = time.time()
+        try:
+            self.mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            self.mtime = None
+
+    def reload(self, spec):
+        raise NotImplementedError
+
+    def refresh(self):
+        now = time.time()
+        if now - self.checked < self.CHECK_INTERVAL:
+            return
+        self.checked = now
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            return
+        with self.lock:
+            if mtime == self.mtime:
+                return
+            self.mtime = mtime
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    summary = self.reload(json.load(f))
+            except self.RELOAD_ERRORS as e:
+                log_system_event(self.ERROR_EVENT, str(e), 'ERROR')
+                return
+        log_system_event(self.RELOADED_EVENT, summary)
+
+# Outbound message templates (config.json "messages": {channel: {"format", "template"}})
+MESSAGE_TEMPLATE_CHECK_INTERVAL = 2
+MARKDOWN_SPECIAL = re.compile(r'([*_~`])')
+
+def escape_markdown(value):
+    """WhatsApp has no escape character; a zero-width space after a marker stops it pairing up."""
+    return '' if value is None else MARKDOWN_SPECIAL.sub('\\1\u200b', str(value))
+
+# html: autoescaped for Telegram's HTML parse mode; text: verbatim; markdown: WhatsApp *bold* / _italic_
+TEMPLATE_ENVIRONMENTS = {
+    'html': Environment(autoescape=True),
+    'text': Environment(autoescape=False),
+    'markdown': Environment(autoescape=False, finalize=escape_markdown)
+}
+
+class MessageTemplates(WatchedFile):
+    """Per-channel alarm templates, compiled once and re-read when config.json changes.
+
+    Channels whose (format, template) pairs are identical share one compiled
+    template and one rendering per alarm. A reload that fails to parse or
+    compile keeps the templates already in use.
+    """
+
+    CHECK_INTERVAL = MESSAGE_TEMPLATE_CHECK_INTERVAL
+    RELOAD_ERRORS = (OSError, ValueError, TemplateError)
+    RELOADED_EVENT, ERROR_EVENT = 'MESSAGE_TEMPLATES_RELOADED', 'MESSAGE_TEMPLATES_ERROR'
+
+    def __init__(self, path, section):
+        self.watch(path)
+        self.defaults = self.compile({})
+        try:
+            self.channels, self.compiled = self.compile(section)
+        except (ValueError, TemplateError) as e:
+            logger.warning(f"Message templates invalid, using defaults: {e}")
+            self.channels, self.compiled = self.defaults
+
+    def compile(self, section):
+        """({channel: (format, source)}, {(format, source): Template}); raises on unknown format or bad syntax."""
+        channels, compiled = {}, {}
+        for channel, driver in CHANNEL_DRIVERS.items():
+            spec = {'format': driver.message_format, 'template': driver.message_template, **section.get(channel, {})}
+            if spec['format'] not in TEMPLATE_ENVIRONMENTS:
+                raise ValueError(f"{channel}: unknown message format {spec['format']!r}")
+            key = (spec['format'], spec['template'])
+            if key not in compiled:
+                previous = getattr(self, 'compiled', {}).get(key)
+                compiled[key] = previous or TEMPLATE_ENVIRONMENTS[spec['format']].from_string(spec['template'])
+            channels[channel] = key
+        return channels, compiled
+
+    def reload(self, spec):
+        self.channels, self.compiled = self.compile(spec.get('messages', {}))
+        return ', '.join(sorted(self.channels))
+
+    def render(self, alarm, channels):
+        """{channel: text} for one alarm, rendering each distinct template once."""
+        self.refresh()
+        channel_keys, compiled = self.channels, self.compiled
+        timestamp = datetime.fromisoformat(alarm['timestamp'])
+        context = {
+            'id': alarm['id'], 'symbol': alarm['symbol'], 'action': alarm['action'], 'price': alarm['price'],
+            'message': alarm['message'], 'timestamp': alarm['timestamp'],
+            'time': timestamp.strftime('%H:%M:%S'), 'date': timestamp.strftime('%d.%m.%Y')
+        }
+        rendered, messages = {}, {}
+        for channel in channels:
+            key = channel_keys[channel]
+            if key not in rendered:
+                try:
+                    rendered[key] = compiled[key].render(context)
+                except Exception as e:
+                    logger.error(f"{channel} message template failed, using default: {e}")
+                    default_channels, default_compiled = self.defaults
+                    rendered[key] = default_compiled[default_channels[channel]].render(context)
+            messages[channel] = rendered[key]
+        return messages
+
+message_templates = MessageTemplates(CONFIG_PATH, app_config.get('messages', {}))
+
+# Routing: data/routing.json decides which destinations get a signal, or drops/throttles it
+ROUTING_PATH = 'data/routing.json'
+ROUTING_CHECK_INTERVAL = 2
+
+class RoutingRule:
+    __slots__ = ('index', 'name', 'symbol', 'prefix', 'regex', 'action', 'strategy',
+                 'targets', 'drop', 'bucket', 'throttle', 'proceed')
+
+    def matches(self, symbol, action, strategy):
+        return ((self.symbol is None or symbol == self.symbol) and
+                (self.prefix is None or symbol.startswith(self.prefix)) and
+                (self.regex is None or self.regex.search(symbol) is not None) and
+                (self.action is None or action == self.action) and
+                (self.strategy is None or strategy == self.strategy))
+
+class Router(WatchedFile):
+    """Compiled routing rules, re-read when the routing file changes.
+
+    The file holds named destinations (a channel plus the settings that
+    differ from its configuration, e.g. another chat_id), an ordered rule
+    list and the default targets:
+
+        {"destinations": {"fx-desk": {"channel": "telegram", "chat_id": "-100123"}},
+         "rules": [{"name": "fx", "symbolPrefix": "EUR", "destinations": ["fx-desk"]},
+                   {"symbolRegex": "^TEST", "drop": true},
+                   {"symbol": "XAUUSD", "throttle": {"perMinute": 6, "burst": 2}}],
+         "default": ["*"]}
+
+    A rule matches on any of symbol, symbolPrefix, symbolRegex, action and
+    strategy (case-insensitive). The first matching rule wins unless it sets
+    "continue", in which case later matches add their destinations too.
+    A rule without destinations uses the default ones; "*" means every
+    channel's own destination. A "throttle" rule lets perMinute signals
+    through and filters the rest.
+
+    Each rule is indexed under its most selective condition: exact symbols
+    and prefixes are dict lookups, action/strategy-only rules are looked up
+    by value, and only regex and catch-all rules are scanned, so routing
+    cost does not grow with the number of symbol rules. A reload that fails
+    to validate keeps the rules already in use.
+    """
+
+    CHECK_INTERVAL = ROUTING_CHECK_INTERVAL
+    RELOAD_ERRORS = (OSError, ValueError, KeyError, TypeError, re.error)
+    RELOADED_EVENT, ERROR_EVENT = 'ROUTING_RELOADED', 'ROUTING_ERROR'
+
+    def __init__(self, path):
+        self.watch(path)
+        self.table = self.compile({})
+        if self.mtime is None:
+            return
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                self.table = self.compile(json.load(f))
+        except self.RELOAD_ERRORS as e:
+            logger.warning(f"Routing rules invalid, delivering to every channel: {e}")
+
+    def compile(self, spec):
+        """Lookup table for one routing file; raises ValueError on unknown channels, settings or destinations."""
+        all_targets = tuple((name, name, None) for name in CHANNEL_DRIVERS)
+        destinations = {}
+        for name, destination in spec.get('destinations', {}).items():
+            channel = destination.get('channel')
+            if channel not in CHANNEL_DRIVERS or name in CHANNEL_DRIVERS:
+                raise ValueError(f"destination {name!r}: unknown channel {channel!r} or name clashes with a channel")
+            overrides = {setting: str(value) for setting, value in destination.items() if setting != 'channel'}
+            unknown = set(overrides) - set(CHANNEL_DRIVERS[channel].settings)
+            if unknown:
+                raise ValueError(f"destination {name!r}: unknown settings {sorted(unknown)}")
+            destinations[name] = (name, channel, overrides)
+
+        def resolve(names, where):
+            targets = {}
+            for name in names:
+                if name == '*':
+                    targets.update((target[0], target) for target in all_targets)
+                elif name in CHANNEL_DRIVERS:
+                    targets[name] = (name, name, None)
+                elif name in destinations:
+                    targets[name] = destinations[name]
+                else:
+                    raise ValueError(f"{where}: unknown destination {name!r}")
+            return tuple(targets.values())
+
+        default = resolve(spec.get('default', ['*']), 'default')
+        previous = {rule.name: rule for rule in getattr(self, 'table', {}).get('rules', ())}
+        table = {'default': default, 'rules': [], 'by_symbol': {}, 'by_prefix': {}, 'by_action': {},
+                 'by_strategy': {}, 'scanned': [], 'prefix_lengths': ()}
+        for index, raw in enumerate(spec.get('rules', [])):
+            rule = RoutingRule()
+            rule.index = index
+            rule.name = str(raw.get('name') or f'rule-{index + 1}')
+            rule.symbol = str(raw['symbol']).upper() if raw.get('symbol') else None
+            rule.prefix = str(raw['symbolPrefix']).upper() if raw.get('symbolPrefix') else None
+            rule.regex = re.compile(raw['symbolRegex'], re.IGNORECASE) if raw.get('symbolRegex') else None
+            rule.action = str(raw['action']).lower() if raw.get('action') else None
+            rule.strategy = str(raw['strategy']).lower() if raw.get('strategy') else None
+            rule.targets = resolve(raw['destinations'], f'rule {rule.name!r}') if 'destinations' in raw else None
+            rule.drop = bool(raw.get('drop'))
+            rule.proceed = bool(raw.get('continue'))
+            rule.throttle = None
+            rule.bucket = None
+            if raw.get('throttle'):
+                rule.throttle = (float(raw['throttle']['perMinute']), int(raw['throttle'].get('burst', 1)))
+                # An unchanged throttle keeps its bucket across reloads
+                kept = previous.get(rule.name)
+                rule.bucket = kept.bucket if kept and kept.throttle == rule.throttle else TokenBucket(rule.throttle[0] / 60, rule.throttle[1])
+            if rule.symbol:
+                table['by_symbol'].setdefault(rule.symbol, []).append(rule)
+            elif rule.prefix:
+                table['by_prefix'].setdefault(rule.prefix, []).append(rule)
+            elif rule.regex is None and rule.action:
+                table['by_action'].setdefault(rule.action, []).append(rule)
+            elif rule.regex is None and rule.strategy:
+                table['by_strategy'].setdefault(rule.strategy, []).append(rule)
+            else:
+                table['scanned'].append(rule)
+            table['rules'].append(rule)
+        table['prefix_lengths'] = tuple(sorted({len(prefix) for prefix in table['by_prefix']}))
+        return table
+
+    def reload(self, spec):
+        self.table = self.compile(spec)
+        return f"{len(self.table['rules'])} kural"
+
+    def route(self, data):
+        """(status, rule names, targets) for one webhook payload.
+
+        status is 'route', 'dropped' or 'throttled'; targets are
+        (key, channel, overrides) tuples for deliver_alarm.
+        """
+        self.refresh()
+        table = self.table
+        symbol = str(data.get('symbol', 'N/A')).upper()
+        action = str(data.get('action', 'N/A')).lower()
+        strategy = str(data.get('strategy', '')).lower()
+        candidates = list(table['by_symbol'].get(symbol, ()))
+        for length in table['prefix_lengths']:
+            if length > len(symbol):
+                break
+            candidates.extend(table['by_prefix'].get(symbol[:length], ()))
+        candidates.extend(table['by_action'].get(action, ()))
+        candidates.extend(table['by_strategy'].get(strategy, ()))
+        candidates.extend(table['scanned'])
+        candidates.sort(key=lambda rule: rule.index)
+
+        names, targets = [], {}
+        for rule in candidates:
+            if not rule.matches(symbol, action, strategy):
+                continue
+            names.append(rule.name)
+            if rule.drop:
+                return 'dropped', names, ()
+            if rule.bucket is not None and not rule.bucket.take():
+                return 'throttled', names, ()
+            targets.update((target[0], target) for target in (table['default'] if rule.targets is None else rule.targets))
+            if not rule.proceed:
+                break
+        if not names:
+            return 'route', ['default'], table['default']
+        return 'route', names, tuple(targets.values())
+
+router = Router(ROUTING_PATH)
+
+class ChannelPool:
+    """Fixed set of worker threads with a bounded job queue, one per channel."""
+
+    def __init__(self, name, workers=CHANNEL_POOL_WORKERS, max_pending=CHANNEL_POOL_QUEUE_SIZE):
+        self.name = name
+        self.jobs = queue.Queue(maxsize=max_pending)
+        self.threads = []
+        for i in range(workers):
+            thread = threading.Thread(target=self._run, name=f'{name}-sender-{i}', daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def submit(self, fn, *args):
+        """Queue fn(*args) and return a Future; raises queue.Full when the pool is saturated."""
+        future = Future()
+        self.jobs.put_nowait((future, fn, args))
+        return future
+
+    def _run(self):
+        while True:
+            job = self.jobs.get()
+            try:
+                if job is _DELIVERY_STOP:
+                    return
+                future, fn, args = job
+                if future.set_running_or_notify_cancel():
+                    try:
+                        future.set_result(fn(*args))
+                    except Exception as e:
+                        future.set_exception(e)
+            finally:
+                self.jobs.task_done()
+
+    def stop(self, deadline):
+        for _ in self.threads:
+            try:
+                self.jobs.put(_DELIVERY_STOP, timeout=max(deadline - time.time(), 0.01))
+            except queue.Full:
+                break
+        for thread in self.threads:
+            thread.join(max(deadline - time.time(), 0))
+        self.threads.clear()
+
+    def take_pending(self):
+        """Remove the jobs no thread has started; returns them as (future, fn, args)."""
+        jobs = []
+        while True:
+            try:
+                job = self.jobs.get_nowait()
+            except queue.Empty:
+                return jobs
+            self.jobs.task_done()
+            if job is not _DELIVERY_STOP:
+                jobs.append(job)
+
+class AsyncChannelPool:
+    """ChannelPool for the asyncio serving mode: each job is a coroutine on the server's event loop.
+
+    submit() keeps ChannelPool's contract (callable from any thread, returns
+    a concurrent Future, raises queue.Full) and runs the async counterpart
+    of the job from ASYNC_JOBS. max_pending bounds the jobs in flight, so an
+    in-flight send costs a coroutine rather than a thread.
+    """
+
+    def __init__(self, name, loop, client, max_pending=CHANNEL_POOL_QUEUE_SIZE):
+        self.name = name
+        self.loop = loop
+        self.client = client
+        self.max_pending = max_pending
+        self.pending = 0
+        self.lock = threading.Lock()
+
+    def submit(self, fn, *args):
+        with self.lock:
+            if self.pending >= self.max_pending:
+                raise queue.Full
+            self.pending += 1
+        return asyncio.run_coroutine_threadsafe(self._run(ASYNC_JOBS[fn], args), self.loop)
+
+    async def _run(self, job, args):
+        try:
+            return await job(self.client, *args)
+        finally:
+            with self.lock:
+                self.pending -= 1
+
+    def stop(self, deadline):
+        """Wait for the jobs in flight; must not be called from the loop's own thread."""
+        while self.pending and time.time() < deadline:
+            time.sleep(0.05)
+
+class Coalescer:
+    """Collects alarm messages per destination and hands them to the channel pool in batches.
+
+    A batch is flushed `linger` seconds after its first message, or as soon
+    as it holds `max_batch` messages (the driver's values, else the coalesce
+    config). Each message keeps its own Future, resolved when the batch that
+    carried it has been sent.
+    """
+
+    def __init__(self, channel):
+        driver = CHANNEL_DRIVERS[channel]
+        self.channel = channel
+        self.linger = COALESCE_LINGER if driver.linger is None else driver.linger
+        self.max_batch = COALESCE_MAX_BATCH if driver.max_batch is None else driver.max_batch
+        self.pending = {}   # destination -> (deadline, overrides, [(text, alarm_id, future), ...])
+        self.cond = threading.Condition()
+        self.stopping = False
+        self.thread = threading.Thread(target=self._run, name=f'{channel}-coalescer', daemon=True)
+        self.thread.start()
+
+    def add(self, text, alarm_id, overrides=None):
+        future = Future()
+        # Everything that decides where a batch goes, so two routes never share one provider call
+        destination = tuple(sorted(CHANNEL_DRIVERS[self.channel].resolve(overrides).items()))
+        with self.cond:
+            if self.stopping:
+                ready = [(text, alarm_id, future)]
+            else:
+                deadline, _, items = self.pending.setdefault(destination, (time.time() + self.linger, overrides, []))
+                items.append((text, alarm_id, future))
+                ready = None
+                if len(items) >= self.max_batch:
+                    ready = self.pending.pop(destination)[2]
+                elif len(items) == 1:
+                    self.cond.notify()
+        if ready:
+            self._submit(ready, overrides)
+        return future
+
+    def _submit(self, items, overrides):
+        try:
+            channel_pools[self.channel].submit(deliver_batch, self.channel, items, overrides)
+        except queue.Full:
+            log_system_event(f'{self.channel.upper()}_ERROR', f'Gönderim havuzu dolu, {len(items)} mesaj yeniden denenecek', 'ERROR', channel=self.channel)
+            for text, alarm_id, future in items:
+                retry_queue.schedule(self.channel, text, alarm_id, 1, overrides=overrides)
+                future.set_result(False)
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while not self.stopping:
+                    now = time.time()
+                    due = [destination for destination, (deadline, _, _) in self.pending.items() if deadline <= now]
+                    if due:
+                        break
+                    next_deadline = min((deadline for deadline, _, _ in self.pending.values()), default=None)
+                    self.cond.wait(next_deadline - now if next_deadline else None)
+                if self.stopping:
+                    return
+                batches = [self.pending.pop(destination)[1:] for destination in due]
+            for overrides, items in batches:
+                self._submit(items, overrides)
+
+    def stop(self):
+        """Flush everything still lingering; later adds are submitted straight away."""
+        with self.cond:
+            self.stopping = True
+            batches = [(overrides, items) for _, overrides, items in self.pending.values()]
+            self.pending.clear()
+            self.cond.notify()
+        for overrides, items in batches:
+            self._submit(items, overrides)
+        self.thread.join(1)
+
+def pack_batches(channel, items):
+    """Split items into groups whose joined text fits the provider's message size limit."""
+    limit = CHANNEL_DRIVERS[channel].max_message_chars
+    if limit is None:
+        return [items]
+    groups, size = [], 0
+    for item in items:
+        extra = len(COALESCE_SEPARATOR) + len(item[0])
+        if groups and size + extra <= limit:
+            groups[-1].append(item)
+            size += extra
+        else:
+            groups.append([item])
+            size = len(item[0])
+    return groups
+
+def park_if_open(channel, group, overrides):
+    """Provider is known to be down: park the alarms in the durable backlog untouched; True if parked."""
+    breaker = breakers[channel]
+    if breaker.allow():
+        return False
+    for text, alarm_id, future in group:
+        retry_queue.schedule(channel, text, alarm_id, 1, delay=breaker.retry_after(), overrides=overrides)
+        if future:
+            future.set_result(False)
+    return True
+
+def destination_id(overrides):
+    """Short, secret-free name of a routed destination within its channel ('' for the channel's own)."""
+    if not overrides:
+        return ''
+    return hashlib.sha256(json.dumps(overrides, sort_keys=True).encode()).hexdigest()[:16]
+
+def settle_group(channel, group, overrides, success, latency_ms):
+    """Record a first attempt for every alarm the call carried; failures are retried with their own text."""
+    if len(group) > 1:
+        coalesced_messages.labels(channel).inc(len(group) - 1)
+    for text, alarm_id, future in group:
+        signal_db.record_delivery(alarm_id, channel, 1, success, latency_ms, destination_id(overrides))
+        if not success:
+            retry_queue.schedule(channel, text, alarm_id, 1, overrides=overrides)
+        if future:
+            future.set_result(success)
+
+def deliver_batch(channel, items, overrides=None):
+    """One provider call per packed group."""
+    for group in pack_batches(channel, items):
+        if park_if_open(channel, group, overrides):
+            continue
+        start_time = time.time()
+        success = send_message(channel, [text for text, _, _ in group], overrides=overrides)
+        settle_group(channel, group, overrides, success, (time.time() - start_time) * 1000)
+
+async def deliver_batch_async(client, channel, items, overrides=None):
+    for group in pack_batches(channel, items):
+        if park_if_open(channel, group, overrides):
+            continue
+        start_time = time.time()
+        success = await send_message_async(client, channel, [text for text, _, _ in group], overrides=overrides)
+        settle_group(channel, group, overrides, success, (time.time() - start_time) * 1000)
+
+def retry_delay(attempt):
+    """Backoff before the next try after `attempt` failures, with equal jitter."""
+    delay = RETRY_BASE_DELAY * (2 ** (attempt - 1)) if RETRY_EXPONENTIAL else RETRY_BASE_DELAY
+    delay = min(delay, RETRY_MAX_DELAY)
+    return random.uniform(delay / 2, delay)
+
+class RetryQueue:
+    """Failed deliveries in a heap keyed on next-attempt time, journaled to an append-only file.
+
+    Journal lines are {"op": "add", "entry": {...}} (also used to reschedule)
+    and {"op": "done", "id": ...}. Each process writes its own journal
+    (data/retry_queue.<instance>.jsonl) and holds an exclusive flock on it.
+    A journal whose lock can be taken belongs to a stopped process: it is
+    replayed into this queue and removed, at startup and every
+    ADOPT_INTERVAL seconds, so entries queued or in flight survive restarts
+    without two workers retrying the same delivery.
+    """
+
+    COMPACT_MIN_RECORDS = 1000
+    ADOPT_INTERVAL = 60
+
+    def __init__(self, path_pattern):
+        self.path_pattern = path_pattern
+        self.path = None
+        self.journal = None
+        self.heap = []      # (next_attempt, entry_id)
+        self.entries = {}   # entry_id -> entry, queued or in flight
+        self.cond = threading.Condition()
+        self.journal_records = 0
+        self.stopping = False
+        self.thread = None
+        self.last_adopt = 0
+
+    def _open_journal(self, path):
+        journal = open(path, 'a', encoding='utf-8')
+        fcntl.flock(journal, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return journal
+
+    @staticmethod
+    def _replay(f):
+        entries, records = {}, 0
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # torn last line after a crash
+            records += 1
+            if record['op'] == 'done':
+                entries.pop(record['id'], None)
+            else:
+                entries[record['entry']['id']] = record['entry']
+        return entries, records
+
+    def adopt_orphans(self):
+        """Take over journals left by processes that are no longer running."""
+        adopted = 0
+        for path in glob.glob(self.path_pattern.format(instance='*')) + [RETRY_QUEUE_LEGACY_PATH]:
+            if path == self.path or not os.path.exists(path):
+                continue
+            with open(path, 'r+', encoding='utf-8') as f:
+                try:
+                    fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    continue  # owner is alive
+                try:
+                    if os.stat(path).st_ino != os.fstat(f.fileno()).st_ino:
+                        continue  # already adopted and replaced meanwhile
+                except FileNotFoundError:
+                    continue
+                entries, _ = self._replay(f)
+                with self.cond:
+                    for entry in entries.values():
+                        self.entries[entry['id']] = entry
+                        self._append({'op': 'add', 'entry': entry})
+                        heapq.heappush(self.heap, (entry['next_attempt'], entry['id']))
+                    self.cond.notify()
+                os.remove(path)  # while still locked, so no one else replays it
+                adopted += len(entries)
+        self.last_adopt = time.time()
+        if adopted:
+            logger.info(f"Retry queue restored: {adopted} pending")
+
+    def _append(self, record):
+        self.journal.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self.journal.flush()
+        self.journal_records += 1
+        if self.journal_records > self.COMPACT_MIN_RECORDS and self.journal_records > 4 * len(self.entries):
+            self._compact()
+
+    def _compact(self):
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for entry in self.entries.values():
+                f.write(json.dumps({'op': 'add', 'entry': entry}, ensure_ascii=False) + '\n')
+        # Lock the new file before it replaces the old one so it is never seen unowned
+        journal = self._open_journal(tmp_path)
+        os.replace(tmp_path, self.path)
+        self.journal.close()
+        self.journal = journal
+        self.journal_records = len(self.entries)
 
-# Enhanced Storage
-alarms = []
-service_config = {
-    'telegram': {'enabled': True, 'health': True, 'last_check': None, 'retry_count': 0},
-    'whatsapp': {'enabled': False, 'health': True, 'last_check': None, 'retry_count': 0}
-}
+    def schedule(self, channel, message, alarm_id, attempt, delay=None, overrides=None):
+        """Queue a retry after `attempt` failed tries; returns False once attempts are used up.
 
-# Security System
-ADMIN_PASSWORD_HASH = hashlib.sha256('ParatonerPro2025!'.encode()).hexdigest()
-api_keys_config = {
-    'telegram': {'token': '', 'chat_id': ''},
-    'whatsapp': {'account_sid': '', 'auth_token': '', 'from_number': '', 'to_number': ''}
-}
+        delay overrides the backoff (used to park sends while a breaker is open);
+        overrides are the routing destination's settings, kept so the retry
+        goes to the same chat.
+        """
+        entry = {
+            'id': secrets.token_hex(8), 'channel': channel, 'message': message,
+            'alarm_id': alarm_id, 'attempt': attempt, 'created_at': time.time()
+        }
+        if overrides:
+            entry['overrides'] = overrides
+        return self._push(entry, delay)
 
-# System metrics
-system_metrics = {
-    'total_signals': 0,
-    'success_rate': {'telegram': 0, 'whatsapp': 0},
-    'average_delay': 0,
-    'last_restart': datetime.now(),
-    'uptime': 0
-}
+    def reschedule(self, entry, attempt, delay=None):
+        entry = dict(entry, attempt=attempt)
+        return self._push(entry, delay)
 
-# Retry mechanism
-retry_queue = []
+    def _push(self, entry, delay=None):
+        with self.cond:
+            if entry['attempt'] >= RETRY_MAX_ATTEMPTS:
+                if self.entries.pop(entry['id'], None) is not None:
+                    self._append({'op': 'done', 'id': entry['id']})
+                log_system_event('RETRY_EXHAUSTED', f"{entry['channel']} - {entry['alarm_id']} ({entry['attempt']} deneme)", 'ERROR',
+                                 channel=entry['channel'], attempt=entry['attempt'])
+                return False
+            entry['next_attempt'] = time.time() + (retry_delay(entry['attempt']) if delay is None else delay)
+            self.entries[entry['id']] = entry
+            self._append({'op': 'add', 'entry': entry})
+            heapq.heappush(self.heap, (entry['next_attempt'], entry['id']))
+            self.cond.notify()
+        return True
 
-# Enhanced Configuration with API Key Management
-def load_api_keys():
-    global api_keys_config
-    # Load from environment first, then allow dashboard override
-    api_keys_config['telegram']['token'] = os.environ.get('TELEGRAM_BOT_TOKEN', '')
-    api_keys_config['telegram']['chat_id'] = os.environ.get('TELEGRAM_CHAT_ID', '')
-    api_keys_config['whatsapp']['account_sid'] = os.environ.get('TWILIO_ACCOUNT_SID', '')
-    api_keys_config['whatsapp']['auth_token'] = os.environ.get('TWILIO_AUTH_TOKEN', '')
-    api_keys_config['whatsapp']['from_number'] = os.environ.get('TWILIO_FROM_NUMBER', '')
-    api_keys_config['whatsapp']['to_number'] = os.environ.get('TWILIO_TO_NUMBER', '')
+    def complete(self, entry):
+        with self.cond:
+            if self.entries.pop(entry['id'], None) is not None:
+                self._append({'op': 'done', 'id': entry['id']})
 
-load_api_keys()
-WEBHOOK_URL = 'https://wtel.onrender.com/webhook/tradingview'
+    def expedite(self, channel):
+        """Make every parked entry for channel due within a second (its breaker just closed)."""
+        with self.cond:
+            now = time.time()
+            for entry in self.entries.values():
+                if entry['channel'] == channel and entry['next_attempt'] > now + 1:
+                    entry['next_attempt'] = now + random.uniform(0, 1)
+                    heapq.heappush(self.heap, (entry['next_attempt'], entry['id']))
+            self.cond.notify()
 
-# Security functions
-def verify_password(password):
-    return hashlib.sha256(password.encode()).hexdigest() == ADMIN_PASSWORD_HASH
+    def pending_for(self, alarm_id):
+        with self.cond:
+            return any(entry['alarm_id'] == alarm_id for entry in self.entries.values())
 
-def log_system_event(event_type, message, level='INFO'):
-    timestamp = datetime.now().strftime('%d.%m.%Y %H:%M:%S')
-    
-    # User-friendly log messages
-    friendly_messages = {
-        'TELEGRAM_SUCCESS': f'✅ Telegram mesajı başarıyla gönderildi: {message}',
-        'WHATSAPP_SUCCESS': f'✅ WhatsApp mesajı başarıyla gönderildi: {message}',
-        'TELEGRAM_ERROR': f'❌ Telegram hatası: {message}',
-        'WHATSAPP_ERROR': f'❌ WhatsApp hatası: {message}',
-        'API_KEYS_UPDATED': f'🔑 API anahtarları güncellendi',
-        'DATA_EXPORT': f'💾 Veri yedeği oluşturuldu: {message}',
-        'WEBHOOK_RECEIVED': f'📨 Yeni sinyal alındı: {message}',
-        'SERVICE_TOGGLE': f'⚙️ Servis durumu değiştirildi: {message}'
-    }
-    
-    friendly_msg = friendly_messages.get(event_type, f'ℹ️ {event_type}: {message}')
-    log_entry = f"{timestamp} | {friendly_msg}"
-    
-    with open('logs/system.log', 'a', encoding='utf-8') as f:
-        f.write(log_entry + '\n')
-    
-    if level == 'ERROR':
-        logger.error(f"{event_type}: {message}")
-    elif level == 'WARNING':
-        logger.warning(f"{event_type}: {message}")
+    def stats(self):
+        with self.cond:
+            oldest = min((entry['created_at'] for entry in self.entries.values()), default=None)
+            return {
+                'depth': len(self.entries),
+                'oldest_pending_age_seconds': time.time() - oldest if oldest else 0
+            }
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while not self.stopping:
+                    now = time.time()
+                    if self.heap and self.heap[0][0] <= now:
+                        break
+                    until_adopt = self.last_adopt + self.ADOPT_INTERVAL - now
+                    if until_adopt <= 0:
+                        break
+                    self.cond.wait(min(self.heap[0][0] - now, until_adopt) if self.heap else until_adopt)
+                if self.stopping:
+                    return
+                due = bool(self.heap) and self.heap[0][0] <= time.time()
+                if due:
+                    next_attempt, entry_id = heapq.heappop(self.heap)
+                    entry = self.entries.get(entry_id)
+            if not due:
+                self.adopt_orphans()
+                continue
+            if entry is None or entry['next_attempt'] != next_attempt:
+                continue  # completed or superseded by a reschedule
+            try:
+                channel_pools[entry['channel']].submit(run_retry, entry)
+            except queue.Full:
+                # Channel is saturated; look again after one base delay without journaling
+                with self.cond:
+                    entry['next_attempt'] = time.time() + RETRY_BASE_DELAY
+                    heapq.heappush(self.heap, (entry['next_attempt'], entry['id']))
+
+    def start(self):
+        self.stopping = False
+        if self.journal is None:
+            self.path = self.path_pattern.format(instance=instance_id())
+            self.journal = self._open_journal(self.path)
+        self.adopt_orphans()
+        self.thread = threading.Thread(target=self._run, name='retry-scheduler', daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout=None):
+        with self.cond:
+            self.stopping = True
+            self.cond.notify()
+        if self.thread:
+            self.thread.join(timeout)
+            self.thread = None
+
+retry_queue = RetryQueue(RETRY_QUEUE_PATH)
+
+def find_alarm(alarm_id):
+    return alarms.get(alarm_id)
+
+def update_alarm(alarm_id, **fields):
+    """Apply delivery fields to the in-memory alarm (if still warm) and persist them."""
+    alarm = find_alarm(alarm_id)
+    if alarm is not None:
+        for key, value in fields.items():
+            alarm[key] = value
+    signal_db.update(alarm_id, **fields)
+    broadcaster.publish('delivery', dict(fields, id=alarm_id))
+
+def deliver_to_channel(channel, message, alarm_id=None, overrides=None):
+    """First attempt for one channel; a failed alarm delivery goes to the retry queue."""
+    if not alarm_id:
+        return send_message(channel, message, overrides=overrides)
+    group = [(message, alarm_id, None)]
+    if park_if_open(channel, group, overrides):
+        return False
+    start_time = time.time()
+    success = send_message(channel, message, overrides=overrides)
+    settle_group(channel, group, overrides, success, (time.time() - start_time) * 1000)
+    return success
+
+async def deliver_to_channel_async(client, channel, message, alarm_id=None, overrides=None):
+    if not alarm_id:
+        return await send_message_async(client, channel, message, overrides=overrides)
+    group = [(message, alarm_id, None)]
+    if park_if_open(channel, group, overrides):
+        return False
+    start_time = time.time()
+    success = await send_message_async(client, channel, message, overrides=overrides)
+    settle_group(channel, group, overrides, success, (time.time() - start_time) * 1000)
+    return success
+
+def retry_parked(entry):
+    """While the breaker is open the retry does not count as an attempt; look again when it may let a trial through."""
+    breaker = breakers[entry['channel']]
+    if breaker.allow():
+        return False
+    retry_queue.reschedule(entry, entry['attempt'], delay=breaker.retry_after())
+    return True
+
+def run_retry(entry):
+    if retry_parked(entry):
+        return False
+    attempt = entry['attempt'] + 1
+    start_time = time.time()
+    success = send_message(entry['channel'], entry['message'], attempt, entry.get('overrides'))
+    settle_retry(entry, attempt, success, (time.time() - start_time) * 1000)
+    return success
+
+async def run_retry_async(client, entry):
+    if retry_parked(entry):
+        return False
+    attempt = entry['attempt'] + 1
+    start_time = time.time()
+    success = await send_message_async(client, entry['channel'], entry['message'], attempt, entry.get('overrides'))
+    settle_retry(entry, attempt, success, (time.time() - start_time) * 1000)
+    return success
+
+def settle_retry(entry, attempt, success, latency_ms):
+    signal_db.record_delivery(entry['alarm_id'], entry['channel'], attempt, success, latency_ms, destination_id(entry.get('overrides')))
+    if success:
+        retry_queue.complete(entry)
+        fields = {field: True for field in (f"{entry['channel']}_success",) if field in AlarmRecord.__slots__}
+    elif retry_queue.reschedule(entry, attempt):
+        return
     else:
-        logger.info(f"{event_type}: {message}")
+        fields = {}
+    if not retry_queue.pending_for(entry['alarm_id']):
+        # Last destination settled: the status covers all of them, not just this one
+        signal_db.flush()
+        fields['delivery_status'] = signal_db.delivery_outcome(entry['alarm_id']) or ('delivered' if success else 'failed')
+    if fields:
+        update_alarm(entry['alarm_id'], **fields)
 
-def measure_latency(func):
-    def wrapper(*args, **kwargs):
-        start_time = time.time()
-        result = func(*args, **kwargs)
-        end_time = time.time()
-        latency = (end_time - start_time) * 1000  # Convert to milliseconds
-        return result, latency
-    return wrapper
-
-def send_telegram_with_retry(message, max_retries=3):
-    for attempt in range(max_retries):
+def dispatch_to_channels(message, channels=None, alarm_id=None):
+    """Hand the message to each channel's pool at once; returns {target key: Future}.
+
+    message is either {channel: rendered text} (alarms) or one ad-hoc HTML
+    string adapted per channel by format_for_channel.
+
+    channels holds channel names and/or routing targets (key, channel,
+    overrides); a plain name is keyed by itself. With channels=None every
+    enabled channel in service_config is used.
+    A saturated pool yields a Future that already resolved to False (and,
+    for alarms, a scheduled retry).
+    """
+    if channels is None:
+        sync_shared_state()
+        channels = [name for name, cfg in service_config.items() if cfg['enabled']]
+    futures = {}
+    for target in channels:
+        key, channel, overrides = (target, target, None) if isinstance(target, str) else target
+        text = message[channel] if isinstance(message, dict) else format_for_channel(channel, message)
+        if alarm_id and channel in coalescers and coalescers[channel].linger > 0:
+            futures[key] = coalescers[channel].add(text, alarm_id, overrides)
+            continue
         try:
-            url = f'https://api.telegram.org/bot{api_keys_config["telegram"]["token"]}/sendMessage'
-            payload = {'chat_id': api_keys_config['telegram']['chat_id'], 'text': message, 'parse_mode': 'HTML'}
-            response = requests.post(url, json=payload, timeout=10)
-            if response.status_code == 200:
-                service_config['telegram']['health'] = True
-                service_config['telegram']['retry_count'] = 0
-                log_system_event('TELEGRAM_SUCCESS', f'1. deneme ile gönderildi' if attempt == 0 else f'{attempt + 1}. deneme ile gönderildi')
-                return True
+            futures[key] = channel_pools[channel].submit(deliver_to_channel, channel, text, alarm_id, overrides)
+        except queue.Full:
+            log_system_event(f'{channel.upper()}_ERROR', 'Gönderim havuzu dolu, mesaj yeniden denenecek', 'ERROR', channel=channel)
+            if alarm_id:
+                retry_queue.schedule(channel, text, alarm_id, 1, overrides=overrides)
+            futures[key] = Future()
+            futures[key].set_result(False)
+    return futures
+
+def enabled_targets(targets=None):
+    """The routed (key, channel, overrides) targets whose channel is enabled; None means every channel."""
+    sync_shared_state()
+    if targets is None:
+        targets = [(name, name, None) for name in CHANNEL_DRIVERS]
+    return [target for target in targets if service_config[target[1]]['enabled']]
+
+def deliver_alarm(alarm, targets=None):
+    """Fan a stored alarm out to its routed targets on enabled channels and record the outcome on it.
+
+    targets are the (key, channel, overrides) picked by the router; None
+    means every channel's own destination. Returns as soon as the sends are
+    queued; each target's result is written back to the alarm by its
+    channel's pool, so a stuck provider never holds this worker.
+    """
+    targets = enabled_targets(targets)
+    if not targets:
+        # Every routed channel is switched off: nothing was sent, which is not the same as delivered
+        update_alarm(alarm['id'], delivery_status='skipped')
+        log_system_event('DELIVERY_SKIPPED', f"{alarm['symbol']} ({alarm['action']})", 'WARNING')
+        return
+    channel_of = {key: channel for key, channel, _ in targets}
+    channels = list(dict.fromkeys(channel_of.values()))
+    futures = dispatch_to_channels(message_templates.render(alarm, channels), targets, alarm_id=alarm['id'])
+    
+    remaining = [len(futures)]
+    results = {}
+    lock = threading.Lock()
+    
+    def on_done(key, future):
+        try:
+            success = bool(future.result())
         except Exception as e:
-            log_system_event('TELEGRAM_ERROR', f'{attempt + 1}. deneme başarısız: {str(e)[:100]}', 'ERROR')
-            service_config['telegram']['retry_count'] += 1
-            if attempt < max_retries - 1:
-                time.sleep(2 ** attempt)  # Exponential backoff
+            logger.error(f"{key} delivery error: {e}")
+            success = False
+        with lock:
+            results[key] = success
+            remaining[0] -= 1
+            finished = remaining[0] == 0
+        if finished:
+            if all(results.values()):
+                status = 'delivered'
+            elif retry_queue.pending_for(alarm['id']):
+                status = 'retrying'
+            else:
+                status = 'partial' if any(results.values()) else 'failed'
+            # Only telegram/whatsapp have per-alarm columns (true when every routed chat got it);
+            # every target's attempts are in deliveries
+            fields = {}
+            for key, ok in results.items():
+                field = f'{channel_of[key]}_success'
+                if field in AlarmRecord.__slots__:
+                    fields[field] = fields.get(field, True) and ok
+            update_alarm(alarm['id'], delivery_status=status, **fields)
+            summary = ', '.join(f"{CHANNEL_DRIVERS[key].label if key in CHANNEL_DRIVERS else key}: {'✅' if ok else '❌'}"
+                                for key, ok in results.items())
+            log_system_event('WEBHOOK_RECEIVED', f"{alarm['symbol']} ({alarm['action']}) - {summary}")
+            logger.info(f"Webhook: {alarm['symbol']} - {summary}")
     
-    service_config['telegram']['health'] = False
-    return False
+    for key, future in futures.items():
+        future.add_done_callback(lambda f, key=key: on_done(key, f))
 
-def send_whatsapp_with_retry(message, max_retries=3):
-    for attempt in range(max_retries):
+def delivery_worker():
+    while True:
+        job = delivery_queue.get()
         try:
-            client = Client(api_keys_config['whatsapp']['account_sid'], api_keys_config['whatsapp']['auth_token'])
-            message_obj = client.messages.create(
-                body=message, 
-                from_=f'whatsapp:{api_keys_config["whatsapp"]["from_number"]}', 
-                to=f'whatsapp:{api_keys_config["whatsapp"]["to_number"]}'
-            )
-            if message_obj.sid:
-                service_config['whatsapp']['health'] = True
-                service_config['whatsapp']['retry_count'] = 0
-                log_system_event('WHATSAPP_SUCCESS', f'1. deneme ile gönderildi' if attempt == 0 else f'{attempt + 1}. deneme ile gönderildi')
-                return True
+            if job is _DELIVERY_STOP:
+                return
+            deliver_alarm(*job)
         except Exception as e:
-            log_system_event('WHATSAPP_ERROR', f'{attempt + 1}. deneme başarısız: {str(e)[:100]}', 'ERROR')
-            service_config['whatsapp']['retry_count'] += 1
-            if attempt < max_retries - 1:
-                time.sleep(2 ** attempt)  # Exponential backoff
+            logger.error(f"Delivery worker error: {e}")
+        finally:
+            delivery_queue.task_done()
+
+def start_delivery_workers(count=DELIVERY_WORKERS):
+    for channel in service_config:
+        driver = CHANNEL_DRIVERS[channel]
+        channel_pools[channel] = ChannelPool(channel, driver.workers, driver.queue_size)
+        coalescers[channel] = Coalescer(channel)
+    signal_db.start()
+    retry_queue.start()
+    threading.Thread(target=metrics_publisher, name='metrics-publisher', daemon=True).start()
+    threading.Thread(target=stream_metrics_publisher, name='stream-metrics', daemon=True).start()
+    probe_stop.clear()
+    threading.Thread(target=health_prober, name='health-prober', daemon=True).start()
+    for i in range(count):
+        thread = threading.Thread(target=delivery_worker, name=f'delivery-{i}', daemon=True)
+        thread.start()
+        delivery_threads.append(thread)
+
+ASYNC_JOBS = {deliver_to_channel: deliver_to_channel_async, deliver_batch: deliver_batch_async, run_retry: run_retry_async}
+
+def start_async_delivery(loop, client):
+    """Move every channel's sends onto loop (the ASGI server's), sharing the httpx client's connection pool.
+
+    Intake, coalescing and the retry scheduler keep their threads; only the
+    provider calls, which used to hold a pool thread each, become coroutines.
+    """
+    for channel, driver in CHANNEL_DRIVERS.items():
+        previous = channel_pools.get(channel)
+        channel_pools[channel] = AsyncChannelPool(channel, loop, client, driver.queue_size)
+        if isinstance(previous, ChannelPool):
+            previous.stop(time.time() + DELIVERY_DRAIN_TIMEOUT)
+
+def journal_leftovers():
+    """Move work the drain did not reach into the retry journal, due at once; returns the number of sends.
+
+    The journal is replayed by the next start (or adopted by a live worker),
+    so alarms still queued for fan-out and first attempts still queued in a
+    channel pool are not lost. Retries in flight are journaled already.
+    """
+    moved = 0
+    while True:
+        try:
+            job = delivery_queue.get_nowait()
+        except queue.Empty:
+            break
+        delivery_queue.task_done()
+        if job is _DELIVERY_STOP:
+            continue
+        alarm, targets = job
+        targets = enabled_targets(targets)
+        messages = message_templates.render(alarm, list(dict.fromkeys(channel for _, channel, _ in targets)))
+        for _, channel, overrides in targets:
+            retry_queue.schedule(channel, messages[channel], alarm['id'], 0, delay=0, overrides=overrides)
+        moved += len(targets)
+        update_alarm(alarm['id'], delivery_status='retrying' if targets else 'skipped')
+    for channel, pool in channel_pools.items():
+        if not isinstance(pool, ChannelPool):
+            continue    # the asyncio pool queues nothing; its sends in flight were waited for
+        for future, fn, args in pool.take_pending():
+            if fn is deliver_to_channel:
+                _, text, alarm_id, overrides = args
+                items = [(text, alarm_id, None)] if alarm_id else []
+            elif fn is deliver_batch:
+                _, items, overrides = args
+            else:
+                items = []
+            for text, alarm_id, item_future in items:
+                retry_queue.schedule(channel, text, alarm_id, 0, delay=0, overrides=overrides)
+                if item_future:
+                    item_future.set_result(False)
+            moved += len(items)
+            future.set_result(False)
+    return moved
+
+def stop_delivery_workers(timeout=DELIVERY_DRAIN_TIMEOUT):
+    """Let queued alarms finish, then stop the workers (bounded by timeout)."""
+    # Open dashboard streams would otherwise keep the server waiting on their requests
+    broadcaster.close()
+    if not delivery_threads:
+        return
+    # Stop feeding retries first; anything still journaled is replayed on next start
+    probe_stop.set()
+    retry_queue.stop(timeout)
+    pending = delivery_queue.qsize()
+    if pending:
+        logger.info(f"Draining delivery queue: {pending} pending")
+    deadline = time.time() + timeout
+    for _ in delivery_threads:
+        # Sentinels queue up behind pending jobs, so the workers drain before exiting
+        try:
+            delivery_queue.put(_DELIVERY_STOP, timeout=max(deadline - time.time(), 0.01))
+        except queue.Full:
+            break
+    for thread in delivery_threads:
+        thread.join(max(deadline - time.time(), 0))
+    delivery_threads.clear()
+    # Intake is drained; flush lingering batches, then let each channel finish the sends it holds
+    for coalescer in coalescers.values():
+        coalescer.stop()
+    for pool in channel_pools.values():
+        pool.stop(deadline)
+    moved = journal_leftovers()
+    if moved:
+        logger.warning(f"Drain timed out: {moved} deliveries journaled for the next start")
+    signal_db.stop(max(deadline - time.time(), 1))
+    try:
+        publish_metrics()
+    except sqlite3.Error as e:
+        logger.warning(f"Final metrics publish failed: {e}")
+
+# serve.py defers these to each worker after the fork: threads do not survive it
+if os.environ.get('PARATONER_DEFER_SERVICES') != '1':
+    start_delivery_workers()
+atexit.register(stop_delivery_workers)
+
+# Static assets: public/ is read once at startup, fingerprinted and precompressed
+ASSET_DIR = 'public'
+ASSET_MAX_AGE = 31536000
+COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/json', 'image/svg+xml')
+
+class StaticAssets:
+    """In-memory copies of public/ keyed by fingerprinted name (style.<hash>.css).
+
+    Fingerprinted URLs never change content, so they are served with a
+    one-year immutable Cache-Control; the plain name still works but must be
+    revalidated. Each asset is compressed once here, never per request.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.assets = {}    # served name -> asset
+        self.urls = {}      # source name -> fingerprinted name
+
+    def load(self):
+        assets, urls = {}, {}
+        for path in sorted(Path(self.directory).rglob('*')):
+            if not path.is_file():
+                continue
+            name = path.relative_to(self.directory).as_posix()
+            body = path.read_bytes()
+            digest = hashlib.sha256(body).hexdigest()[:12]
+            mimetype = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+            asset = {'body': body, 'etag': digest, 'mimetype': mimetype, 'encodings': {}}
+            if mimetype.startswith(COMPRESSIBLE_TYPES):
+                asset['encodings']['gzip'] = gzip.compress(body, 9, mtime=0)
+                if brotli is not None:
+                    asset['encodings']['br'] = brotli.compress(body)
+            stem, dot, suffix = name.rpartition('.')
+            fingerprinted = f'{stem}.{digest}.{suffix}' if dot else f'{name}.{digest}'
+            assets[name] = dict(asset, immutable=False)
+            assets[fingerprinted] = dict(asset, immutable=True)
+            urls[name] = fingerprinted
+        self.assets, self.urls = assets, urls
+
+    def url(self, name):
+        return f"/static/{self.urls.get(name, name)}"
+
+    def response(self, name):
+        asset = self.assets.get(name)
+        if asset is None:
+            return jsonify({'error': 'Not found'}), 404
+        cache_control = f'public, max-age={ASSET_MAX_AGE}, immutable' if asset['immutable'] else 'public, no-cache'
+        headers = {'ETag': f'"{asset["etag"]}"', 'Cache-Control': cache_control, 'Vary': 'Accept-Encoding'}
+        if request.if_none_match.contains(asset['etag']):
+            return Response(status=304, headers=headers)
+        body = asset['body']
+        for encoding in ('br', 'gzip'):
+            if encoding in asset['encodings'] and encoding in request.accept_encodings:
+                body = asset['encodings'][encoding]
+                headers['Content-Encoding'] = encoding
+                break
+        return Response(body, mimetype=asset['mimetype'], headers=headers)
+
+static_assets = StaticAssets(ASSET_DIR)
+static_assets.load()
+app.jinja_env.globals['asset_url'] = static_assets.url
+
+@app.route('/static/<path:filename>')
+def static_file(filename):
+    return static_assets.response(filename)
+
+# Webhook ingress: cheap checks that turn away floods and malformed signals before any storage or provider call
+INGRESS_CONFIG = app_config.get('ingress', {})
+INGRESS_MAX_BODY = int(INGRESS_CONFIG.get('maxBodyBytes', 16384))
+INGRESS_MAX_BATCH_BODY = int(INGRESS_CONFIG.get('maxBatchBodyBytes', 1024 * 1024))
+INGRESS_MAX_BATCH_ITEMS = int(INGRESS_CONFIG.get('maxBatchItems', 500))
+# Per-source limits apply per worker process and only to requests no secret vouches for. TradingView sends
+# every alert from a few shared addresses, dozens in the same second at bar close, so the burst stays large.
+INGRESS_RATE = INGRESS_CONFIG.get('perIpPerSecond', 20)
+INGRESS_BURST = int(INGRESS_CONFIG.get('perIpBurst', 200))
+INGRESS_MAX_SOURCES = int(INGRESS_CONFIG.get('maxSources', 10000))
+INGRESS_BODY_LIMITS = {'webhook': INGRESS_MAX_BODY, 'webhook_batch': INGRESS_MAX_BATCH_BODY}
+SYMBOL_PATTERN = re.compile(r'[A-Za-z0-9._:!/-]+')
+ACTION_PATTERN = re.compile(r'[A-Za-z_ -]+')
+NUMBER_PATTERN = re.compile(r'[+-]?(\d+(\.\d*)?|\.\d+)([eE][+-]?\d+)?')
+
+# Behind Render's (or any) proxy, remote_addr is the proxy. X-Forwarded-For is client-supplied, so it is
+# trusted only when the deployment says how many proxies sit in front (TRUSTED_PROXIES=1 on Render).
+TRUSTED_PROXIES = int(os.environ.get('TRUSTED_PROXIES', INGRESS_CONFIG.get('trustedProxies', 0)))
+if TRUSTED_PROXIES:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXIES, x_proto=TRUSTED_PROXIES)
+
+def load_webhook_secrets():
+    """strategy -> secret bytes; '*' (or WEBHOOK_SECRET) covers strategies without their own."""
+    configured = dict(INGRESS_CONFIG.get('secrets', {}))
+    if os.environ.get('WEBHOOK_SECRET'):
+        configured['*'] = os.environ['WEBHOOK_SECRET']
+    return {str(strategy).lower(): str(secret).encode() for strategy, secret in configured.items() if secret}
+
+WEBHOOK_SECRETS = load_webhook_secrets()
+if not WEBHOOK_SECRETS:
+    logger.warning("No webhook secret configured (ingress.secrets / WEBHOOK_SECRET); /webhook accepts unsigned signals")
+
+def text_field(max_length, pattern=None):
+    def coerce(name, value):
+        if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+            raise ValueError(f'{name} must be a string')
+        value = str(value).strip()
+        if len(value) > max_length:
+            raise ValueError(f'{name} is longer than {max_length} characters')
+        if pattern is not None and not pattern.fullmatch(value):
+            raise ValueError(f'{name} has invalid characters')
+        return value
+    return coerce
+
+def number_field(name, value):
+    """Checked as a finite decimal but kept as sent, so "1.10000" is rendered with its trailing zeros."""
+    if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+        raise ValueError(f'{name} must be a number')
+    value = value.strip() if isinstance(value, str) else str(value)
+    if len(value) > 40 or not NUMBER_PATTERN.fullmatch(value):
+        raise ValueError(f'{name} must be a number')
+    if not math.isfinite(float(value)):
+        raise ValueError(f'{name} must be a finite number')
+    return value
+
+def load_signal_json(text):
+    # JSON decimals are kept as their text for number_field, which would otherwise see 1.1 for 1.10000
+    return json.loads(text, parse_float=str)
+
+class SignalSchema:
+    """Field checks built once at import; validate() returns a clean copy holding only the known fields.
+
+    Each field is (name, required, coerce), where coerce returns the stored
+    value or raises ValueError with the message sent back to the caller.
+    """
+
+    def __init__(self, fields):
+        self.fields = tuple(fields)
+
+    def validate(self, data):
+        if not isinstance(data, dict):
+            raise ValueError('payload must be a JSON object')
+        clean = {}
+        for name, required, coerce in self.fields:
+            value = data.get(name)
+            if value is None or value == '':
+                if required:
+                    raise ValueError(f'{name} is required')
+                continue
+            clean[name] = coerce(name, value)
+        return clean
+
+signal_schema = SignalSchema((
+    ('symbol', True, text_field(40, SYMBOL_PATTERN)),
+    ('action', True, text_field(20, ACTION_PATTERN)),
+    ('price', True, number_field),
+    ('message', False, text_field(1000)),
+    ('strategy', False, text_field(64)),
+    ('idempotency_key', False, text_field(128)),
+))
+
+class SourceLimiter:
+    """A TokenBucket per client address; beyond max_sources the least recently seen one is forgotten."""
+
+    def __init__(self, rate, burst, max_sources):
+        self.rate = rate
+        self.burst = burst
+        self.max_sources = max_sources
+        self.buckets = OrderedDict()
+        self.lock = threading.Lock()
+
+    def allow(self, source):
+        if self.rate <= 0:
+            return True
+        with self.lock:
+            bucket = self.buckets.get(source)
+            if bucket is None:
+                bucket = self.buckets[source] = TokenBucket(self.rate, self.burst)
+                if len(self.buckets) > self.max_sources:
+                    self.buckets.popitem(last=False)
+            else:
+                self.buckets.move_to_end(source)
+        return bucket.take()
+
+source_limiter = SourceLimiter(INGRESS_RATE, INGRESS_BURST, INGRESS_MAX_SOURCES)
+
+# Every login attempt costs a full PBKDF2 run, so attempts are limited per client address; workers split the budget
+LOGIN_RATE = AUTH_CONFIG.get('loginAttemptsPerMinute', 10) / 60 / WORKER_PROCESSES
+LOGIN_BURST = max(int(AUTH_CONFIG.get('loginBurst', 5)) // WORKER_PROCESSES, 1)
+login_limiter = SourceLimiter(LOGIN_RATE, LOGIN_BURST, INGRESS_MAX_SOURCES)
+
+class IngressRejected(Exception):
+    def __init__(self, reason, status, error, headers=None):
+        super().__init__(error)
+        self.reason = reason
+        self.status = status
+        self.error = error
+        self.headers = headers
+
+def reject(reason, status, error, headers=None):
+    webhook_rejected.labels(reason).inc()
+    return jsonify({'success': False, 'error': error}), status, headers or {}
+
+@app.before_request
+def guard_ingress():
+    """Size cap for the webhook endpoints, ahead of every other hook."""
+    limit = INGRESS_BODY_LIMITS.get(request.endpoint)
+    if limit is None:
+        return
+    if request.content_length is not None and request.content_length > limit:
+        return reject('too_large', 413, f'Body larger than {limit} bytes')
+
+def read_ingress_body():
+    """Raw body, read up to the endpoint's size cap even without a Content-Length; raises OverflowError past it."""
+    limit = INGRESS_BODY_LIMITS[request.endpoint]
+    raw = request.stream.read(limit + 1)
+    if len(raw) > limit:
+        raise OverflowError
+    return raw
+
+def verify_webhook_secret(data):
+    """True when the strategy's secret (or the default one) matches, False when it does not,
+    None when no secret applies to this payload.
+
+    The secret comes from the body's "secret" field (TradingView can only put
+    it in the alert message) or an X-Webhook-Secret header; dashboard users
+    are already authenticated by their session.
+    """
+    if g.get('authenticated'):
+        return True
+    if not isinstance(data, dict):
+        return None
+    expected = WEBHOOK_SECRETS.get(str(data.get('strategy', '')).lower()) or WEBHOOK_SECRETS.get('*')
+    if expected is None:
+        return None
+    presented = data.get('secret') or request.headers.get('X-Webhook-Secret') or ''
+    return hmac.compare_digest(str(presented).encode(), expected)
+
+def charge_source():
+    """Take a token from the caller's per-IP bucket; raises IngressRejected (429) once it is empty.
+
+    Only requests that no valid secret vouches for are charged, so a wrong
+    secret is throttled while signed bursts from a shared address pass.
+    """
+    if not source_limiter.allow(request.remote_addr or '-'):
+        raise IngressRejected('rate_limited', 429, 'Too many requests',
+                              {'Retry-After': str(max(math.ceil(1 / INGRESS_RATE), 1))})
+
+def accept_signal(data, verified):
+    """Clean signal for one decoded payload and its verify_webhook_secret() verdict; raises IngressRejected."""
+    if verified is False:
+        raise IngressRejected('unauthorized', 401, 'Invalid webhook secret')
+    try:
+        return signal_schema.validate(data)
+    except ValueError as e:
+        raise IngressRejected('invalid', 400, str(e)) from None
+
+def parse_batch(raw):
+    """Signals of a batch body: a JSON array, or NDJSON with one signal per line.
+
+    A malformed NDJSON line becomes an IngressRejected in its slot instead of
+    failing the batch; a body that is neither format raises ValueError.
+    """
+    text = raw.decode('utf-8')
+    if text.lstrip().startswith('['):
+        items = load_signal_json(text)
+        if not isinstance(items, list):
+            raise ValueError('Body is not a JSON array')
+        return items
+    items = []
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        try:
+            items.append(load_signal_json(line))
+        except ValueError:
+            items.append(IngressRejected('invalid', 400, 'Line is not valid JSON'))
+    return items
+
+def admit_signal(data, client_key=None):
+    """Dedup, route and record one clean signal: (response body, new alarm or None, targets, claimed key).
+
+    The alarm goes into the in-memory window here; the caller persists it and,
+    when targets is not empty, queues it with enqueue_delivery. If that
+    fails, the caller hands the claimed key (None when nothing was claimed)
+    to release_signal.
+    """
+    alarm_id = new_alarm_id()
+    
+    # Retried or double-fired alerts are acknowledged without another provider call
+    key = dedup_key(data, client_key)
+    duplicate_of = claim_signal(*key, alarm_id) if key else None
+    if duplicate_of:
+        signals_deduplicated.labels().inc()
+        log_system_event('WEBHOOK_DUPLICATE', f"{data['symbol']} ({data['action']}) -> {duplicate_of}")
+        return {'success': True, 'alarm_id': duplicate_of, 'status': 'duplicate'}, None, (), None
+    claim = key[0] if key else None
+    
+    try:
+        status, rules, targets = router.route(data)
+    except Exception:
+        release_signal(claim, alarm_id)
+        raise
     
-    service_config['whatsapp']['health'] = False
-    return False
+    alarm = AlarmRecord(
+        id=alarm_id,
+        timestamp=datetime.now().isoformat(),
+        symbol=data['symbol'],
+        action=data['action'],
+        price=data['price'],
+        message=data.get('message', 'Sinyal'),
+        delivery_status='pending' if status == 'route' else 'filtered'
+    )
+    
+    # Ring buffer evicts the oldest signal once storage.maxAlarms is reached
+    alarms.append(alarm)
+    signals_received.labels().inc()
+    broadcaster.publish('alarm', alarm.to_dict())
+    
+    # Dropped and throttled signals are kept for the record but never sent
+    if status != 'route':
+        log_system_event('SIGNAL_FILTERED', f"{alarm['symbol']} ({alarm['action']}) - {rules[-1]}: {status}")
+        return {'success': True, 'alarm_id': alarm['id'], 'status': status, 'rule': rules[-1]}, alarm, (), claim
+    return {'success': True, 'alarm_id': alarm['id'], 'status': 'queued'}, alarm, targets, claim
 
-# Enhanced messaging functions (keeping old names for compatibility)
-def send_telegram_message(message):
-    start_time = time.time()
-    result = send_telegram_with_retry(message)
-    latency = (time.time() - start_time) * 1000
-    system_metrics['average_delay'] = (system_metrics.get('average_delay', 0) + latency) / 2
-    return result
+def enqueue_delivery(alarm, targets):
+    """Hand a stored alarm to the delivery workers; False (and the alarm marked dropped) when the queue is full."""
+    try:
+        delivery_queue.put_nowait((alarm, targets))
+        return True
+    except queue.Full:
+        update_alarm(alarm['id'], delivery_status='dropped')
+        log_system_event('DELIVERY_QUEUE_FULL', f"{alarm['symbol']} ({alarm['action']}) kuyruk dolu, gönderilemedi", 'ERROR')
+        return False
 
-def send_whatsapp_message(message):
-    start_time = time.time()
-    result = send_whatsapp_with_retry(message)
-    latency = (time.time() - start_time) * 1000
-    system_metrics['average_delay'] = (system_metrics.get('average_delay', 0) + latency) / 2
-    return result
+@app.before_request
+def authenticate():
+    """Every /admin/ route needs a session token, from the cookie set at login or an Authorization: Bearer header."""
+    if request.endpoint == 'static_file':
+        return
+    g.authenticated = verify_session(session_token(request.cookies, request.headers.get('Authorization', '')))
+    if request.path.startswith('/admin/') and not g.authenticated:
+        return jsonify({'error': 'Unauthorized'}), 401
+
+@app.before_request
+def refresh_shared_state():
+    if request.endpoint != 'static_file':
+        sync_shared_state()
 
 @app.route('/')
 def dashboard():
-    password = request.args.get('password')
+    # Old bookmarks carry ?password=: exchange it for a session once and drop it from the URL
+    if request.args.get('password'):
+        return login()
+    if not g.authenticated:
+        return render_template('login.html')
     
+    return render_template('dashboard.html', webhook_url=WEBHOOK_URL, channels=list(CHANNEL_DRIVERS.values()))
+
+@app.route('/login', methods=['POST'])
+def login():
+    """Password -> session cookie (and the token itself for JSON clients, to send as a Bearer header)."""
+    # Checked before the password is hashed, so guessing can neither go fast nor pin the CPU
+    if not login_limiter.allow(request.remote_addr or '-'):
+        headers = {'Retry-After': str(max(math.ceil(1 / LOGIN_RATE), 1))}
+        if request.is_json:
+            return jsonify({'error': 'Too many login attempts'}), 429, headers
+        return render_template('login.html', error='Çok fazla deneme, lütfen biraz bekleyin'), 429, headers
+    body = request.get_json(silent=True) or {}
+    password = request.form.get('password') or body.get('password') or request.args.get('password')
     if not password or not verify_password(password):
-        return render_template_string('''
-<!DOCTYPE html>
-<html>
-<head>
-    <title>Paratoner Signal Pro - Giriş</title>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <link href="https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css" rel="stylesheet">
-    <link href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.4.0/css/all.min.css" rel="stylesheet">
-    <style>
-        body { 
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-            min-height: 100vh; display: flex; align-items: center; justify-content: center;
-        }
-        .login-container {
-            background: rgba(255,255,255,0.95); border-radius: 20px; 
-            box-shadow: 0 15px 35px rgba(0,0,0,0.1); padding: 50px 40px; 
-            text-align: center; max-width: 450px; width: 90%;
-        }
-        .logo { font-size: 4rem; background: linear-gradient(45deg, #667eea, #764ba2); 
-                -webkit-background-clip: text; -webkit-text-fill-color: transparent; }
-        .login-btn { background: linear-gradient(45deg, #667eea, #764ba2); border: none; 
-                     border-radius: 12px; padding: 15px 40px; color: white; width: 100%; }
-    </style>
-</head>
-<body>
-    <div class="login-container">
-        <div class="logo"><i class="fas fa-signal"></i></div>
-        <h1>Paratoner Signal Pro</h1>
-        <p>TradingView Webhook Sistemi</p>
-        <form onsubmit="event.preventDefault(); window.location.href='/?password='+document.getElementById('pwd').value;">
-            <input type="password" id="pwd" class="form-control mb-3" placeholder="Yönetici şifresi" required>
-            <button type="submit" class="login-btn">Dashboard'a Giriş</button>
-        </form>
-    </div>
-</body>
-</html>
-        ''')
-    
-    return render_template_string('''
-<!DOCTYPE html>
-<html>
-<head>
-    <title>Paratoner Signal Pro</title>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <link href="https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css" rel="stylesheet">
-    <link href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.4.0/css/all.min.css" rel="stylesheet">
-    <style>
-        body { background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); }
-        .dashboard-card { background: rgba(255,255,255,0.95); border-radius: 15px; 
-                         box-shadow: 0 8px 32px rgba(0,0,0,0.1); margin-bottom: 20px; }
-        .btn-toggle-active { background: #28a745; color: white; border: none; padding: 8px 15px; 
-                            border-radius: 5px; margin: 5px; }
-        .btn-toggle-inactive { background: #dc3545; color: white; border: none; padding: 8px 15px; 
-                              border-radius: 5px; margin: 5px; }
-        .btn-test { background: #ffc107; color: #212529; border: none; padding: 8px 15px; 
-                   border-radius: 5px; margin: 5px; }
-        .btn-copy { background: #dc3545; color: white; border: none; padding: 8px 15px; 
-                   border-radius: 5px; margin: 5px; }
-    </style>
-</head>
-<body>
-    <div class="container mt-4">
-        <div class="text-center text-white mb-4">
-            <h1><i class="fas fa-signal"></i> Paratoner Signal Pro</h1>
-            <p>TradingView Webhook Sistemi</p>
-        </div>
-        
-        <div class="row">
-            <div class="col-md-6">
-                <div class="dashboard-card p-4">
-                    <h3><i class="fas fa-cogs"></i> Servis Kontrolleri</h3>
-                    
-                    <div class="mb-3">
-                        <h5>📱 Telegram</h5>
-                        <span id="telegram-status" class="badge bg-success">Aktif</span>
-                        <div class="mt-2">
-                            <button onclick="toggleService('telegram')" id="telegram-toggle-btn" class="btn-toggle-active">
-                                <i class="fas fa-toggle-on"></i> Aktif
-                            </button>
-                            <button onclick="testService('telegram')" class="btn-test">
-                                <i class="fas fa-vial"></i> Test Et
-                            </button>
-                        </div>
-                    </div>
-                    
-                    <div class="mb-3">
-                        <h5>💬 WhatsApp</h5>
-                        <span id="whatsapp-status" class="badge bg-success">Aktif</span>
-                        <div class="mt-2">
-                            <button onclick="toggleService('whatsapp')" id="whatsapp-toggle-btn" class="btn-toggle-active">
-                                <i class="fas fa-toggle-on"></i> Aktif
-                            </button>
-                            <button onclick="testService('whatsapp')" class="btn-test">
-                                <i class="fas fa-vial"></i> Test Et
-                            </button>
-                        </div>
-                    </div>
-                    
-                    <div class="mb-3">
-                        <h5>🔗 Webhook URL</h5>
-                        <div class="p-2 bg-light border rounded mb-2" style="font-size: 12px; word-break: break-all;">
-                            {{ webhook_url }}
-                        </div>
-                        <button onclick="copyUrl()" class="btn-copy">
-                            <i class="fas fa-copy"></i> URL Kopyala
-                        </button>
-                        <button onclick="testWebhook()" class="btn-test">
-                            <i class="fas fa-rocket"></i> Webhook Test
-                        </button>
-                    </div>
-                    
-                    <div class="mb-3">
-                        <h5>⚙️ Sistem Yönetimi</h5>
-                        <div class="mt-2">
-                            <button onclick="showApiKeyManager()" class="btn" style="background: #17a2b8; color: white; border: none; padding: 8px 15px; border-radius: 5px; margin: 5px;">
-                                <i class="fas fa-key"></i> API Anahtarları
-                            </button>
-                            <button onclick="exportData()" class="btn" style="background: #6f42c1; color: white; border: none; padding: 8px 15px; border-radius: 5px; margin: 5px;">
-                                <i class="fas fa-download"></i> Veri İndir
-                            </button>
-                            <button onclick="showSystemLogs()" class="btn" style="background: #fd7e14; color: white; border: none; padding: 8px 15px; border-radius: 5px; margin: 5px;">
-                                <i class="fas fa-file-alt"></i> Sistem Logları
-                            </button>
-                        </div>
-                    </div>
-                </div>
-            </div>
-            
-            <div class="col-md-6">
-                <div class="dashboard-card p-4">
-                    <h3><i class="fas fa-history"></i> Son Sinyaller</h3>
-                    <div id="recent-signals">
-                        <div class="text-center p-3">
-                            <i class="fas fa-spinner fa-spin"></i> Yükleniyor...
-                        </div>
-                    </div>
-                    <button onclick="refreshSignals()" class="btn-copy">
-                        <i class="fas fa-sync"></i> Yenile
-                    </button>
-                </div>
-                
-            </div>
-        </div>
-        
-        <!-- API Key Manager Modal -->
-        <div id="apiKeyModal" style="display: none; position: fixed; top: 0; left: 0; width: 100%; height: 100%; background: rgba(0,0,0,0.5); z-index: 1000;">
-            <div style="position: absolute; top: 50%; left: 50%; transform: translate(-50%, -50%); background: white; padding: 30px; border-radius: 15px; width: 90%; max-width: 600px; max-height: 80%; overflow-y: auto;">
-                <h3><i class="fas fa-key"></i> API Anahtar Yönetimi</h3>
-                <div class="mb-4">
-                    <div class="alert alert-info">
-                        <h6><i class="fas fa-info-circle"></i> API Servisleri</h6>
-                        <small><strong>Telegram:</strong> Bot Token ve Chat ID gerekli</small><br>
-                        <small><strong>WhatsApp:</strong> Twilio hesap bilgileri gerekli</small>
-                    </div>
-                    
-                    <h5><i class="fab fa-telegram"></i> Telegram Bot API</h5>
-                    <input type="text" id="telegram-token" placeholder="Bot Token (@BotFather'dan alınır)" class="form-control mb-2">
-                    <input type="text" id="telegram-chat-id" placeholder="Chat ID (numarik)" class="form-control mb-3">
-                    
-                    <h5><i class="fab fa-whatsapp"></i> WhatsApp (Twilio API)</h5>
-                    <input type="text" id="twilio-sid" placeholder="Account SID (Twilio Console)" class="form-control mb-2">
-                    <input type="password" id="twilio-token" placeholder="Auth Token (Twilio Console)" class="form-control mb-2">
-                    <input type="text" id="twilio-from" placeholder="From Number (+14155238886)" class="form-control mb-2">
-                    <input type="text" id="twilio-to" placeholder="To Number (+905XXXXXXXXX)" class="form-control mb-3">
-                </div>
-                <div class="text-end">
-                    <button onclick="saveApiKeys()" class="btn btn-success me-2">
-                        <i class="fas fa-save"></i> Kaydet
-                    </button>
-                    <button onclick="closeModal()" class="btn btn-secondary">
-                        <i class="fas fa-times"></i> Kapat
-                    </button>
-                </div>
-            </div>
-        </div>
-        
-        <!-- System Logs Modal -->
-        <div id="logsModal" style="display: none; position: fixed; top: 0; left: 0; width: 100%; height: 100%; background: rgba(0,0,0,0.5); z-index: 1000;">
-            <div style="position: absolute; top: 50%; left: 50%; transform: translate(-50%, -50%); background: white; padding: 30px; border-radius: 15px; width: 90%; max-width: 800px; max-height: 80%; overflow-y: auto;">
-                <h3><i class="fas fa-file-alt"></i> Sistem Logları</h3>
-                <div id="system-logs-content" style="background: #f8f9fa; padding: 15px; border-radius: 5px; font-family: monospace; font-size: 12px; max-height: 400px; overflow-y: auto;"></div>
-                <div class="text-end mt-3">
-                    <button onclick="refreshLogs()" class="btn btn-info me-2">
-                        <i class="fas fa-sync"></i> Yenile
-                    </button>
-                    <button onclick="closeLogsModal()" class="btn btn-secondary">
-                        <i class="fas fa-times"></i> Kapat
-                    </button>
-                </div>
-            </div>
-        </div>
-    </div>
+        log_system_event('ADMIN_LOGIN_FAILED', request.remote_addr or '-', 'WARNING')
+        if request.is_json:
+            return jsonify({'error': 'Unauthorized'}), 401
+        return render_template('login.html', error='Hatalı şifre'), 401
     
-    <script>
-        // Notification system
-        function showNotification(message, type) {
-            const div = document.createElement('div');
-            div.innerHTML = message;
-            div.style.cssText = 'position: fixed; top: 20px; right: 20px; padding: 15px; border-radius: 5px; color: white; z-index: 9999; font-weight: bold; background: ' + (type === 'success' ? '#28a745' : type === 'error' ? '#dc3545' : '#17a2b8') + ';';
-            document.body.appendChild(div);
-            setTimeout(function() { div.remove(); }, 3000);
-        }
-        
-        // Copy URL
-        function copyUrl() {
-            navigator.clipboard.writeText('{{ webhook_url }}').then(function() {
-                showNotification('URL kopyalandı!', 'success');
-            }).catch(function() {
-                showNotification('Kopyalama başarısız!', 'error');
-            });
-        }
-        
-        // Toggle service
-        function toggleService(service) {
-            showNotification('Servis durumu değiştiriliyor...', 'info');
-            fetch('/admin/toggle-service', {
-                method: 'POST',
-                headers: {'Content-Type': 'application/json'},
-                body: JSON.stringify({service: service, password: 'ParatonerPro2025!'})
-            }).then(function(response) { return response.json(); })
-            .then(function(data) {
-                if (data.success) {
-                    updateServiceStatus(service, data.enabled);
-                    showNotification(data.message, 'success');
-                } else {
-                    showNotification('Güncelleme başarısız!', 'error');
-                }
-            }).catch(function() {
-                showNotification('Bağlantı hatası!', 'error');
-            });
-        }
-        
-        // Update service status visual
-        function updateServiceStatus(service, enabled) {
-            const statusElement = document.getElementById(service + '-status');
-            const toggleBtn = document.getElementById(service + '-toggle-btn');
-            
-            if (enabled) {
-                statusElement.className = 'badge bg-success';
-                statusElement.textContent = 'Aktif';
-                toggleBtn.className = 'btn-toggle-active';
-                toggleBtn.innerHTML = '<i class="fas fa-toggle-on"></i> Aktif';
-            } else {
-                statusElement.className = 'badge bg-danger';
-                statusElement.textContent = 'Pasif';
-                toggleBtn.className = 'btn-toggle-inactive';
-                toggleBtn.innerHTML = '<i class="fas fa-toggle-off"></i> Pasif';
-            }
-        }
-        
-        // Test service
-        function testService(service) {
-            showNotification('Test mesajı gönderiliyor...', 'info');
-            fetch('/admin/test-message', {
-                method: 'POST',
-                headers: {'Content-Type': 'application/json'},
-                body: JSON.stringify({
-                    service: service, 
-                    message: 'PARATONER BOT TEST - ' + new Date().toLocaleString('tr-TR'),
-                    password: 'ParatonerPro2025!'
-                })
-            }).then(function(response) { return response.json(); })
-            .then(function(data) {
-                if (data.success) {
-                    showNotification(service + ' test başarılı!', 'success');
-                } else {
-                    showNotification('Test başarısız!', 'error');
-                }
-            }).catch(function() {
-                showNotification('Test hatası!', 'error');
-            });
-        }
-        
-        // Test webhook
-        function testWebhook() {
-            showNotification('Webhook test gönderiliyor...', 'info');
-            const testData = {
-                symbol: 'BTCUSDT',
-                action: 'BUY', 
-                price: '999.99',
-                message: 'Dashboard Test - ' + new Date().toLocaleString('tr-TR')
-            };
-            
-            fetch('/webhook/tradingview', {
-                method: 'POST',
-                headers: {'Content-Type': 'application/json'},
-                body: JSON.stringify(testData)
-            }).then(function(response) { return response.json(); })
-            .then(function(data) {
-                if (data.success) {
-                    showNotification('Webhook test başarılı!', 'success');
-                    setTimeout(function() { refreshSignals(); }, 1000);
-                } else {
-                    showNotification('Test başarısız!', 'error');
-                }
-            }).catch(function() {
-                showNotification('Test başarısız!', 'error');
-            });
-        }
-        
-        // Refresh signals
-        function refreshSignals() {
-            const container = document.getElementById('recent-signals');
-            container.innerHTML = '<div class="text-center p-3"><i class="fas fa-spinner fa-spin"></i> Yenileniyor...</div>';
-            
-            fetch('/admin/recent-signals?password=ParatonerPro2025!')
-            .then(function(response) { return response.json(); })
-            .then(function(data) {
-                let html = '';
-                if (data.signals && data.signals.length > 0) {
-                    data.signals.slice(0, 5).forEach(function(signal) {
-                        const color = signal.action && signal.action.toLowerCase().includes('buy') ? '#28a745' : '#dc3545';
-                        html += '<div class="border-start border-4 p-2 mb-2 bg-light" style="border-color: ' + color + '!important;">' +
-                                '<strong style="color: ' + color + ';">' + (signal.symbol || 'N/A') + ' - ' + (signal.action || 'N/A') + '</strong>' +
-                                '<div class="small text-muted">' + (signal.price || 'N/A') + ' | ' + (signal.timestamp || '') + '</div>' +
-                                '<div class="small">TG: ' + (signal.telegram_success ? '✅' : '❌') + ' | WA: ' + (signal.whatsapp_success ? '✅' : '❌') + '</div>' +
-                                '</div>';
-                    });
-                } else {
-                    html = '<div class="text-center text-muted p-3">Henüz sinyal yok</div>';
-                }
-                container.innerHTML = html;
-            }).catch(function() {
-                container.innerHTML = '<div class="text-center text-danger p-3">Yükleme hatası</div>';
-            });
-        }
-        
-        // Load initial data
-        function loadServiceStatus() {
-            fetch('/admin/service-status?password=ParatonerPro2025!')
-            .then(function(response) { return response.json(); })
-            .then(function(data) {
-                updateServiceStatus('telegram', data.telegram.enabled);
-                updateServiceStatus('whatsapp', data.whatsapp.enabled);
-            }).catch(function() {
-                console.log('Service status load failed');
-            });
-        }
-        
-        // Enhanced management functions
-        function showApiKeyManager() {
-            document.getElementById('apiKeyModal').style.display = 'block';
-            loadCurrentApiKeys();
-        }
-        
-        function closeModal() {
-            document.getElementById('apiKeyModal').style.display = 'none';
-        }
-        
-        function loadCurrentApiKeys() {
-            fetch('/admin/get-api-keys?password=ParatonerPro2025!')
-            .then(function(response) { return response.json(); })
-            .then(function(data) {
-                if (data.telegram) {
-                    document.getElementById('telegram-token').value = data.telegram.token || '';
-                    document.getElementById('telegram-chat-id').value = data.telegram.chat_id || '';
-                }
-                if (data.whatsapp) {
-                    document.getElementById('twilio-sid').value = data.whatsapp.account_sid || '';
-                    document.getElementById('twilio-from').value = data.whatsapp.from_number || '';
-                    document.getElementById('twilio-to').value = data.whatsapp.to_number || '';
-                }
-            }).catch(function(error) {
-                showNotification('API anahtarları yüklenemedi!', 'error');
-            });
-        }
-        
-        function saveApiKeys() {
-            const apiData = {
-                password: 'ParatonerPro2025!',
-                telegram: {
-                    token: document.getElementById('telegram-token').value,
-                    chat_id: document.getElementById('telegram-chat-id').value
-                },
-                whatsapp: {
-                    account_sid: document.getElementById('twilio-sid').value,
-                    auth_token: document.getElementById('twilio-token').value,
-                    from_number: document.getElementById('twilio-from').value,
-                    to_number: document.getElementById('twilio-to').value
-                }
-            };
-            
-            fetch('/admin/update-api-keys', {
-                method: 'POST',
-                headers: {'Content-Type': 'application/json'},
-                body: JSON.stringify(apiData)
-            }).then(function(response) { return response.json(); })
-            .then(function(data) {
-                if (data.success) {
-                    showNotification('API anahtarları güncellendi!', 'success');
-                    closeModal();
-                } else {
-                    showNotification('Güncelleme başarısız!', 'error');
-                }
-            }).catch(function() {
-                showNotification('Bağlantı hatası!', 'error');
-            });
-        }
-        
-        function exportData() {
-            showNotification('Veriler hazırlanıyor...', 'info');
-            fetch('/admin/export-data?password=ParatonerPro2025!')
-            .then(function(response) { return response.blob(); })
-            .then(function(blob) {
-                const url = window.URL.createObjectURL(blob);
-                const a = document.createElement('a');
-                a.href = url;
-                a.download = 'paratoner-backup-' + new Date().toISOString().slice(0,10) + '.json';
-                a.click();
-                window.URL.revokeObjectURL(url);
-                showNotification('Veri dışarı aktarımı tamamlandı!', 'success');
-            }).catch(function() {
-                showNotification('Dışarı aktarım hatası!', 'error');
-            });
-        }
-        
-        function showSystemLogs() {
-            document.getElementById('logsModal').style.display = 'block';
-            refreshLogs();
-        }
-        
-        function closeLogsModal() {
-            document.getElementById('logsModal').style.display = 'none';
-        }
-        
-        function refreshLogs() {
-            fetch('/admin/get-logs?password=ParatonerPro2025!')
-            .then(function(response) { return response.json(); })
-            .then(function(data) {
-                document.getElementById('system-logs-content').textContent = data.logs;
-            }).catch(function() {
-                document.getElementById('system-logs-content').textContent = 'Log yükleme hatası';
-            });
-        }
-        
-        
-        // Initialize
-        document.addEventListener('DOMContentLoaded', function() {
-            refreshSignals();
-            loadServiceStatus();
-            
-            // Auto-refresh every 30 seconds
-            setInterval(function() {
-                loadServiceStatus();
-            }, 30000);
-        });
-    </script>
-</body>
-</html>
-    ''', webhook_url=WEBHOOK_URL)
+    token = issue_session()
+    log_system_event('ADMIN_LOGIN', request.remote_addr or '-')
+    response = jsonify({'success': True, 'token': token, 'expires_in': SESSION_TTL}) if request.is_json else redirect('/')
+    response.set_cookie(SESSION_COOKIE, token, max_age=SESSION_TTL, httponly=True, samesite='Strict', secure=request.is_secure)
+    return response
+
+@app.route('/logout', methods=['POST'])
+def logout():
+    response = redirect('/')
+    response.delete_cookie(SESSION_COOKIE)
+    return response
 
 @app.route('/webhook/tradingview', methods=['POST'])
+@measure_latency(webhook_latency)
 def webhook():
     try:
-        data = request.get_json()
-        alarm = {
-            'id': f"py{datetime.now().strftime('%Y%m%d%H%M%S')}",
-            'timestamp': datetime.now().isoformat(),
-            'symbol': data.get('symbol', 'N/A'),
-            'action': data.get('action', 'N/A'),
-            'price': data.get('price', 'N/A'),
-            'message': data.get('message', 'Sinyal'),
-            'telegram_success': False,
-            'whatsapp_success': False
-        }
-        
-        message = f"🤖 <b>Paratoner Bot</b>\n🚀 <b>{alarm['symbol']}</b> - {alarm['action']}\n💰 Fiyat: {alarm['price']}\n📅 {datetime.now().strftime('%H:%M:%S')}\n📝 {alarm['message']}"
-        
-        if service_config['telegram']['enabled']:
-            alarm['telegram_success'] = send_telegram_message(message)
-        if service_config['whatsapp']['enabled']:
-            alarm['whatsapp_success'] = send_whatsapp_message(message.replace('<b>', '').replace('</b>', ''))
+        data = load_signal_json(read_ingress_body())
+    except OverflowError:
+        return reject('too_large', 413, f'Body larger than {INGRESS_MAX_BODY} bytes')
+    except ValueError:
+        data = None     # charged like any unsigned request, then rejected
+    try:
+        verified = verify_webhook_secret(data)
+        if not verified:
+            charge_source()
+        if data is None:
+            raise IngressRejected('invalid', 400, 'Body is not valid JSON')
+        data = accept_signal(data, verified)
+    except IngressRejected as e:
+        return reject(e.reason, e.status, e.error, e.headers)
+    
+    alarm = claim = None
+    try:
+        result, alarm, targets, claim = admit_signal(data, request.headers.get('Idempotency-Key'))
+        if alarm is None:
+            return jsonify(result), 200
+        signal_db.insert(alarm)
+        if not targets:
+            return jsonify(result), 200
+        if not enqueue_delivery(alarm, targets):
+            release_signal(claim, alarm['id'])
+            return jsonify({'success': False, 'alarm_id': alarm['id'], 'error': 'Delivery queue full'}), 503
+        return jsonify(result), 202
+    except Exception as e:
+        logger.error(f"Webhook error: {e}")
+        if alarm is not None:
+            release_signal(claim, alarm['id'])
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/webhook/batch', methods=['POST'])
+@measure_latency(webhook_latency)
+def webhook_batch():
+    """Many signals in one request: a JSON array, or NDJSON (one signal per line).
+
+    Each signal goes through the same secret, schema, dedup and routing
+    checks as /webhook/tradingview. Accepted ones are stored in one
+    transaction and queued together; the response has one result per input
+    signal, in order, and a bad signal never fails the others.
+    """
+    try:
+        items = parse_batch(read_ingress_body())
+    except OverflowError:
+        return reject('too_large', 413, f'Body larger than {INGRESS_MAX_BATCH_BODY} bytes')
+    except ValueError:
+        items = None
+    # The batch costs one token unless every signal in it carries a valid secret
+    verdicts = [verify_webhook_secret(item) for item in items] if items and len(items) <= INGRESS_MAX_BATCH_ITEMS else []
+    try:
+        if not verdicts or not all(verdicts):
+            charge_source()
+    except IngressRejected as e:
+        return reject(e.reason, e.status, e.error, e.headers)
+    if items is None:
+        return reject('invalid', 400, 'Body is not a JSON array or NDJSON')
+    if not items:
+        return reject('invalid', 400, 'No signals in body')
+    if len(items) > INGRESS_MAX_BATCH_ITEMS:
+        return reject('too_large', 413, f'More than {INGRESS_MAX_BATCH_ITEMS} signals in one batch')
+    
+    claims = []
+    try:
+        results, stored, queued = [], [], []
+        for index, item in enumerate(items):
+            try:
+                if isinstance(item, IngressRejected):
+                    raise item
+                data = accept_signal(item, verdicts[index])
+            except IngressRejected as e:
+                webhook_rejected.labels(e.reason).inc()
+                results.append({'index': index, 'success': False, 'status': 'rejected', 'error': e.error})
+                continue
+            result, alarm, targets, claim = admit_signal(data)
+            results.append(dict(result, index=index))
+            if alarm is not None:
+                stored.append(alarm)
+                claims.append((claim, alarm['id']))
+                if targets:
+                    queued.append((results[-1], alarm, targets, claim))
         
-        alarms.append(alarm)
-        # Keep 3 months of history (approximately 2500 signals)
-        if len(alarms) > 2500:
-            alarms.pop(0)
+        if stored:
+            signal_db.insert_many(stored)
+        claims = []
+        for result, alarm, targets, claim in queued:
+            if not enqueue_delivery(alarm, targets):
+                release_signal(claim, alarm['id'])
+                result.update(success=False, status='dropped', error='Delivery queue full')
         
-        log_system_event('WEBHOOK_RECEIVED', f"{alarm['symbol']} ({alarm['action']}) - Telegram: {'✅' if alarm['telegram_success'] else '❌'}, WhatsApp: {'✅' if alarm['whatsapp_success'] else '❌'}")
-        logger.info(f"Webhook: {alarm['symbol']} - TG: {alarm['telegram_success']}, WA: {alarm['whatsapp_success']}")
-        return jsonify({
-            'success': True, 'alarm_id': alarm['id'],
-            'telegram': alarm['telegram_success'], 'whatsapp': alarm['whatsapp_success']
-        })
+        accepted = sum(result['success'] for result in results)
+        log_system_event('WEBHOOK_BATCH', f"{accepted}/{len(results)} sinyal kabul edildi, {len(queued)} gönderim kuyruğunda")
+        return jsonify({'success': accepted == len(results), 'accepted': accepted,
+                        'rejected': len(results) - accepted, 'results': results}), 200
     except Exception as e:
-        logger.error(f"Webhook error: {e}")
+        logger.error(f"Webhook batch error: {e}")
+        # Nothing was queued, so the whole batch may be resent
+        for claim, alarm_id in claims:
+            release_signal(claim, alarm_id)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/admin/toggle-service', methods=['POST'])
 def toggle_service():
     data = request.get_json()
-    if not data.get('password') or not verify_password(data.get('password')):
-        return jsonify({'error': 'Unauthorized'}), 401
-    
     service = data.get('service')
     if service in service_config:
-        service_config[service]['enabled'] = not service_config[service]['enabled']
-        status = 'aktif' if service_config[service]['enabled'] else 'pasif'
+        with state_lock:
+            enabled = shared_state.toggle(f'service.{service}.enabled', service_config[service]['enabled'])
+            service_config[service]['enabled'] = enabled
+        status = 'aktif' if enabled else 'pasif'
+        broadcaster.publish('service', {'service': service, 'enabled': enabled})
         log_system_event('SERVICE_TOGGLE', f'{service.upper()} servisi {status} edildi')
         return jsonify({
-            'success': True, 'service': service, 'enabled': service_config[service]['enabled'],
+            'success': True, 'service': service, 'enabled': enabled,
             'message': f'{service.upper()} servisi {status} edildi'
         })
     return jsonify({'success': False, 'error': 'Invalid service'}), 400
@@ -683,84 +3542,120 @@ def toggle_service():
 @app.route('/admin/test-message', methods=['POST'])
 def test_message():
     data = request.get_json()
-    if not data.get('password') or not verify_password(data.get('password')):
-        return jsonify({'error': 'Unauthorized'}), 401
-    
     service = data.get('service')
     original_message = data.get('message', 'Test mesajı')
     message = f"🤖 Paratoner Bot\n{original_message}"
     
-    success = False
-    if service == 'telegram':
-        success = send_telegram_message(message)
-    elif service == 'whatsapp':
-        success = send_whatsapp_message(message)
+    # A named service is tested even when disabled; 'all' fans out to every enabled channel
+    if service == 'all':
+        futures = dispatch_to_channels(message)
+    elif service in CHANNEL_DRIVERS:
+        futures = dispatch_to_channels(message, [service])
+    else:
+        futures = {}
+    
+    results = {}
+    for channel, future in futures.items():
+        try:
+            results[channel] = bool(future.result())
+        except Exception as e:
+            logger.error(f"{channel} test error: {e}")
+            results[channel] = False
     
-    return jsonify({'success': success})
+    return jsonify({'success': bool(results) and all(results.values()), 'results': results})
 
 @app.route('/admin/service-status')
 def service_status():
-    password = request.args.get('password')
-    if not password or not verify_password(password):
-        return jsonify({'error': 'Unauthorized'}), 401
-    return jsonify({
-        'telegram': {'enabled': service_config['telegram']['enabled']},
-        'whatsapp': {'enabled': service_config['whatsapp']['enabled']}
+    return jsonify({name: {'enabled': cfg['enabled']} for name, cfg in service_config.items()})
+
+@app.route('/admin/stream')
+def stream():
+    """Server-Sent Events: alarm, delivery, service and metrics events for the dashboard."""
+    if STREAM_MAX_CLIENTS and broadcaster.subscribers >= STREAM_MAX_CLIENTS:
+        # Every open stream holds a thread that intake needs; the EventSource retries after the given delay
+        return Response(f'retry: {STREAM_BUSY_RETRY_MS}\n\n', mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
+    last_id = request.headers.get('Last-Event-ID', type=int)
+    return Response(broadcaster.subscribe(last_id), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'
     })
 
 @app.route('/admin/recent-signals')
 def recent_signals():
-    password = request.args.get('password')
-    if not password or not verify_password(password):
-        return jsonify({'error': 'Unauthorized'}), 401
-    return jsonify({'signals': list(reversed(alarms[-10:]))})
+    # Read from SQLite: the in-memory window only holds this worker's alarms
+    limit = max(1, min(request.args.get('limit', 10, type=int), 100))
+    signal_db.flush()
+    signals, _ = signal_db.query(limit, symbol=request.args.get('symbol'), action=request.args.get('action'))
+    return jsonify({'signals': signals})
+
+SIGNAL_STATUSES = ('pending', 'delivered', 'partial', 'retrying', 'failed', 'skipped', 'dropped', 'filtered')
+
+def parse_time_arg(name):
+    """ISO-8601 query arg normalized to the stored timestamp format; raises ValueError."""
+    value = request.args.get(name)
+    return local_timestamp(value) if value else None
+
+@app.route('/admin/signals')
+def list_signals():
+    # Unchanged history + same query = same ETag; the version lives in SQLite so every worker agrees
+    signal_db.flush()
+    etag = hashlib.sha256(f"{signal_db.current_version()}|{request.query_string.decode()}".encode()).hexdigest()[:32]
+    if request.if_none_match.contains(etag):
+        return '', 304, {'ETag': f'"{etag}"'}
+    
+    try:
+        limit = max(1, min(request.args.get('limit', 50, type=int), 500))
+        cursor = request.args.get('cursor', type=int)
+        since, until = parse_time_arg('since'), parse_time_arg('until')
+    except ValueError:
+        return jsonify({'success': False, 'error': 'Invalid since/until timestamp'}), 400
+    # Comma-separated, e.g. failed,partial for every alarm some destination did not get
+    status = [value for value in request.args.get('status', '').split(',') if value]
+    if any(value not in SIGNAL_STATUSES for value in status):
+        return jsonify({'success': False, 'error': f'Invalid status, expected one of {", ".join(SIGNAL_STATUSES)}'}), 400
+    
+    signals, next_cursor = signal_db.query(
+        limit, cursor=cursor, since=since, until=until,
+        symbol=request.args.get('symbol'), action=request.args.get('action'), status=status
+    )
+    response = jsonify({'signals': signals, 'count': len(signals), 'next_cursor': next_cursor})
+    response.set_etag(etag)
+    return response
 
 # New enhanced management endpoints
 @app.route('/admin/get-api-keys')
 def get_api_keys():
-    password = request.args.get('password')
-    if not password or not verify_password(password):
-        return jsonify({'error': 'Unauthorized'}), 401
-    
     # Return masked keys for security
-    return jsonify({
-        'telegram': {
-            'token': api_keys_config['telegram']['token'][:10] + '***' if api_keys_config['telegram']['token'] else '',
-            'chat_id': api_keys_config['telegram']['chat_id']
-        },
-        'whatsapp': {
-            'account_sid': api_keys_config['whatsapp']['account_sid'][:10] + '***' if api_keys_config['whatsapp']['account_sid'] else '',
-            'from_number': api_keys_config['whatsapp']['from_number'],
-            'to_number': api_keys_config['whatsapp']['to_number']
+    keys = {}
+    for name, driver in CHANNEL_DRIVERS.items():
+        values = api_keys_config[name]
+        keys[name] = {
+            setting: (values[setting][:10] + '***' if values[setting] else '') if setting in driver.masked_settings else values[setting]
+            for setting in driver.settings if setting not in driver.hidden_settings
         }
-    })
+    return jsonify(keys)
 
 @app.route('/admin/update-api-keys', methods=['POST'])
 def update_api_keys():
     data = request.get_json()
-    if not data.get('password') or not verify_password(data.get('password')):
-        return jsonify({'error': 'Unauthorized'}), 401
-    
     try:
-        # Update API keys
-        if data.get('telegram'):
-            tg_data = data['telegram']
-            if tg_data.get('token') and not tg_data['token'].endswith('***'):
-                api_keys_config['telegram']['token'] = tg_data['token']
-            if tg_data.get('chat_id'):
-                api_keys_config['telegram']['chat_id'] = tg_data['chat_id']
-        
-        if data.get('whatsapp'):
-            wa_data = data['whatsapp']
-            if wa_data.get('account_sid') and not wa_data['account_sid'].endswith('***'):
-                api_keys_config['whatsapp']['account_sid'] = wa_data['account_sid']
-            if wa_data.get('auth_token'):
-                api_keys_config['whatsapp']['auth_token'] = wa_data['auth_token']
-            if wa_data.get('from_number'):
-                api_keys_config['whatsapp']['from_number'] = wa_data['from_number']
-            if wa_data.get('to_number'):
-                api_keys_config['whatsapp']['to_number'] = wa_data['to_number']
-        
+        # Only settings that differ from the environment are stored, with the environment value they replaced
+        with state_lock:
+            for name, driver in CHANNEL_DRIVERS.items():
+                if not data.get(name):
+                    continue
+                overrides = dict(api_key_overrides.get(name, {}))
+                for setting, value in data[name].items():
+                    if setting not in driver.settings or not value:
+                        continue
+                    if setting in driver.masked_settings and value.endswith('***'):
+                        continue  # unchanged masked value echoed back by the dashboard
+                    env_value = os.environ.get(driver.settings[setting][0], '')
+                    if value == env_value:
+                        overrides.pop(setting, None)
+                    else:
+                        overrides[setting] = {'value': value, 'env': env_fingerprint(env_value)}
+                shared_state.put(f'api_keys.{name}', overrides)
+                apply_shared_state({f'api_keys.{name}': overrides})
         log_system_event('API_KEYS_UPDATED', 'Telegram ve WhatsApp API anahtarları güncellendi')
         return jsonify({'success': True, 'message': 'API keys updated'})
     
@@ -768,78 +3663,245 @@ def update_api_keys():
         log_system_event('API_KEYS_ERROR', str(e), 'ERROR')
         return jsonify({'success': False, 'error': str(e)}), 500
 
-@app.route('/admin/export-data')
-def export_data():
-    password = request.args.get('password')
-    if not password or not verify_password(password):
-        return jsonify({'error': 'Unauthorized'}), 401
+@app.route('/admin/reset-api-keys', methods=['POST'])
+def reset_api_keys():
+    """Forget dashboard overrides (one channel's, or every channel's) so the environment applies again."""
+    service = (request.get_json(silent=True) or {}).get('service')
+    if service is not None and service not in CHANNEL_DRIVERS:
+        return jsonify({'success': False, 'error': 'Unknown service'}), 400
+    with state_lock:
+        for name in [service] if service else CHANNEL_DRIVERS:
+            shared_state.put(f'api_keys.{name}', {})
+            apply_shared_state({f'api_keys.{name}': {}})
+    log_system_event('API_KEYS_RESET', service or 'tüm servisler')
+    return jsonify({'success': True, 'message': 'API key overrides cleared'})
+
+# Streaming export / backups
+BACKUP_DIR = 'backups'
+BACKUP_CHECKPOINT_PATH = os.path.join(BACKUP_DIR, 'checkpoint.json')
+BACKUP_RETENTION_DAYS = int(app_config.get('backup', {}).get('retentionDays', 30))
+BACKUP_MAX_FILES = int(app_config.get('backup', {}).get('maxFiles', 50))
+EXPORT_FETCH_SIZE = 500
+
+def load_backup_checkpoint():
+    """seq of the newest alarm already written to a backup (0 when none)."""
+    try:
+        with open(BACKUP_CHECKPOINT_PATH, 'r', encoding='utf-8') as f:
+            return int(json.load(f).get('last_seq', 0))
+    except (OSError, ValueError):
+        return 0
+
+def save_backup_checkpoint(last_seq):
+    tmp_path = BACKUP_CHECKPOINT_PATH + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'last_seq': last_seq, 'updated_at': datetime.now().isoformat()}, f)
+    os.replace(tmp_path, BACKUP_CHECKPOINT_PATH)
+
+def prune_backups():
+    """Drop backups older than backup.retentionDays and beyond the newest backup.maxFiles."""
+    files = sorted(Path(BACKUP_DIR).glob('backup_*'), key=lambda path: path.stat().st_mtime, reverse=True)
+    cutoff = time.time() - BACKUP_RETENTION_DAYS * 86400
+    removed = 0
+    for index, path in enumerate(files):
+        if path.suffix == '.part':
+            continue
+        if index >= BACKUP_MAX_FILES or path.stat().st_mtime < cutoff:
+            path.unlink(missing_ok=True)
+            removed += 1
+    return removed
+
+def generate_export(mode, since_seq, gzip_response, backup_path):
+    """Yield the export as NDJSON chunks while teeing a gzip copy into backups/.
+
+    Rows are read from one SQLite snapshot EXPORT_FETCH_SIZE at a time, so
+    memory stays flat however long the history is. The backup file and the
+    checkpoint are only committed if the whole stream was produced.
+    """
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 -> gzip container
+    part_path = backup_path + '.part'
+    conn = signal_db.connect()
+    completed = False
+    
+    def encode(lines, backup):
+        raw = ''.join(lines).encode('utf-8')
+        packed = compressor.compress(raw)
+        backup.write(packed)
+        return packed if gzip_response else raw
     
     try:
-        backup_data = {
-            'export_timestamp': datetime.now().isoformat(),
-            'system_version': '2.0.0',
-            'alarms': alarms,
-            'service_config': {
-                'telegram': {'enabled': service_config['telegram']['enabled']},
-                'whatsapp': {'enabled': service_config['whatsapp']['enabled']}
-            },
-            'total_alarms': len(alarms),
-            'uptime_seconds': (datetime.now() - system_metrics['last_restart']).total_seconds()
-        }
-        
-        # Save backup
-        backup_filename = f"backups/backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-        with open(backup_filename, 'w', encoding='utf-8') as f:
-            json.dump(backup_data, f, ensure_ascii=False, indent=2)
-        
-        log_system_event('DATA_EXPORT', f'{len(alarms)} sinyal ve sistem ayarları')
-        
-        response = app.response_class(
-            response=json.dumps(backup_data, ensure_ascii=False, indent=2),
-            status=200,
-            mimetype='application/json',
-            headers={'Content-Disposition': f'attachment; filename=paratoner-backup-{datetime.now().strftime("%Y%m%d")}.json'}
-        )
-        return response
+        with open(part_path, 'wb') as backup:
+            conn.execute('BEGIN')
+            header = {
+                'type': 'export', 'export_timestamp': datetime.now().isoformat(), 'system_version': '2.0.0',
+                'mode': mode, 'since_seq': since_seq,
+                'service_config': {name: {'enabled': cfg['enabled']} for name, cfg in service_config.items()},
+                'uptime_seconds': (datetime.now() - system_metrics['last_restart']).total_seconds()
+            }
+            yield encode([json.dumps(header, ensure_ascii=False) + '\n'], backup)
+            
+            cursor = conn.execute(
+                'SELECT seq, id, timestamp, symbol, action, price, message, telegram_success, '
+                'whatsapp_success, delivery_status FROM alarms WHERE seq > ? ORDER BY seq', (since_seq,))
+            total, last_seq = 0, since_seq
+            while True:
+                rows = cursor.fetchmany(EXPORT_FETCH_SIZE)
+                if not rows:
+                    break
+                lines = []
+                for row in rows:
+                    record = AlarmRecord(*row[1:7], bool(row[7]), bool(row[8]), row[9]).to_dict()
+                    record['type'] = 'alarm'
+                    lines.append(json.dumps(record, ensure_ascii=False) + '\n')
+                total += len(rows)
+                last_seq = rows[-1][0]
+                yield encode(lines, backup)
+            
+            summary = {'type': 'summary', 'total_alarms': total, 'last_seq': last_seq}
+            chunk = encode([json.dumps(summary, ensure_ascii=False) + '\n'], backup)
+            tail = compressor.flush()
+            backup.write(tail)
+            yield chunk + tail if gzip_response else chunk
         
+        os.replace(part_path, backup_path)
+        save_backup_checkpoint(last_seq)
+        completed = True
+        removed = prune_backups()
+        log_system_event('DATA_EXPORT', f'{total} sinyal ({mode}) ve sistem ayarları' + (f', {removed} eski yedek silindi' if removed else ''))
     except Exception as e:
         log_system_event('EXPORT_ERROR', str(e), 'ERROR')
-        return jsonify({'success': False, 'error': str(e)}), 500
+        raise
+    finally:
+        conn.close()
+        if not completed and os.path.exists(part_path):
+            os.remove(part_path)
+
+@app.route('/admin/export-data')
+def export_data():
+    mode = request.args.get('mode', 'full')
+    if mode not in ('full', 'incremental'):
+        return jsonify({'success': False, 'error': 'Invalid mode, expected full or incremental'}), 400
+    gzip_response = request.args.get('gzip', '').lower() in ('1', 'true', 'yes')
+    since_seq = load_backup_checkpoint() if mode == 'incremental' else 0
+    
+    signal_db.flush()
+    stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    suffix = '_incremental' if mode == 'incremental' else ''
+    backup_path = os.path.join(BACKUP_DIR, f'backup_{stamp}{suffix}.ndjson.gz')
+    filename = f"paratoner-backup-{datetime.now().strftime('%Y%m%d')}{suffix}.ndjson" + ('.gz' if gzip_response else '')
+    
+    return Response(
+        generate_export(mode, since_seq, gzip_response, backup_path),
+        status=200,
+        mimetype='application/gzip' if gzip_response else 'application/x-ndjson',
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
+# Log tail: read backward from the end so the newest N entries cost O(N)
+LOG_TAIL_BLOCK_SIZE = 8192
+LOG_TAIL_MAX_SCAN = 5000
+LOG_LEVELS = ('DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL')
+
+def iter_lines_backward(path, end=None):
+    """Yield (start_offset, line_bytes) from `end` (default EOF) back to the start of the file."""
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell() if end is None else min(end, f.tell())
+        partial = b''
+        while position > 0:
+            read_size = min(LOG_TAIL_BLOCK_SIZE, position)
+            position -= read_size
+            f.seek(position)
+            chunk = f.read(read_size) + partial
+            lines = chunk.split(b'\n')
+            line_end = position + len(chunk)
+            for line in reversed(lines[1:]):
+                start = line_end - len(line)
+                yield start, line
+                line_end = start - 1
+            partial = lines[0]
+        if partial:
+            yield 0, partial
+
+def read_log_entries(limit, before=None, min_level=None, event_types=None):
+    """Newest-first structured events from logs/events.jsonl and its rotated files.
+
+    `before` is the cursor returned by a previous call ("<file index>:<byte offset>").
+    At most LOG_TAIL_MAX_SCAN lines are examined per call, so selective filters
+    stay bounded; the returned cursor resumes where the scan stopped.
+    """
+    file_index, end = 0, None
+    if before:
+        file_index, end = (int(part) for part in before.split(':', 1))
+    min_rank = LOG_LEVELS.index(min_level) if min_level else 0
+    log_file_handlers['events'].flush()  # make buffered lines visible to the reader
+    
+    entries, scanned = [], 0
+    while file_index <= LOG_BACKUP_COUNT:
+        path = EVENTS_LOG_PATH if file_index == 0 else f'{EVENTS_LOG_PATH}.{file_index}'
+        if not os.path.exists(path):
+            break
+        for offset, raw in iter_lines_backward(path, end):
+            if not raw.strip():
+                continue
+            scanned += 1
+            try:
+                entry = json.loads(raw)
+            except ValueError:
+                continue
+            if (LOG_LEVELS.index(entry.get('level', 'INFO')) >= min_rank
+                    and (not event_types or entry.get('event_type') in event_types)):
+                entries.append(entry)
+            if len(entries) >= limit or scanned >= LOG_TAIL_MAX_SCAN:
+                return entries, f'{file_index}:{offset}'
+        file_index, end = file_index + 1, None
+    return entries, None
 
 @app.route('/admin/get-logs')
 def get_logs():
-    password = request.args.get('password')
-    if not password or not verify_password(password):
-        return jsonify({'error': 'Unauthorized'}), 401
-    
     try:
-        logs = ""
-        if os.path.exists('logs/system.log'):
-            with open('logs/system.log', 'r', encoding='utf-8') as f:
-                lines = f.readlines()
-                logs = ''.join(lines[-100:])  # Last 100 lines
+        limit = max(1, min(request.args.get('limit', 100, type=int), 1000))
+        level = request.args.get('level', '').upper() or None
+        if level and level not in LOG_LEVELS:
+            return jsonify({'success': False, 'error': f'Invalid level, expected one of {", ".join(LOG_LEVELS)}'}), 400
+        event_types = set(filter(None, request.args.get('event_type', '').upper().split(','))) or None
         
+        entries, next_cursor = read_log_entries(limit, request.args.get('before'), level, event_types)
+        logs = '\n'.join(
+            f"{datetime.fromisoformat(entry['ts']).strftime('%d.%m.%Y %H:%M:%S')} | {entry['text']}"
+            for entry in reversed(entries)
+        )
         if not logs:
             logs = "Henüz log kaydı yok."
-            
-        return jsonify({'logs': logs})
         
+        return jsonify({'logs': logs, 'entries': entries, 'next_cursor': next_cursor})
+    
     except Exception as e:
         return jsonify({'logs': f'Log okuma hatası: {str(e)}'})
 
 @app.route('/admin/system-stats')
 def get_system_stats():
-    password = request.args.get('password')
-    if not password or not verify_password(password):
-        return jsonify({'error': 'Unauthorized'}), 401
-    
     # Update metrics
     system_metrics['total_signals'] = len(alarms)
     system_metrics['uptime'] = (datetime.now() - system_metrics['last_restart']).total_seconds()
     
+    channels = {channel: channel_metrics(channel) for channel in service_config}
+    for channel, stats in channels.items():
+        system_metrics['success_rate'][channel] = stats['success_rate']
+    sent = sum(stats['latency']['count'] for stats in channels.values())
+    total_ms = sum(stats['latency']['count'] * stats['latency']['average_ms'] for stats in channels.values())
+    
     return jsonify({
         'total_signals': system_metrics['total_signals'],
-        'average_delay': system_metrics.get('average_delay', 0),
+        'signals_received': signals_received.labels().value(),
+        'signals_deduplicated': signals_deduplicated.labels().value(),
+        'average_delay': round(total_ms / sent, 2) if sent else 0,
+        'webhook_latency': webhook_latency.labels().summary(),
+        'channels': channels,
+        'cluster_counters': cluster_counters(),
+        'retry_queue': retry_queue.stats(),
+        'circuits': {channel: dict(breakers[channel].snapshot(), last_check=service_config[channel]['last_check'])
+                     for channel in service_config},
+        'health_transitions': list(health_transitions),
         'telegram_health': service_config['telegram']['health'],
         'whatsapp_health': service_config['whatsapp']['health'],
         'uptime_seconds': system_metrics['uptime'],
@@ -847,9 +3909,48 @@ def get_system_stats():
         'whatsapp_retry_count': service_config['whatsapp']['retry_count']
     })
 
+def cluster_counters():
+    """Counter totals summed across worker processes (empty if the shared store is unavailable)."""
+    try:
+        publish_metrics()
+        cluster = shared_state.cluster_metrics()
+    except sqlite3.Error:
+        return {}
+    return {series: int(value) for family in (signals_received, signals_deduplicated, delivery_attempts, delivery_retries)
+            for series, value in cluster.get(family.name, [])}
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus text exposition of the histograms, counters and queue gauges.
+
+    Histograms and counters are summed over every worker process through the
+    shared store; the gauges describe the process that answered.
+    """
+    lines = []
+    try:
+        publish_metrics()
+        cluster = shared_state.cluster_metrics()
+    except sqlite3.Error as e:
+        logger.warning(f"Cluster metrics unavailable, serving local values: {e}")
+        cluster = None
+    for family in METRIC_FAMILIES:
+        lines.extend(family.render(cluster.get(family.name, []) if cluster is not None else None))
+    retry_stats = retry_queue.stats()
+    for name, help_text, value in (
+        ('paratoner_delivery_queue_depth', 'Alarms waiting for a delivery worker', delivery_queue.qsize()),
+        ('paratoner_retry_queue_depth', 'Deliveries waiting in the durable retry queue', retry_stats['depth']),
+        ('paratoner_retry_oldest_pending_seconds', 'Age of the oldest pending retry', round(retry_stats['oldest_pending_age_seconds'], 3)),
+        ('paratoner_stored_signals', 'Signals held in the in-memory window', len(alarms))
+    ):
+        lines.extend([f'# HELP {name} {help_text}', f'# TYPE {name} gauge', f'{name} {value}'])
+    return Response('\n'.join(lines) + '\n', mimetype='text/plain; version=0.0.4')
+
 if __name__ == '__main__':
     print("🚀 Paratoner Signal Pro - Python Flask Server")
     print(f"📡 Webhook URL: {WEBHOOK_URL}")
-    print("🔑 Dashboard: http://localhost:5000/?password=admin")
+    print("🔑 Dashboard: http://localhost:5000/")
+    print("🛠️ Development server - use `python serve.py` in production")
     port = int(os.environ.get('PORT', 5000))
+    # Turn SIGTERM into a normal exit so the delivery queue drains via atexit
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
     app.run(host='0.0.0.0', port=port, debug=False)
\ No newline at end of file
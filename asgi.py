@@ -0,0 +1,124 @@
+"""ASGI entry point: the same Flask routes on an asyncio server, with deliveries as coroutines.
+
+    uvicorn asgi:application --host 0.0.0.0 --port 5000
+
+Flask requests (webhook intake included) run on a pool of ASGI_THREADS
+threads through a2wsgi, so intake concurrency is bounded by that pool:
+its dedup, routing and storage steps are blocking SQLite work. Telegram,
+Twilio and outbound webhook sends run on the server's event loop and share
+one httpx connection pool, so in-flight deliveries cost coroutines instead
+of threads. /admin/stream is served on the loop as well, so open
+dashboards do not hold pool threads. `python app.py` (or serve.py) keeps
+the threaded mode.
+"""
+import asyncio
+import contextlib
+import json
+import os
+import signal
+
+import httpx
+from a2wsgi import WSGIMiddleware
+from werkzeug.http import parse_cookie
+
+import app as paratoner
+
+ASGI_THREADS = int(os.environ.get('ASGI_THREADS', 32))
+
+def flask_wsgi(environ, start_response):
+    # a2wsgi's input ends with the request body, so chunked uploads are readable without a Content-Length
+    environ['wsgi.input_terminated'] = True
+    return paratoner.app(environ, start_response)
+
+flask_application = WSGIMiddleware(flask_wsgi, workers=ASGI_THREADS)
+# Set when the server is told to stop: the server waits for open responses, and event streams never end on their own
+stopping = asyncio.Event()
+
+def watch_shutdown(loop):
+    """Chain onto the server's SIGINT/SIGTERM handlers so open event streams finish and let shutdown proceed."""
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        previous = signal.getsignal(signum)
+        if not callable(previous):
+            continue
+        def handler(signum, frame, previous=previous):
+            loop.call_soon_threadsafe(stopping.set)
+            previous(signum, frame)
+        try:
+            signal.signal(signum, handler)
+        except ValueError:  # not the main thread; streams then end when their clients go
+            return
+
+async def lifespan(receive, send):
+    client = None
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            loop = asyncio.get_running_loop()
+            watch_shutdown(loop)
+            client = httpx.AsyncClient(
+                timeout=paratoner.HTTP_TIMEOUT,
+                limits=httpx.Limits(max_connections=paratoner.HTTP_POOL_SIZE * len(paratoner.CHANNEL_DRIVERS),
+                                    max_keepalive_connections=paratoner.HTTP_POOL_SIZE)
+            )
+            # Draining the thread pools may block, so it happens off the loop
+            await loop.run_in_executor(None, paratoner.start_async_delivery, loop, client)
+            paratoner.logger.info("ASGI mode: deliveries run on the event loop")
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            # The drain waits for coroutines on this loop, so it must run in a thread
+            await asyncio.get_running_loop().run_in_executor(None, paratoner.stop_delivery_workers)
+            if client is not None:
+                await client.aclose()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+async def until_disconnect(receive):
+    # The (empty) request body comes first; only http.disconnect ends the stream
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+async def event_stream(scope, receive, send):
+    """/admin/stream as a coroutine; same session check and frames as the Flask route."""
+    headers = {name.decode('latin-1'): value.decode('latin-1') for name, value in scope['headers']}
+    token = paratoner.session_token(parse_cookie(headers.get('cookie', '')), headers.get('authorization', ''))
+    if not paratoner.verify_session(token):
+        await send({'type': 'http.response.start', 'status': 401, 'headers': [(b'content-type', b'application/json')]})
+        await send({'type': 'http.response.body', 'body': json.dumps({'error': 'Unauthorized'}).encode()})
+        return
+    try:
+        last_id = int(headers['last-event-id'])
+    except (KeyError, ValueError):
+        last_id = None
+
+    await send({'type': 'http.response.start', 'status': 200, 'headers': [
+        (b'content-type', b'text/event-stream; charset=utf-8'), (b'cache-control', b'no-cache'), (b'x-accel-buffering', b'no')
+    ]})
+    frames = paratoner.broadcaster.subscribe_async(last_id)
+    disconnected = asyncio.ensure_future(until_disconnect(receive))
+    stopped = asyncio.ensure_future(stopping.wait())
+    try:
+        while True:
+            # Wait for the next frame, the client leaving or the server stopping, whichever comes first
+            chunk = asyncio.ensure_future(frames.__anext__())
+            await asyncio.wait({chunk, disconnected, stopped}, return_when=asyncio.FIRST_COMPLETED)
+            if not chunk.done():
+                chunk.cancel()
+                with contextlib.suppress(asyncio.CancelledError):
+                    await chunk
+                break
+            await send({'type': 'http.response.body', 'body': chunk.result(), 'more_body': True})
+        if not disconnected.done():
+            # The EventSource reconnects (with Last-Event-ID) once the server is back
+            await send({'type': 'http.response.body', 'body': b''})
+    finally:
+        disconnected.cancel()
+        stopped.cancel()
+        await frames.aclose()
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await lifespan(receive, send)
+    elif scope['type'] == 'http' and scope['path'] == '/admin/stream' and scope['method'] == 'GET':
+        await event_stream(scope, receive, send)
+    else:
+        await flask_application(scope, receive, send)
@@ -1,634 +1,314 @@
-// TradingView Alarm Relay Server - Dashboard JavaScript
-
-class Dashboard {
-    constructor() {
-        this.isOnline = false;
-        this.currentPage = 0;
-        this.pageSize = 20;
-        this.refreshInterval = null;
-        
-        this.init();
-    }
-
-    init() {
-        this.setupEventListeners();
-        this.setWebhookUrl();
-        this.startAutoRefresh();
-        this.loadInitialData();
-    }
-
-    setupEventListeners() {
-        // Tab change events
-        document.querySelectorAll('#mainTabs button[data-bs-toggle="tab"]').forEach(tab => {
-            tab.addEventListener('shown.bs.tab', (event) => {
-                const target = event.target.getAttribute('data-bs-target');
-                if (target === '#logs') {
-                    this.loadLogs();
-                } else if (target === '#config') {
-                    this.loadConfig();
-                }
-            });
-        });
-
-        // Auto-refresh checkbox
-        const autoRefreshCheckbox = document.getElementById('auto-refresh');
-        if (autoRefreshCheckbox) {
-            autoRefreshCheckbox.addEventListener('change', (e) => {
-                if (e.target.checked) {
-                    this.startAutoRefresh();
-                } else {
-                    this.stopAutoRefresh();
-                }
-            });
+// Admin API calls ride on the session cookie set at login; an expired session goes back to the login page
+function adminFetch(url, options) {
+    return fetch(url, options).then(function(response) {
+        if (response.status === 401) {
+            window.location.href = '/';
+            throw new Error('Unauthorized');
         }
-    }
-
-    setWebhookUrl() {
-        const webhookUrl = `${window.location.origin}/webhook/tradingview`;
-        const urlInput = document.getElementById('webhook-url');
-        if (urlInput) {
-            urlInput.value = webhookUrl;
-        }
-    }
-
-    startAutoRefresh() {
-        this.stopAutoRefresh();
-        this.refreshInterval = setInterval(() => {
-            this.loadStats();
-            this.loadAlarms();
-        }, 30000); // Refresh every 30 seconds
-    }
-
-    stopAutoRefresh() {
-        if (this.refreshInterval) {
-            clearInterval(this.refreshInterval);
-            this.refreshInterval = null;
-        }
-    }
-
-    async loadInitialData() {
-        await this.loadStats();
-        await this.loadAlarms();
-        await this.testConnections();
-    }
-
-    async loadStats() {
-        try {
-            const response = await fetch('/api/stats');
-            const result = await response.json();
-            
-            if (result.success) {
-                this.updateStatsDisplay(result.data);
-                this.updateServiceStatus(result.data.services);
-                this.setOnlineStatus(true);
-            } else {
-                throw new Error(result.error);
-            }
-        } catch (error) {
-            console.error('Failed to load stats:', error);
-            this.setOnlineStatus(false);
-            this.showToast('İstatistikler yüklenemedi: ' + error.message, 'error');
-        }
-    }
+        return response;
+    });
+}
 
-    updateStatsDisplay(data) {
-        // Update main statistics
-        document.getElementById('total-alarms').textContent = data.total || 0;
-        document.getElementById('last24h-alarms').textContent = data.last24h || 0;
-        document.getElementById('successful-alarms').textContent = data.status?.successful || 0;
-        
-        // Update uptime
-        const uptime = this.formatUptime(data.uptime || 0);
-        document.getElementById('uptime').textContent = uptime;
+// Notification system
+function showNotification(message, type) {
+    const div = document.createElement('div');
+    div.innerHTML = message;
+    div.style.cssText = 'position: fixed; top: 20px; right: 20px; padding: 15px; border-radius: 5px; color: white; z-index: 9999; font-weight: bold; background: ' + (type === 'success' ? '#28a745' : type === 'error' ? '#dc3545' : '#17a2b8') + ';';
+    document.body.appendChild(div);
+    setTimeout(function() { div.remove(); }, 3000);
+}
 
-        // Update delivery statistics
-        if (data.delivery) {
-            document.getElementById('telegram-sent').textContent = data.delivery.telegram?.attempted || 0;
-            document.getElementById('telegram-success').textContent = data.delivery.telegram?.successful || 0;
-            document.getElementById('whatsapp-sent').textContent = data.delivery.whatsapp?.attempted || 0;
-            document.getElementById('whatsapp-success').textContent = data.delivery.whatsapp?.successful || 0;
-        }
-    }
+// Copy URL
+function copyUrl() {
+    navigator.clipboard.writeText(document.getElementById('webhook-url').textContent.trim()).then(function() {
+        showNotification('URL kopyalandı!', 'success');
+    }).catch(function() {
+        showNotification('Kopyalama başarısız!', 'error');
+    });
+}
 
-    updateServiceStatus(services) {
-        // Update Telegram status
-        const telegramStatus = document.getElementById('telegram-status').querySelector('.badge');
-        if (services.telegram?.configured && services.telegram?.enabled) {
-            telegramStatus.className = 'badge bg-success';
-            telegramStatus.innerHTML = '<i class="fas fa-check"></i> Aktif';
-        } else if (services.telegram?.enabled) {
-            telegramStatus.className = 'badge bg-warning';
-            telegramStatus.innerHTML = '<i class="fas fa-exclamation-triangle"></i> Yapılandırılmamış';
+// Toggle service
+function toggleService(service) {
+    showNotification('Servis durumu değiştiriliyor...', 'info');
+    adminFetch('/admin/toggle-service', {
+        method: 'POST',
+        headers: {'Content-Type': 'application/json'},
+        body: JSON.stringify({service: service})
+    }).then(function(response) { return response.json(); })
+    .then(function(data) {
+        if (data.success) {
+            updateServiceStatus(service, data.enabled);
+            showNotification(data.message, 'success');
         } else {
-            telegramStatus.className = 'badge bg-secondary';
-            telegramStatus.innerHTML = '<i class="fas fa-times"></i> Devre Dışı';
+            showNotification('Güncelleme başarısız!', 'error');
         }
+    }).catch(function() {
+        showNotification('Bağlantı hatası!', 'error');
+    });
+}
 
-        // Update WhatsApp status
-        const whatsappStatus = document.getElementById('whatsapp-status').querySelector('.badge');
-        if (services.whatsapp?.configured && services.whatsapp?.enabled) {
-            whatsappStatus.className = 'badge bg-success';
-            whatsappStatus.innerHTML = '<i class="fas fa-check"></i> Aktif';
-        } else if (services.whatsapp?.enabled) {
-            whatsappStatus.className = 'badge bg-warning';
-            whatsappStatus.innerHTML = '<i class="fas fa-exclamation-triangle"></i> Yapılandırılmamış';
-        } else {
-            whatsappStatus.className = 'badge bg-secondary';
-            whatsappStatus.innerHTML = '<i class="fas fa-times"></i> Devre Dışı';
-        }
+// Update service status visual
+function updateServiceStatus(service, enabled) {
+    const statusElement = document.getElementById(service + '-status');
+    const toggleBtn = document.getElementById(service + '-toggle-btn');
+
+    if (enabled) {
+        statusElement.className = 'badge bg-success';
+        statusElement.textContent = 'Aktif';
+        toggleBtn.className = 'btn-toggle-active';
+        toggleBtn.innerHTML = '<i class="fas fa-toggle-on"></i> Aktif';
+    } else {
+        statusElement.className = 'badge bg-danger';
+        statusElement.textContent = 'Pasif';
+        toggleBtn.className = 'btn-toggle-inactive';
+        toggleBtn.innerHTML = '<i class="fas fa-toggle-off"></i> Pasif';
     }
+}
 
-    setOnlineStatus(online) {
-        this.isOnline = online;
-        const indicator = document.getElementById('status-indicator');
-        
-        if (online) {
-            indicator.className = 'badge bg-success online';
-            indicator.innerHTML = '<i class="fas fa-circle"></i> Çevrimiçi';
+// Test service
+function testService(service) {
+    showNotification('Test mesajı gönderiliyor...', 'info');
+    adminFetch('/admin/test-message', {
+        method: 'POST',
+        headers: {'Content-Type': 'application/json'},
+        body: JSON.stringify({
+            service: service, 
+            message: 'PARATONER BOT TEST - ' + new Date().toLocaleString('tr-TR')
+        })
+    }).then(function(response) { return response.json(); })
+    .then(function(data) {
+        if (data.success) {
+            showNotification(service + ' test başarılı!', 'success');
         } else {
-            indicator.className = 'badge bg-danger offline';
-            indicator.innerHTML = '<i class="fas fa-circle"></i> Çevrimdışı';
-        }
-    }
-
-    async loadAlarms(page = 0) {
-        try {
-            const response = await fetch(`/api/alarms?limit=${this.pageSize}&offset=${page * this.pageSize}`);
-            const result = await response.json();
-            
-            if (result.success) {
-                this.displayAlarms(result.data.alarms);
-                this.updatePagination(result.data, page);
-            } else {
-                throw new Error(result.error);
-            }
-        } catch (error) {
-            console.error('Failed to load alarms:', error);
-            this.showToast('Alarmlar yüklenemedi: ' + error.message, 'error');
-            document.getElementById('alarms-table').innerHTML = 
-                '<tr><td colspan="6" class="text-center text-danger">Alarmlar yüklenemedi</td></tr>';
-        }
-    }
-
-    displayAlarms(alarms) {
-        const tbody = document.getElementById('alarms-table');
-        
-        if (!alarms || alarms.length === 0) {
-            tbody.innerHTML = '<tr><td colspan="6" class="text-center text-muted">Henüz alarm bulunmuyor</td></tr>';
-            return;
+            showNotification('Test başarısız!', 'error');
         }
+    }).catch(function() {
+        showNotification('Test hatası!', 'error');
+    });
+}
 
-        tbody.innerHTML = alarms.map(alarm => {
-            const timestamp = new Date(alarm.timestamp).toLocaleString('tr-TR');
-            const symbol = alarm.data.symbol || '-';
-            const message = this.truncateText(alarm.data.message || '-', 50);
-            
-            const telegramBadge = this.getDeliveryBadge(alarm.delivery.telegram);
-            const whatsappBadge = this.getDeliveryBadge(alarm.delivery.whatsapp);
-            const statusBadge = this.getStatusBadge(alarm.status);
-            
-            return `
-                <tr>
-                    <td class="timestamp">${timestamp}</td>
-                    <td><strong>${symbol}</strong></td>
-                    <td title="${alarm.data.message || ''}">${message}</td>
-                    <td>${telegramBadge}</td>
-                    <td>${whatsappBadge}</td>
-                    <td>${statusBadge}</td>
-                </tr>
-            `;
-        }).join('');
-    }
-
-    getDeliveryBadge(delivery) {
-        if (!delivery.attempted) {
-            return '<span class="badge bg-secondary">-</span>';
-        }
-        
-        if (delivery.success) {
-            return '<span class="badge bg-success"><i class="fas fa-check"></i></span>';
+// Test webhook
+function testWebhook() {
+    showNotification('Webhook test gönderiliyor...', 'info');
+    const testData = {
+        symbol: 'BTCUSDT',
+        action: 'BUY', 
+        price: '999.99',
+        message: 'Dashboard Test - ' + new Date().toLocaleString('tr-TR')
+    };
+
+    fetch('/webhook/tradingview', {
+        method: 'POST',
+        headers: {'Content-Type': 'application/json'},
+        body: JSON.stringify(testData)
+    }).then(function(response) { return response.json(); })
+    .then(function(data) {
+        if (data.success) {
+            showNotification('Webhook test başarılı!', 'success');
+            setTimeout(function() { refreshSignals(); }, 1000);
         } else {
-            return '<span class="badge bg-danger" title="' + (delivery.error || 'Başarısız') + '"><i class="fas fa-times"></i></span>';
+            showNotification('Test başarısız!', 'error');
         }
-    }
-
-    getStatusBadge(status) {
-        const badges = {
-            success: '<span class="badge bg-success">Başarılı</span>',
-            failed: '<span class="badge bg-danger">Başarısız</span>',
-            partial: '<span class="badge bg-warning">Kısmi</span>',
-            pending: '<span class="badge bg-secondary">Bekliyor</span>'
-        };
-        
-        return badges[status] || '<span class="badge bg-secondary">Bilinmiyor</span>';
-    }
+    }).catch(function() {
+        showNotification('Test başarısız!', 'error');
+    });
+}
 
-    updatePagination(data, currentPage) {
-        const container = document.getElementById('pagination-container');
-        const pagination = document.getElementById('pagination');
-        
-        if (data.total <= this.pageSize) {
-            container.classList.add('d-none');
-            return;
-        }
-        
-        container.classList.remove('d-none');
-        const totalPages = Math.ceil(data.total / this.pageSize);
-        
-        let paginationHtml = '';
-        
-        // Previous button
-        paginationHtml += `
-            <li class="page-item ${currentPage === 0 ? 'disabled' : ''}">
-                <a class="page-link" href="#" onclick="dashboard.loadAlarms(${currentPage - 1})">
-                    <i class="fas fa-chevron-left"></i>
-                </a>
-            </li>
-        `;
-        
-        // Page numbers
-        for (let i = 0; i < totalPages; i++) {
-            if (i === currentPage || i < 2 || i >= totalPages - 2 || Math.abs(i - currentPage) <= 1) {
-                paginationHtml += `
-                    <li class="page-item ${i === currentPage ? 'active' : ''}">
-                        <a class="page-link" href="#" onclick="dashboard.loadAlarms(${i})">${i + 1}</a>
-                    </li>
-                `;
-            } else if (i === 2 || i === totalPages - 3) {
-                paginationHtml += '<li class="page-item disabled"><span class="page-link">...</span></li>';
-            }
-        }
-        
-        // Next button
-        paginationHtml += `
-            <li class="page-item ${currentPage >= totalPages - 1 ? 'disabled' : ''}">
-                <a class="page-link" href="#" onclick="dashboard.loadAlarms(${currentPage + 1})">
-                    <i class="fas fa-chevron-right"></i>
-                </a>
-            </li>
-        `;
-        
-        pagination.innerHTML = paginationHtml;
+// Refresh signals
+let recentSignals = [];
+
+function renderSignals() {
+    const container = document.getElementById('recent-signals');
+    let html = '';
+    if (recentSignals.length > 0) {
+        recentSignals.slice(0, 5).forEach(function(signal) {
+            const color = signal.action && signal.action.toLowerCase().includes('buy') ? '#28a745' : '#dc3545';
+            html += '<div class="border-start border-4 p-2 mb-2 bg-light" style="border-color: ' + color + '!important;">' +
+                    '<strong style="color: ' + color + ';">' + (signal.symbol || 'N/A') + ' - ' + (signal.action || 'N/A') + '</strong>' +
+                    '<div class="small text-muted">' + (signal.price || 'N/A') + ' | ' + (signal.timestamp || '') + '</div>' +
+                    '<div class="small">TG: ' + (signal.telegram_success ? '✅' : '❌') + ' | WA: ' + (signal.whatsapp_success ? '✅' : '❌') + '</div>' +
+                    '</div>';
+        });
+    } else {
+        html = '<div class="text-center text-muted p-3">Henüz sinyal yok</div>';
     }
+    container.innerHTML = html;
+}
 
-    async testConnections() {
-        try {
-            const response = await fetch('/api/test-connections', { method: 'POST' });
-            const result = await response.json();
-            
-            if (result.success) {
-                // Connection test results are handled by updateServiceStatus
-                // which is called from loadStats
-            }
-        } catch (error) {
-            console.error('Connection test failed:', error);
-        }
-    }
+function refreshSignals() {
+    const container = document.getElementById('recent-signals');
+    container.innerHTML = '<div class="text-center p-3"><i class="fas fa-spinner fa-spin"></i> Yenileniyor...</div>';
+
+    adminFetch('/admin/recent-signals')
+    .then(function(response) { return response.json(); })
+    .then(function(data) {
+        recentSignals = data.signals || [];
+        renderSignals();
+    }).catch(function() {
+        container.innerHTML = '<div class="text-center text-danger p-3">Yükleme hatası</div>';
+    });
+}
 
-    async loadLogs() {
-        try {
-            const response = await fetch('/api/logs?lines=200');
-            const result = await response.json();
-            
-            if (result.success) {
-                this.displayLogs(result.data);
-            } else {
-                throw new Error(result.error);
-            }
-        } catch (error) {
-            console.error('Failed to load logs:', error);
-            document.getElementById('logs-content').textContent = 'Loglar yüklenemedi: ' + error.message;
+// Live updates pushed by /admin/stream (EventSource reconnects and resumes on its own)
+function connectStream() {
+    const stream = new EventSource('/admin/stream');
+    stream.onerror = function() {
+        // A refused connection (e.g. expired session) is not retried by the browser
+        if (stream.readyState === EventSource.CLOSED) {
+            window.location.href = '/';
         }
-    }
-
-    displayLogs(logs) {
-        const logsContent = document.getElementById('logs-content');
-        
-        if (!logs || logs.length === 0) {
-            logsContent.textContent = 'Log bulunamadı.';
-            return;
+    };
+    stream.addEventListener('alarm', function(e) {
+        recentSignals.unshift(JSON.parse(e.data));
+        recentSignals = recentSignals.slice(0, 5);
+        renderSignals();
+    });
+    stream.addEventListener('delivery', function(e) {
+        const update = JSON.parse(e.data);
+        const signal = recentSignals.find(function(s) { return s.id === update.id; });
+        if (signal) {
+            Object.assign(signal, update);
+            renderSignals();
         }
-        
-        const logsText = logs.map(log => {
-            const timestamp = log.timestamp || new Date().toISOString();
-            const level = (log.level || 'info').toUpperCase().padEnd(5);
-            return `[${timestamp}] [${level}] ${log.message}`;
-        }).join('\n');
-        
-        logsContent.textContent = logsText;
-        logsContent.scrollTop = logsContent.scrollHeight;
-    }
-
-    async loadConfig() {
-        try {
-            const response = await fetch('/api/config');
-            const result = await response.json();
-            
-            if (result.success) {
-                this.displayConfig(result.data);
-            } else {
-                throw new Error(result.error);
-            }
-        } catch (error) {
-            console.error('Failed to load config:', error);
-            document.getElementById('config-content').innerHTML = 
-                '<div class="alert alert-danger">Konfigürasyon yüklenemedi: ' + error.message + '</div>';
+    });
+    stream.addEventListener('service', function(e) {
+        const update = JSON.parse(e.data);
+        if (update.enabled !== undefined) {
+            updateServiceStatus(update.service, update.enabled);
         }
-    }
-
-    displayConfig(config) {
-        const configContent = document.getElementById('config-content');
-        
-        let html = '';
-        
-        // Server configuration
-        html += `
-            <div class="config-section">
-                <h6><i class="fas fa-server"></i> Server Konfigürasyonu</h6>
-                <div class="config-item">
-                    <span class="config-label">Host:</span>
-                    <span class="config-value">${config.server?.host || 'N/A'}</span>
-                </div>
-                <div class="config-item">
-                    <span class="config-label">Port:</span>
-                    <span class="config-value">${config.server?.port || 'N/A'}</span>
-                </div>
-            </div>
-        `;
-        
-        // Telegram configuration
-        html += `
-            <div class="config-section">
-                <h6><i class="fab fa-telegram"></i> Telegram Konfigürasyonu</h6>
-                <div class="config-item">
-                    <span class="config-label">Aktif:</span>
-                    <span class="config-value">${config.telegram?.enabled ? 'Evet' : 'Hayır'}</span>
-                </div>
-                <div class="config-item">
-                    <span class="config-label">Yapılandırılmış:</span>
-                    <span class="config-value">${config.telegram?.configured ? 'Evet' : 'Hayır'}</span>
-                </div>
-            </div>
-        `;
-        
-        // WhatsApp configuration
-        html += `
-            <div class="config-section">
-                <h6><i class="fab fa-whatsapp"></i> WhatsApp Konfigürasyonu</h6>
-                <div class="config-item">
-                    <span class="config-label">Aktif:</span>
-                    <span class="config-value">${config.whatsapp?.enabled ? 'Evet' : 'Hayır'}</span>
-                </div>
-                <div class="config-item">
-                    <span class="config-label">Yapılandırılmış:</span>
-                    <span class="config-value">${config.whatsapp?.configured ? 'Evet' : 'Hayır'}</span>
-                </div>
-            </div>
-        `;
-        
-        // Storage configuration
-        html += `
-            <div class="config-section">
-                <h6><i class="fas fa-database"></i> Depolama Konfigürasyonu</h6>
-                <div class="config-item">
-                    <span class="config-label">Maksimum Alarm:</span>
-                    <span class="config-value">${config.storage?.maxAlarms || 'N/A'}</span>
-                </div>
-                <div class="config-item">
-                    <span class="config-label">Veri Dizini:</span>
-                    <span class="config-value">${config.storage?.dataPath || 'N/A'}</span>
-                </div>
-            </div>
-        `;
-        
-        // Retry configuration
-        html += `
-            <div class="config-section">
-                <h6><i class="fas fa-redo"></i> Yeniden Deneme Konfigürasyonu</h6>
-                <div class="config-item">
-                    <span class="config-label">Maksimum Deneme:</span>
-                    <span class="config-value">${config.retry?.maxAttempts || 'N/A'}</span>
-                </div>
-                <div class="config-item">
-                    <span class="config-label">Gecikme (ms):</span>
-                    <span class="config-value">${config.retry?.delayMs || 'N/A'}</span>
-                </div>
-                <div class="config-item">
-                    <span class="config-label">Exponential Backoff:</span>
-                    <span class="config-value">${config.retry?.exponentialBackoff ? 'Evet' : 'Hayır'}</span>
-                </div>
-            </div>
-        `;
-        
-        configContent.innerHTML = html;
-    }
+    });
+    stream.addEventListener('metrics', function(e) {
+        const m = JSON.parse(e.data);
+        document.getElementById('live-stats').textContent =
+            '📊 ' + m.signals_received + ' sinyal | Kuyruk: ' + m.delivery_queue + ' | Tekrar: ' + m.retry_queue;
+    });
+    stream.addEventListener('resync', function() {
+        refreshSignals();
+        loadServiceStatus();
+    });
+}
 
-    formatUptime(seconds) {
-        const days = Math.floor(seconds / (24 * 60 * 60));
-        const hours = Math.floor((seconds % (24 * 60 * 60)) / (60 * 60));
-        const minutes = Math.floor((seconds % (60 * 60)) / 60);
-        
-        if (days > 0) {
-            return `${days}g ${hours}s`;
-        } else if (hours > 0) {
-            return `${hours}s ${minutes}d`;
-        } else {
-            return `${minutes}d`;
-        }
-    }
+// Load initial data
+function loadServiceStatus() {
+    adminFetch('/admin/service-status')
+    .then(function(response) { return response.json(); })
+    .then(function(data) {
+        Object.keys(data).forEach(function(service) {
+            updateServiceStatus(service, data[service].enabled);
+        });
+    }).catch(function() {
+        console.log('Service status load failed');
+    });
+}
 
-    truncateText(text, maxLength) {
-        if (text.length <= maxLength) return text;
-        return text.substring(0, maxLength) + '...';
-    }
+// Enhanced management functions
+function showApiKeyManager() {
+    document.getElementById('apiKeyModal').style.display = 'block';
+    loadCurrentApiKeys();
+}
 
-    showToast(message, type = 'info') {
-        const toast = document.getElementById('toast');
-        const toastBody = document.getElementById('toast-body');
-        
-        // Set toast color based on type
-        toast.className = 'toast';
-        if (type === 'error') {
-            toast.classList.add('border-danger');
-        } else if (type === 'success') {
-            toast.classList.add('border-success');
-        } else if (type === 'warning') {
-            toast.classList.add('border-warning');
-        }
-        
-        toastBody.textContent = message;
-        
-        const bsToast = new bootstrap.Toast(toast);
-        bsToast.show();
-    }
+function closeModal() {
+    document.getElementById('apiKeyModal').style.display = 'none';
+}
 
-    setButtonLoading(button, loading) {
-        if (loading) {
-            button.classList.add('loading');
-            button.disabled = true;
-        } else {
-            button.classList.remove('loading');
-            button.disabled = false;
-        }
-    }
+function loadCurrentApiKeys() {
+    adminFetch('/admin/get-api-keys')
+    .then(function(response) { return response.json(); })
+    .then(function(data) {
+        document.querySelectorAll('#apiKeyModal input[data-channel]').forEach(function(input) {
+            const values = data[input.dataset.channel] || {};
+            input.value = values[input.dataset.setting] || '';
+        });
+    }).catch(function(error) {
+        showNotification('API anahtarları yüklenemedi!', 'error');
+    });
 }
 
-// Global functions for HTML onclick handlers
-async function testConnection(service) {
-    const button = event.target.closest('button');
-    dashboard.setButtonLoading(button, true);
-    
-    try {
-        const response = await fetch('/api/test-connections', { method: 'POST' });
-        const result = await response.json();
-        
-        if (result.success) {
-            const serviceResult = result.data[service];
-            if (serviceResult.success) {
-                dashboard.showToast(`${service.charAt(0).toUpperCase() + service.slice(1)} bağlantısı başarılı!`, 'success');
-            } else {
-                dashboard.showToast(`${service.charAt(0).toUpperCase() + service.slice(1)} bağlantısı başarısız: ${serviceResult.error}`, 'error');
-            }
+function saveApiKeys() {
+    const apiData = {};
+    document.querySelectorAll('#apiKeyModal input[data-channel]').forEach(function(input) {
+        apiData[input.dataset.channel] = apiData[input.dataset.channel] || {};
+        apiData[input.dataset.channel][input.dataset.setting] = input.value;
+    });
+
+    adminFetch('/admin/update-api-keys', {
+        method: 'POST',
+        headers: {'Content-Type': 'application/json'},
+        body: JSON.stringify(apiData)
+    }).then(function(response) { return response.json(); })
+    .then(function(data) {
+        if (data.success) {
+            showNotification('API anahtarları güncellendi!', 'success');
+            closeModal();
         } else {
-            dashboard.showToast('Bağlantı testi başarısız: ' + result.error, 'error');
+            showNotification('Güncelleme başarısız!', 'error');
         }
-    } catch (error) {
-        dashboard.showToast('Bağlantı testi başarısız: ' + error.message, 'error');
-    } finally {
-        dashboard.setButtonLoading(button, false);
-    }
+    }).catch(function() {
+        showNotification('Bağlantı hatası!', 'error');
+    });
 }
 
-async function sendTestMessage() {
-    const button = event.target;
-    const service = document.getElementById('test-service').value;
-    const message = document.getElementById('test-message').value;
-    
-    if (!message.trim()) {
-        dashboard.showToast('Lütfen bir mesaj girin', 'warning');
+function resetApiKeys() {
+    if (!confirm('Panelden kaydedilen tüm API anahtarları silinsin ve ortam değişkenleri kullanılsın mı?')) {
         return;
     }
-    
-    dashboard.setButtonLoading(button, true);
-    
-    try {
-        const response = await fetch('/api/test-message', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json'
-            },
-            body: JSON.stringify({ service, message })
-        });
-        
-        const result = await response.json();
-        
-        if (result.success) {
-            dashboard.showToast('Test mesajı başarıyla gönderildi!', 'success');
-            document.getElementById('test-result').innerHTML = `
-                <div class="alert alert-success">
-                    <strong>Başarılı!</strong> Test mesajı ${service} üzerinden gönderildi.
-                </div>
-            `;
+    adminFetch('/admin/reset-api-keys', {
+        method: 'POST',
+        headers: {'Content-Type': 'application/json'},
+        body: '{}'
+    }).then(function(response) { return response.json(); })
+    .then(function(data) {
+        if (data.success) {
+            showNotification('API anahtarları ortam değişkenlerine döndü!', 'success');
+            loadCurrentApiKeys();
         } else {
-            dashboard.showToast('Test mesajı gönderilemedi: ' + result.error, 'error');
-            document.getElementById('test-result').innerHTML = `
-                <div class="alert alert-danger">
-                    <strong>Hata!</strong> ${result.error}
-                </div>
-            `;
+            showNotification('Sıfırlama başarısız!', 'error');
         }
-    } catch (error) {
-        dashboard.showToast('Test mesajı gönderilemedi: ' + error.message, 'error');
-        document.getElementById('test-result').innerHTML = `
-            <div class="alert alert-danger">
-                <strong>Hata!</strong> ${error.message}
-            </div>
-        `;
-    } finally {
-        dashboard.setButtonLoading(button, false);
-    }
+    }).catch(function() {
+        showNotification('Bağlantı hatası!', 'error');
+    });
 }
 
-async function sendTestWebhook() {
-    const button = event.target;
-    dashboard.setButtonLoading(button, true);
-    
-    try {
-        const testData = {
-            symbol: 'BTCUSDT',
-            price: '50000',
-            message: 'Test webhook from dashboard',
-            strategy: 'Test Strategy',
-            timeframe: '1h',
-            timestamp: new Date().toISOString()
-        };
-        
-        const response = await fetch('/webhook/test', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json'
-            },
-            body: JSON.stringify({ data: testData })
-        });
-        
-        const result = await response.json();
-        
-        if (result.success) {
-            dashboard.showToast('Test webhook başarıyla gönderildi!', 'success');
-            document.getElementById('test-result').innerHTML = `
-                <div class="alert alert-success">
-                    <strong>Başarılı!</strong> Test webhook gönderildi ve işlendi.
-                    <br><small>Alarm ID: ${result.alarmId}</small>
-                </div>
-            `;
-            // Refresh alarms to show the new test alarm
-            dashboard.loadAlarms();
-        } else {
-            dashboard.showToast('Test webhook başarısız: ' + result.error, 'error');
-            document.getElementById('test-result').innerHTML = `
-                <div class="alert alert-warning">
-                    <strong>Kısmi Başarı</strong> Test webhook gönderildi ancak bazı servisler başarısız oldu.
-                    <br><small>Alarm ID: ${result.alarmId || 'N/A'}</small>
-                </div>
-            `;
-        }
-    } catch (error) {
-        dashboard.showToast('Test webhook başarısız: ' + error.message, 'error');
-        document.getElementById('test-result').innerHTML = `
-            <div class="alert alert-danger">
-                <strong>Hata!</strong> ${error.message}
-            </div>
-        `;
-    } finally {
-        dashboard.setButtonLoading(button, false);
-    }
+function exportData() {
+    showNotification('Veriler hazırlanıyor...', 'info');
+    adminFetch('/admin/export-data')
+    .then(function(response) { return response.blob(); })
+    .then(function(blob) {
+        const url = window.URL.createObjectURL(blob);
+        const a = document.createElement('a');
+        a.href = url;
+        a.download = 'paratoner-backup-' + new Date().toISOString().slice(0,10) + '.ndjson';
+        a.click();
+        window.URL.revokeObjectURL(url);
+        showNotification('Veri dışarı aktarımı tamamlandı!', 'success');
+    }).catch(function() {
+        showNotification('Dışarı aktarım hatası!', 'error');
+    });
 }
 
-function copyWebhookUrl() {
-    const urlInput = document.getElementById('webhook-url');
-    urlInput.select();
-    urlInput.setSelectionRange(0, 99999);
-    
-    try {
-        document.execCommand('copy');
-        dashboard.showToast('Webhook URL kopyalandı!', 'success');
-    } catch (error) {
-        dashboard.showToast('URL kopyalanamadı', 'error');
-    }
+function showSystemLogs() {
+    document.getElementById('logsModal').style.display = 'block';
+    refreshLogs();
 }
 
-function loadAlarms() {
-    dashboard.loadAlarms();
+function closeLogsModal() {
+    document.getElementById('logsModal').style.display = 'none';
 }
 
-function loadLogs() {
-    dashboard.loadLogs();
+function refreshLogs() {
+    adminFetch('/admin/get-logs')
+    .then(function(response) { return response.json(); })
+    .then(function(data) {
+        document.getElementById('system-logs-content').textContent = data.logs;
+    }).catch(function() {
+        document.getElementById('system-logs-content').textContent = 'Log yükleme hatası';
+    });
 }
 
-// Initialize dashboard when page loads
-const dashboard = new Dashboard();
 
-// Cleanup on page unload
-window.addEventListener('beforeunload', () => {
-    dashboard.stopAutoRefresh();
+// Initialize
+document.addEventListener('DOMContentLoaded', function() {
+    refreshSignals();
+    loadServiceStatus();
+    connectStream();
 });
@@ -0,0 +1,98 @@
+"""Production launcher: app.py under gunicorn with threaded workers.
+
+    python serve.py [--bind 0.0.0.0:5000] [--workers 2] [--threads 16] [--preload]
+
+Every worker runs its own delivery workers, retry scheduler and health
+prober, started after the fork (threads do not survive it); state that must
+agree across workers lives in data/state.db.
+
+Signals (to the master process):
+  HUP   graceful reload - new workers start, old ones finish their requests
+        and drain queued deliveries. Keys, toggles, message templates and
+        routing rules are picked up live anyway; other config.json settings
+        need a HUP, or USR2 when --preload keeps the app loaded in the master.
+  TERM  graceful stop - intake stops, open dashboard streams end (browsers
+        reconnect to the remaining workers), in-flight deliveries drain
+        (journaled retries are replayed on the next start).
+"""
+import argparse
+import os
+import signal
+
+from gunicorn.app.base import BaseApplication
+
+DEFAULT_WORKERS = int(os.environ.get('WEB_CONCURRENCY', 2))
+DEFAULT_THREADS = int(os.environ.get('PARATONER_THREADS', 16))
+DRAIN_TIMEOUT = float(os.environ.get('DELIVERY_DRAIN_TIMEOUT', 30))
+# A stopping worker stops heartbeating while it finishes requests and drains, so it needs longer than the drain
+STOP_TIMEOUT = int(DRAIN_TIMEOUT) + 15
+
+def post_worker_init(worker):
+    import app as paratoner
+    paratoner.start_delivery_workers()
+
+    # gunicorn waits for open requests before worker_exit runs; end event streams as soon as TERM arrives
+    def handle_exit(signum, frame):
+        paratoner.broadcaster.close()
+        worker.handle_exit(signum, frame)
+    signal.signal(signal.SIGTERM, handle_exit)
+
+def worker_exit(server, worker):
+    import app as paratoner
+    paratoner.stop_delivery_workers()
+
+class ParatonerApplication(BaseApplication):
+    def __init__(self, options):
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        import app as paratoner
+        return paratoner.app
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Paratoner Signal Pro production server')
+    parser.add_argument('--bind', default=f"0.0.0.0:{os.environ.get('PORT', 5000)}")
+    # The relay is I/O-bound: a few processes with many threads each; SSE streams hold a thread apiece
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS)
+    parser.add_argument('--threads', type=int, default=DEFAULT_THREADS)
+    parser.add_argument('--preload', action='store_true', help='import the app once in the master before forking')
+    parser.add_argument('--timeout', type=int, default=STOP_TIMEOUT, help='seconds before a silent worker is restarted')
+    parser.add_argument('--graceful-timeout', type=int, default=STOP_TIMEOUT,
+                        help='seconds a stopping worker gets to finish requests and drain deliveries')
+    parser.add_argument('--keep-alive', type=int, default=5)
+    parser.add_argument('--max-requests', type=int, default=0, help='recycle workers after this many requests (0 = never)')
+    parser.add_argument('--log-level', default='info')
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    # Read by app.py at import, so they are set before any worker (or the preloading master) imports it
+    os.environ['PARATONER_DEFER_SERVICES'] = '1'
+    os.environ['PARATONER_WORKERS'] = str(args.workers)
+    # Dashboards may hold at most a quarter of each worker's threads
+    os.environ.setdefault('PARATONER_STREAM_CLIENTS', str(max(args.threads // 4, 1)))
+    ParatonerApplication({
+        'bind': args.bind,
+        'workers': args.workers,
+        'worker_class': 'gthread',
+        'threads': args.threads,
+        'preload_app': args.preload,
+        'timeout': args.timeout,
+        'graceful_timeout': args.graceful_timeout,
+        'keepalive': args.keep_alive,
+        'max_requests': args.max_requests,
+        'max_requests_jitter': args.max_requests // 10,
+        'loglevel': args.log_level,
+        'accesslog': None,
+        'errorlog': '-',
+        'post_worker_init': post_worker_init,
+        'worker_exit': worker_exit,
+    }).run()
+
+if __name__ == '__main__':
+    main()